@@ -1,70 +1,886 @@
+import argparse
+import asyncio
+import bisect
+import heapq
+import os
 import socket
+import select
+import selectors
+import signal
+import struct
 import threading
 import time
-from datetime import datetime
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import accesslog
+import diskcache
+import metrics
 
 # ========== KONFIGURASI ==========
 PROXY_HOST, TCP_PORT, UDP_PORT = '0.0.0.0', 8080, 9090
 WEB_SERVER_IP, WEB_SERVER_PORT = '192.168.0.102', 8000
+UPSTREAMS = []                      # [(host, port), ...]; kosong = hanya WEB_SERVER_IP:WEB_SERVER_PORT
+LB_STRATEGY = 'round_robin'         # 'round_robin' | 'least_conn' | 'hash' (per path, lokalitas cache)
+HEALTH_INTERVAL, HEALTH_TIMEOUT = 2, 1
+EJECT_AFTER, RECOVER_AFTER = 3, 2   # gagal berturut-turut sebelum dikeluarkan / sukses sebelum masuk lagi
 TIMEOUT, MAX_THREADS, BUFFER_SIZE = 10, 20, 4096
+MAX_REQUEST_HEAD = 64 * 1024        # = limit default StreamReader di engine async
+QUEUE_DEPTH = 64                    # koneksi yang boleh antre menunggu worker
+OVERLOAD_POLICY = 'shed'            # 'shed' = 503 saat antrean > QUEUE_DEPTH | 'queue' = antre s/d QUEUE_HARD_CAP
+QUEUE_HARD_CAP = 4096               # policy 'queue': batas keras antrean (memori/fd), lebih dari ini 503
+QUEUE_DEADLINE = 2.0                # detik maksimal di antrean sebelum dijawab 503
+THREAD_STEP = 5                     # SIGUSR1/SIGUSR2: tambah/kurangi worker sebanyak ini saat runtime
+ASYNC_MAX_CLIENTS = 10000           # engine async: koneksi klien bersamaan sebelum 503
+ASYNC_BACKLOG = 4096
+UDP_UPSTREAM_PORT = 9000            # port UDP echo di web server
+UDP_SESSION_IDLE = 30               # detik tanpa paket sebelum sesi NAT ditutup
+UDP_MAX_SESSIONS = 4096
+UDP_BATCH = 64                      # datagram per readiness event sebelum ganti socket
+UDP_SOCK_BUF = 4 * 1024 * 1024
+UDP_LOCAL_ECHO = False              # True = datagram >= 500 B dipantulkan proxy (perilaku lama)
 CACHE_TIMEOUT = 15
+CACHE_MAX_BYTES, CACHE_MAX_ENTRIES = 64 * 1024 * 1024, 1024
+L2_CACHE_PATH = None                # file cache L2 di disk; None = hanya cache memori
+L2_CACHE_MAX_BYTES = 512 * 1024 * 1024
+STALE_WHILE_REVALIDATE = 30         # default jendela stale kalau upstream tidak menentukan
+PREFETCH_AHEAD, PREFETCH_MIN_HITS = 2, 3   # refresh key populer 2s sebelum basi
+POOL_MAX_IDLE, POOL_IDLE_TIMEOUT = 10, 4   # < KEEPALIVE_TIMEOUT web.py (5s)
+RELAY_BUF_SIZE = 64 * 1024          # buffer recv_into yang dipakai ulang saat relay
+CACHE_MAX_ENTRY = 1024 * 1024       # response lebih besar tidak di-tee ke cache
 running = True
+engine = 'threaded'                 # 'threaded' | 'async', dipilih lewat --engine
+
+# ========== METRICS ==========
+# diekspos di GET /metrics (lihat metrics.py untuk overhead yang terukur)
+m_request = metrics.Histogram("proxy_request_seconds", "Waktu total request TCP sampai response selesai")
+m_ttfb = metrics.Histogram("proxy_ttfb_seconds", "Waktu sampai byte pertama response terkirim ke klien")
+m_upstream = metrics.Histogram("proxy_upstream_seconds", "Waktu fetch + relay dari web server")
+m_lookup = metrics.Histogram("proxy_cache_lookup_seconds", "Waktu lookup cache (L1 + L2)")
+m_queue_wait = metrics.Histogram("proxy_queue_wait_seconds", "Waktu koneksi menunggu worker di antrean")
+m_responses = metrics.Counter("proxy_responses_total", "Response TCP per status", label="status")
+m_cache_results = metrics.Counter("proxy_cache_results_total", "Hasil cache per request", label="result")
+m_bytes = metrics.Counter("proxy_bytes_sent_total", "Byte response terkirim ke klien")
+m_connections = metrics.Counter("proxy_connections_total", "Koneksi TCP klien diterima")
+metrics.Gauge("proxy_cache_entries", "Entri di cache memori", lambda: cache.stats()['size'])
+metrics.Gauge("proxy_cache_bytes", "Byte di cache memori", lambda: cache.stats()['bytes'])
+metrics.Gauge("proxy_active_requests", "Request yang sedang dikerjakan",
+              lambda: async_clients if engine == 'async' else pool.stats()['active'])
+metrics.Gauge("proxy_udp_sessions", "Sesi UDP NAT aktif", lambda: len(udp_sessions))
+
+def metrics_response():
+    head, body = metrics.http_response()
+    return head + b"Connection: close\r\n\r\n" + body
 
 # ========== CACHE DENGAN TIMEOUT ==========
+# LRU dibatasi jumlah entri + total byte; expiry lewat min-heap sehingga
+# clean() hanya menyentuh entri yang memang sudah kedaluwarsa.
+# Entri fresh sampai fresh_until, lalu masih boleh disajikan (stale) sampai
+# expire_at sambil direvalidasi di background.
+# Dengan L2 (diskcache.DiskCache): entri yang dibuang LRU turun ke disk,
+# hit di disk naik lagi ke memori, dan checkpoint() menulis entri baru ke disk
+# tiap beberapa detik supaya proxy yang restart langsung punya cache hangat.
+class CacheEntry:
+    __slots__ = ('value', 'fresh_until', 'expire_at', 'etag', 'last_modified',
+                 'request', 'hits', 'on_disk')
+    
+    def __init__(self, value, fresh_until, expire_at, etag, last_modified, request):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.expire_at = expire_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self.request = request   # request asli, dipakai ulang untuk conditional GET
+        self.hits = 0            # hit sejak validasi terakhir (untuk pre-warm)
+        self.on_disk = False     # versi ini sudah ada di L2
+
 class Cache:
-    def __init__(self, timeout=15):
-        self.cache = {}
-        self.hits = self.misses = 0
+    def __init__(self, timeout=15, max_bytes=64 * 1024 * 1024, max_entries=1024):
+        self.cache = OrderedDict()   # key -> CacheEntry, urutan = LRU
+        self.heap = []               # (expire_at, key); entri basi dibuang lazily
+        self.refresh_heap = []       # (fresh_until, key) untuk refresh scheduler
         self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.bytes = 0
+        self.hits = self.misses = self.stale_hits = 0
+        self.evictions = self.expirations = 0
+        self.l2 = None
+        self.l2_hits = self.promoted = self.demoted = self.checkpointed = 0
+        self.defer_demote = False    # True (engine async): demote dikerjakan cache_cleaner
+        self.demote_queue = deque()  # (key, entry) hasil eviction yang belum ditulis ke L2
+        self.lock = threading.Lock()
     
-    def get(self, key):
-        if key in self.cache:
-            val, t = self.cache[key]
-            if time.time() - t > self.timeout:
-                del self.cache[key]
+    def attach_l2(self, disk):
+        self.l2 = disk
+    
+    def lookup(self, key, l2=True):
+        # hasil: (entry, fresh?) atau (None, False). l2=False: hanya memori; miss yang
+        # masih mungkin ada di L2 dikembalikan sebagai (None, None) supaya event loop
+        # bisa lanjut dengan lookup_l2() di executor (I/O disk + DiskCache.lock)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and now >= entry.expire_at:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self._hit(entry, now)
+            if self.l2 is None:
                 self.misses += 1
-                return None
-            self.hits += 1
-            return val
-        self.misses += 1
-        return None
+                return None, False
+            if not l2:
+                return None, None
+        return self.lookup_l2(key)
+    
+    def lookup_l2(self, key):
+        entry = self._promote(key)   # I/O disk di luar lock
+        now = time.monotonic()
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self.l2_hits += 1
+            return self._hit(entry, now)
+    
+    def _hit(self, entry, now):
+        entry.hits += 1
+        fresh = now < entry.fresh_until
+        if not fresh: self.stale_hits += 1
+        return entry, fresh
+    
+    def get(self, key):
+        entry, fresh = self.lookup(key)
+        return entry.value if fresh else None
     
-    def set(self, key, value):
-        self.cache[key] = (value, time.time())
+    def set(self, key, value, ttl=None, stale=0, etag=None, last_modified=None, request=None):
+        if len(value) > self.max_bytes: return
+        now = time.monotonic()
+        fresh_until = now + (self.timeout if ttl is None else ttl)
+        entry = CacheEntry(value, fresh_until, fresh_until + stale,
+                           etag, last_modified, request)
+        self._insert(key, entry)
+    
+    def _insert(self, key, entry):
+        evicted = []
+        with self.lock:
+            if key in self.cache: self._remove(key)
+            self.cache[key] = entry
+            self.bytes += len(entry.value)
+            heapq.heappush(self.heap, (entry.expire_at, key))
+            heapq.heappush(self.refresh_heap, (entry.fresh_until, key))
+            while len(self.cache) > self.max_entries or self.bytes > self.max_bytes:
+                old_key = next(iter(self.cache))
+                evicted.append((old_key, self.cache[old_key]))
+                self._remove(old_key)
+                self.evictions += 1
+            if len(self.heap) > 2 * len(self.cache) + 64:
+                self._compact_heap()
+        if self.l2 is not None and evicted:
+            if self.defer_demote:
+                # event loop tidak boleh menunggu disk / DiskCache.lock (compaction)
+                self.demote_queue.extend(evicted)
+            else:
+                # demote: tulis ke disk di luar lock supaya lookup lain tidak menunggu I/O
+                self._demote_evicted(evicted)
+    
+    def _demote_evicted(self, evicted):
+        now = time.monotonic()
+        for old_key, old in evicted:
+            if not old.on_disk and old.expire_at > now:
+                self._demote(old_key, old)
+    
+    def flush_demotes(self):
+        # dipanggil cache_cleaner (thread) untuk eviction yang ditunda engine async
+        evicted = []
+        while self.demote_queue:
+            evicted.append(self.demote_queue.popleft())
+        if evicted: self._demote_evicted(evicted)
+        return len(evicted)
+    
+    def _demote(self, key, entry, checkpoint=False):
+        to_wall = time.time() - time.monotonic()
+        fresh_until, expire_at = entry.fresh_until, entry.expire_at
+        meta = struct.pack('<HHI', len(entry.etag or b''), len(entry.last_modified or b''),
+                           len(entry.request or b'')) + \
+               (entry.etag or b'') + (entry.last_modified or b'') + (entry.request or b'')
+        self.l2.put(key, entry.value, meta, fresh_until + to_wall, expire_at + to_wall)
+        with self.lock:
+            # revalidated() di tengah put: umur baru belum di disk, biarkan on_disk False
+            if entry.expire_at == expire_at: entry.on_disk = True
+            if checkpoint: self.checkpointed += 1
+            else: self.demoted += 1
+    
+    def _promote(self, key):
+        found = self.l2.get(key)
+        if found is None: return None
+        value, meta, fresh_until, expire_at = found
+        to_mono = time.monotonic() - time.time()
+        elen, llen, rlen = struct.unpack_from('<HHI', meta)
+        fields = meta[8:8 + elen], meta[8 + elen:8 + elen + llen], meta[8 + elen + llen:]
+        entry = CacheEntry(value, fresh_until + to_mono, expire_at + to_mono,
+                           *(f or None for f in fields))
+        entry.on_disk = True
+        self._insert(key, entry)
+        with self.lock: self.promoted += 1
+        return entry
+    
+    def checkpoint(self):
+        # tulis entri memori yang belum ada di disk; dipanggil berkala + saat shutdown
+        if self.l2 is None: return 0
+        self.flush_demotes()
+        with self.lock:
+            pending = [(k, e) for k, e in self.cache.items() if not e.on_disk]
+        for key, entry in pending:
+            self._demote(key, entry, checkpoint=True)
+        return len(pending)
+    
+    def revalidated(self, key, entry, ttl, stale):
+        # upstream jawab 304: isi tetap, umur fresh diperpanjang
+        now = time.monotonic()
+        with self.lock:
+            if self.cache.get(key) is not entry: return
+            entry.fresh_until = now + ttl
+            entry.expire_at = entry.fresh_until + stale
+            entry.hits = 0
+            entry.on_disk = False   # umur baru ikut ditulis ke disk saat checkpoint
+            heapq.heappush(self.heap, (entry.expire_at, key))
+            heapq.heappush(self.refresh_heap, (entry.fresh_until, key))
+    
+    def due_for_refresh(self, ahead, min_hits):
+        # entri populer yang akan basi dalam `ahead` detik -> [(key, entry)]
+        limit = time.monotonic() + ahead
+        due = []
+        with self.lock:
+            heap = self.refresh_heap
+            while heap and heap[0][0] <= limit:
+                fresh_until, key = heapq.heappop(heap)
+                entry = self.cache.get(key)
+                if entry is not None and entry.fresh_until == fresh_until and entry.hits >= min_hits:
+                    entry.hits = 0
+                    due.append((key, entry))
+        return due
     
     def clean(self):
-        expired = [k for k, (_, t) in self.cache.items() 
-                  if time.time() - t > self.timeout]
-        for k in expired: 
-            del self.cache[k]
-        return len(expired)
+        # O(k log n) untuk k entri kedaluwarsa, bukan scan seluruh cache
+        now = time.monotonic()
+        removed = 0
+        with self.lock:
+            heap = self.heap
+            while heap and heap[0][0] <= now:
+                expire_at, key = heapq.heappop(heap)
+                entry = self.cache.get(key)
+                if entry is not None and entry.expire_at == expire_at:
+                    self._remove(key)
+                    removed += 1
+            self.expirations += removed
+        if self.l2 is not None:
+            self.l2.clean()
+            self.l2.maybe_compact()
+        return removed
     
     def stats(self):
-        self.clean()
-        total = self.hits + self.misses
-        rate = (self.hits / total * 100) if total > 0 else 0
-        return {'size': len(self.cache), 'hits': self.hits, 
-                'misses': self.misses, 'rate': rate}
+        with self.lock:
+            total = self.hits + self.l2_hits + self.misses
+            l2_lookups = self.l2_hits + self.misses
+            return {'size': len(self.cache), 'bytes': self.bytes,
+                    'hits': self.hits, 'l2_hits': self.l2_hits, 'misses': self.misses,
+                    'rate': ((self.hits + self.l2_hits) / total * 100) if total else 0,
+                    'l1_rate': (self.hits / total * 100) if total else 0,
+                    'l2_rate': (self.l2_hits / l2_lookups * 100) if self.l2 and l2_lookups else 0,
+                    'stale_hits': self.stale_hits, 'evictions': self.evictions,
+                    'expirations': self.expirations, 'promoted': self.promoted,
+                    'demoted': self.demoted, 'checkpointed': self.checkpointed,
+                    'l2': self.l2.stats() if self.l2 is not None else None}
+    
+    def _remove(self, key):
+        # panggil dengan self.lock dipegang; entri heap-nya jadi basi
+        entry = self.cache.pop(key)
+        self.bytes -= len(entry.value)
+    
+    def _compact_heap(self):
+        self.heap = [(e.expire_at, k) for k, e in self.cache.items()]
+        heapq.heapify(self.heap)
+        self.refresh_heap = [(e.fresh_until, k) for k, e in self.cache.items()]
+        heapq.heapify(self.refresh_heap)
 
-cache = Cache(CACHE_TIMEOUT)
+cache = Cache(CACHE_TIMEOUT, CACHE_MAX_BYTES, CACHE_MAX_ENTRIES)
 
 # ========== THREAD POOL ==========
 class ThreadPool:
-    def __init__(self, max_workers):
-        self.semaphore = threading.Semaphore(max_workers)
+    # worker thread tetap + antrean terbatas; submit() tidak pernah menunggu, jadi
+    # accept loop tidak pernah tertahan worker. Batas antrean: policy 'shed' =
+    # queue_depth (503 langsung), 'queue' = QUEUE_HARD_CAP. Di kedua policy job yang
+    # sudah antre > deadline saat diambil worker ditolak (counter expired), jadi
+    # waktu tunggu selalu terukur di m_queue_wait.
+    def __init__(self, max_workers, queue_depth=QUEUE_DEPTH, policy=OVERLOAD_POLICY,
+                 deadline=QUEUE_DEADLINE, reject=None):
+        self.queue = deque()   # (enqueued_at, target, args)
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)    # ada job baru / ukuran berubah
+        self.queue_depth = queue_depth
+        self.queue_cap = queue_depth if policy == 'shed' else max(queue_depth, QUEUE_HARD_CAP)
+        self.policy = policy
+        self.deadline = deadline
+        self.reject = reject   # reject(*args) dipanggil untuk job yang ditolak
+        self.size = 0          # target jumlah worker
+        self.workers = 0
         self.active = 0
+        self.completed = self.rejected = self.expired = 0
+        self.wait_total = self.wait_max = 0.0
+        self.resize(max_workers)
+    
+    def resize(self, n):
+        # tambah worker sekarang; kelebihan worker berhenti sendiri saat idle
+        with self.cond:
+            self.size = max(1, n)
+            spawn = self.size - self.workers
+            self.workers += max(0, spawn)
+            self.cond.notify_all()
+        for _ in range(spawn):
+            threading.Thread(target=self._worker, daemon=True).start()
     
     def submit(self, target, args):
-        self.semaphore.acquire()
-        self.active += 1
-        def worker():
-            target(*args)
-            self.semaphore.release()
-            self.active -= 1
-        threading.Thread(target=worker, daemon=True).start()
+        # hasil: False kalau job ditolak (reject sudah dipanggil)
+        with self.cond:
+            if len(self.queue) < self.queue_cap:
+                self.queue.append((time.monotonic(), target, args))
+                self.cond.notify()
+                return True
+            self.rejected += 1
+        self._reject(args)
+        return False
+    
+    def stats(self):
+        with self.cond:
+            served = self.completed + self.expired
+            return {'size': self.size, 'workers': self.workers, 'active': self.active,
+                    'queued': len(self.queue), 'completed': self.completed,
+                    'rejected': self.rejected, 'expired': self.expired,
+                    'wait_avg': self.wait_total / served if served else 0.0,
+                    'wait_max': self.wait_max}
+    
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.queue and self.workers <= self.size:
+                    self.cond.wait()
+                if self.workers > self.size:
+                    self.workers -= 1
+                    return
+                enqueued_at, target, args = self.queue.popleft()
+                waited = time.monotonic() - enqueued_at
+                m_queue_wait.observe(waited)
+                self.wait_total += waited
+                if waited > self.wait_max: self.wait_max = waited
+                if waited > self.deadline:
+                    self.expired += 1
+                    expired = True
+                else:
+                    self.active += 1
+                    expired = False
+            if expired:
+                self._reject(args)   # klien sudah terlalu lama menunggu
+                continue
+            try:
+                target(*args)
+            except Exception:
+                pass
+            finally:
+                with self.cond:
+                    self.active -= 1
+                    self.completed += 1
+    
+    def _reject(self, args):
+        if self.reject is None: return
+        try: self.reject(*args)
+        except Exception: pass
 
 pool = None
 
+def adjust_threads(delta):
+    # dipanggil dari handler SIGUSR1/SIGUSR2; accept loop yang memanggil pool.resize()
+    global MAX_THREADS
+    MAX_THREADS = max(1, MAX_THREADS + delta)
+    print(f"👷 MAX_THREADS -> {MAX_THREADS}")
+
+# ========== UPSTREAM CONNECTION POOL ==========
+class UpstreamPool:
+    def __init__(self, max_idle, idle_timeout):
+        self.idle = {}   # (host, port) -> deque[(sock, last_used)]
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.created = self.reused = self.stale = 0
+    
+    def acquire(self, addr, timeout=TIMEOUT):
+        # hasil: (sock, reused) -- koneksi idle terbaru dulu (LIFO)
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                conns = self.idle.get(addr)
+                if not conns: break
+                sock, last_used = conns.pop()
+            if now - last_used < self.idle_timeout and self._healthy(sock):
+                with self.lock: self.reused += 1
+                return sock, True
+            with self.lock: self.stale += 1
+            self._close(sock)
+        
+        sock = socket.create_connection(addr, timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock: self.created += 1
+        return sock, False
+    
+    def release(self, addr, sock):
+        with self.lock:
+            conns = self.idle.setdefault(addr, deque())
+            if len(conns) < self.max_idle:
+                conns.append((sock, time.monotonic()))
+                return
+        self._close(sock)
+    
+    def discard(self, sock):
+        self._close(sock)
+    
+    def stats(self):
+        with self.lock:
+            idle = sum(len(c) for c in self.idle.values())
+            return {'idle': idle, 'created': self.created,
+                    'reused': self.reused, 'stale': self.stale}
+    
+    @staticmethod
+    def _healthy(sock):
+        # socket idle yang readable berarti server sudah FIN/RST atau kirim sampah
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return not readable
+        except (OSError, ValueError):
+            return False
+    
+    @staticmethod
+    def _close(sock):
+        try: sock.close()
+        except: pass
+
+upstream_pool = UpstreamPool(POOL_MAX_IDLE, POOL_IDLE_TIMEOUT)
+
+# ========== LOAD BALANCER ==========
+class Backend:
+    __slots__ = ('addr', 'label', 'healthy', 'active', 'requests', 'errors', 'timeouts',
+                 'fails', 'oks', 'latency_total', 'latency_max', 'ejections')
+    
+    def __init__(self, addr):
+        self.addr = addr
+        self.label = f"{addr[0]}:{addr[1]}"
+        self.healthy = True
+        self.active = 0              # request yang sedang berjalan (least_conn)
+        self.requests = self.errors = self.timeouts = self.ejections = 0
+        self.fails = self.oks = 0    # berturut-turut, untuk eject / recover
+        self.latency_total = self.latency_max = 0.0
+
+class Balancer:
+    # pilih backend per request; passive check dari trafik biasa + active check
+    # dari health_checker. Backend yang gagal EJECT_AFTER kali berturut-turut
+    # dikeluarkan (kecuali backend sehat terakhir) dan baru dipakai lagi setelah
+    # RECOVER_AFTER health check sukses.
+    VNODES = 100   # titik per backend di ring consistent-hash
+    
+    def __init__(self, addrs, strategy):
+        self.backends = [Backend(a) for a in addrs]
+        self.strategy = strategy
+        self.lock = threading.Lock()
+        self.rr = 0
+        self.ring = sorted(((zlib.crc32(f"{b.label}#{i}".encode()), n)
+                            for n, b in enumerate(self.backends) for i in range(self.VNODES)))
+        self.ring_keys = [h for h, _ in self.ring]
+        self.label = self.backends[0].label if len(self.backends) == 1 else f"pool({len(self.backends)})"
+    
+    def pick(self, route):
+        with self.lock:
+            # semua backend down -> tetap coba, lebih baik daripada 502 pasti
+            up = [b for b in self.backends if b.healthy] or self.backends
+            if self.strategy == 'hash':
+                i = bisect.bisect(self.ring_keys, zlib.crc32(route))
+                for k in range(len(self.ring)):
+                    backend = self.backends[self.ring[(i + k) % len(self.ring)][1]]
+                    if backend in up: break
+            elif self.strategy == 'least_conn':
+                self.rr += 1
+                n = len(up)
+                backend = min((up[(self.rr + k) % n] for k in range(n)), key=lambda b: b.active)
+            else:
+                self.rr += 1
+                backend = up[self.rr % len(up)]
+            backend.active += 1
+            backend.requests += 1
+            return backend
+    
+    def done(self, backend, latency, ok, timeout=False):
+        m_upstream.observe(latency)
+        with self.lock:
+            backend.active -= 1
+            backend.latency_total += latency
+            if latency > backend.latency_max: backend.latency_max = latency
+            if not ok:
+                backend.errors += 1
+                if timeout: backend.timeouts += 1
+            self._record(backend, ok)
+    
+    def udp_target(self):
+        # sesi UDP baru dibagi round-robin ke host backend yang sehat
+        with self.lock:
+            up = [b for b in self.backends if b.healthy] or self.backends
+            self.rr += 1
+            return up[self.rr % len(up)].addr[0], UDP_UPSTREAM_PORT
+    
+    def checked(self, backend, ok):
+        with self.lock:
+            self._record(backend, ok)
+    
+    def _record(self, backend, ok):
+        # panggil dengan self.lock dipegang
+        if ok:
+            backend.fails = 0
+            backend.oks += 1
+            if not backend.healthy and backend.oks >= RECOVER_AFTER:
+                backend.healthy = True
+                print(f"💚 Backend {backend.label} kembali UP")
+        else:
+            backend.oks = 0
+            backend.fails += 1
+            # backend sehat terakhir tidak pernah dikeluarkan: tanpa alternatif,
+            # eject hanya mengubah kegagalan sesaat jadi 502 untuk semua request
+            if (backend.healthy and backend.fails >= EJECT_AFTER and
+                    any(b.healthy for b in self.backends if b is not backend)):
+                backend.healthy = False
+                backend.ejections += 1
+                print(f"💔 Backend {backend.label} dikeluarkan ({backend.fails}x gagal)")
+    
+    def stats(self):
+        with self.lock:
+            return [{'label': b.label, 'healthy': b.healthy, 'active': b.active,
+                     'requests': b.requests, 'errors': b.errors, 'timeouts': b.timeouts,
+                     'ejections': b.ejections, 'latency_max': b.latency_max,
+                     'latency_avg': b.latency_total / b.requests if b.requests else 0.0}
+                    for b in self.backends]
+
+upstreams = None
+
+def health_probe(backend):
+    # HEAD /metrics lewat koneksi keep-alive dari upstream_pool, bukan socket baru
+    # tiap interval; status < 500 dalam HEALTH_TIMEOUT = sehat
+    request = b"HEAD /metrics HTTP/1.1\r\nHost: " + backend.label.encode() + b"\r\n\r\n"
+    while True:
+        try:
+            sock, reused = upstream_pool.acquire(backend.addr, HEALTH_TIMEOUT)
+        except OSError:
+            return False
+        try:
+            sock.settimeout(HEALTH_TIMEOUT)
+            sock.sendall(request)
+            status, reusable = ResponseRelay(sock, None, 0).relay(b'HEAD')
+        except (UpstreamClosed, ConnectionError):
+            upstream_pool.discard(sock)
+            if reused: continue   # koneksi idle sudah ditutup server, coba koneksi baru
+            return False
+        except (OSError, ValueError):
+            upstream_pool.discard(sock)
+            return False
+        sock.settimeout(TIMEOUT)
+        if reusable: upstream_pool.release(backend.addr, sock)
+        else: upstream_pool.discard(sock)
+        return 0 < status < 500
+
+def health_checker():
+    # active check hanya berguna kalau ada backend lain untuk dipilih; dengan satu
+    # backend cukup passive check dari trafik biasa (dan backend itu tidak di-eject)
+    while running:
+        if len(upstreams.backends) > 1:
+            for backend in upstreams.backends:
+                upstreams.checked(backend, health_probe(backend))
+        time.sleep(HEALTH_INTERVAL)
+
+def request_route(request):
+    # path dari request line, kunci consistent-hash
+    parts = request.split(b' ', 2)
+    return parts[1] if len(parts) > 2 else b'/'
+
+# ========== HTTP FRAMING ==========
+HOP_HEADERS = (b'connection', b'keep-alive', b'proxy-connection')
+
+def split_head(head):
+    # head tanpa \r\n\r\n -> (start line, [(name_lower, raw_line)])
+    lines = head.split(b'\r\n')
+    headers = []
+    for line in lines[1:]:
+        name, sep, _ = line.partition(b':')
+        if sep: headers.append((name.strip().lower(), line))
+    return lines[0], headers
+
+def header_value(headers, name):
+    for n, line in headers:
+        if n == name: return line.partition(b':')[2].strip()
+    return None
+
+def upstream_request(request):
+    # buang header hop-by-hop dari klien supaya koneksi ke web server tetap keep-alive
+    head, sep, body = request.partition(b'\r\n\r\n')
+    if not sep: return request
+    start_line, headers = split_head(head)
+    kept = [line for n, line in headers if n not in HOP_HEADERS]
+    return b'\r\n'.join([start_line] + kept) + b'\r\n\r\n' + body
+
+class UpstreamClosed(Exception):
+    pass
+
+class RelayAborted(Exception):
+    # gagal setelah byte pertama terkirim ke klien: tidak bisa retry / kirim 502
+    pass
+
+def parse_status(status_line):
+    parts = status_line.split()
+    return int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+def body_framing(method, status, headers):
+    # hasil: ('none', 0) | ('chunked', 0) | ('length', n) | ('close', 0)
+    if method == b'HEAD' or status in (204, 304) or 100 <= status < 200:
+        return 'none', 0
+    if b'chunked' in (header_value(headers, b'transfer-encoding') or b'').lower():
+        return 'chunked', 0
+    length = header_value(headers, b'content-length')
+    if length is not None:
+        return 'length', int(length)
+    return 'close', 0
+
+def client_head(status_line, headers):
+    # ke klien: koneksi proxy<->klien tetap close per request
+    kept = [line for n, line in headers if n not in HOP_HEADERS]
+    return b'\r\n'.join([status_line] + kept + [b'Connection: close']) + b'\r\n\r\n'
+
+class ResponseRelay:
+    # teruskan satu response dari upstream ke klien sambil dibaca (streaming),
+    # dibingkai Content-Length/chunked; opsional tee ke buffer untuk cache
+    def __init__(self, sock, client_sock, tee_limit):
+        self.sock = sock
+        self.client_sock = client_sock
+        self.buf = bytearray()           # sisa byte yang sudah diterima tapi belum diteruskan
+        self.scratch = bytearray(RELAY_BUF_SIZE)
+        self.view = memoryview(self.scratch)
+        self.tee = bytearray() if tee_limit > 0 else None
+        self.tee_limit = tee_limit
+        self.sent = 0                    # byte yang sudah dikirim ke klien
+        self.first_byte = None           # time.time() saat byte pertama terkirim (TTFB)
+    
+    def _out(self, data):
+        if self.client_sock is not None:   # None = refresh background, tanpa klien
+            self.client_sock.sendall(data)
+            if self.first_byte is None: self.first_byte = time.time()
+        self.sent += len(data)
+        if self.tee is not None:
+            if len(self.tee) + len(data) > self.tee_limit: self.tee = None   # terlalu besar utk cache
+            else: self.tee += data
+    
+    def _fill(self):
+        n = self.sock.recv_into(self.scratch)
+        if not n: raise UpstreamClosed("upstream closed connection")
+        self.buf += self.view[:n]
+    
+    def read_until(self, marker):
+        while True:
+            idx = self.buf.find(marker)
+            if idx >= 0:
+                data = bytes(self.buf[:idx + len(marker)])
+                del self.buf[:idx + len(marker)]
+                return data
+            self._fill()
+    
+    def relay_exact(self, n):
+        if self.buf:
+            take = min(n, len(self.buf))
+            self._out(self.buf[:take])
+            del self.buf[:take]
+            n -= take
+        while n > 0:
+            k = self.sock.recv_into(self.scratch, min(n, RELAY_BUF_SIZE))
+            if not k: raise UpstreamClosed("upstream closed mid-body")
+            self._out(self.view[:k])
+            n -= k
+    
+    def relay_to_close(self):
+        if self.buf:
+            self._out(self.buf)
+            self.buf.clear()
+        while True:
+            k = self.sock.recv_into(self.scratch)
+            if not k: break
+            self._out(self.view[:k])
+    
+    def relay(self, method):
+        # hasil: (status, koneksi upstream masih bisa dipakai?)
+        head = self.read_until(b'\r\n\r\n')[:-4]
+        status_line, headers = split_head(head)
+        status = parse_status(status_line)
+        reusable = b'close' not in (header_value(headers, b'connection') or b'').lower()
+        kind, length = body_framing(method, status, headers)
+        
+        self._out(client_head(status_line, headers))   # klien dapat header sebelum body selesai
+        if kind == 'length':
+            self.relay_exact(length)
+        elif kind == 'chunked':
+            while True:
+                size_line = self.read_until(b'\r\n')
+                self._out(size_line)
+                size = int(size_line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    # trailer opsional, diakhiri baris kosong
+                    while True:
+                        line = self.read_until(b'\r\n')
+                        self._out(line)
+                        if line == b'\r\n': break
+                    break
+                self.relay_exact(size + 2)
+        elif kind == 'close':
+            self.relay_to_close()
+            reusable = False
+        return status, reusable and not self.buf
+
+def fetch_upstream(request, method, client_sock, tee_limit=0):
+    # pilih backend, pinjam koneksi dari pool dan stream response ke klien
+    # koneksi reuse yang ternyata sudah ditutup server -> retry dengan koneksi lain
+    # hasil: (status, byte terkirim, body lengkap utk cache atau None, backend,
+    #         waktu byte pertama terkirim ke klien)
+    backend = upstreams.pick(request_route(request))
+    addr = backend.addr
+    request = upstream_request(request)
+    started = time.monotonic()
+    try:
+        while True:
+            sock, reused = upstream_pool.acquire(addr)
+            relay = ResponseRelay(sock, client_sock, tee_limit)
+            try:
+                sock.sendall(request)
+                status, reusable = relay.relay(method)
+            except Exception as e:
+                upstream_pool.discard(sock)
+                if relay.sent: raise RelayAborted(e) from e
+                if reused and isinstance(e, (UpstreamClosed, ConnectionError)): continue
+                raise
+            if reusable: upstream_pool.release(addr, sock)
+            else: upstream_pool.discard(sock)
+            upstreams.done(backend, time.monotonic() - started, status < 500)
+            tee = bytes(relay.tee) if relay.tee is not None else None
+            return status, relay.sent, tee, backend, relay.first_byte
+    except RelayAborted:
+        upstreams.done(backend, time.monotonic() - started, True)   # bisa jadi klien yang putus
+        raise
+    except Exception as e:
+        upstreams.done(backend, time.monotonic() - started, False, isinstance(e, socket.timeout))
+        raise
+
+# ========== FRESHNESS & REVALIDATION ==========
+def response_freshness(response):
+    # hasil: None kalau tidak boleh di-cache, atau (ttl, stale, etag, last_modified)
+    head = response.partition(b'\r\n\r\n')[0]
+    _, headers = split_head(head)
+    directives = {}
+    for n, line in headers:
+        if n != b'cache-control': continue
+        for d in line.partition(b':')[2].split(b','):
+            name, _, value = d.strip().lower().partition(b'=')
+            directives[name] = value.strip(b'"')
+    if b'no-store' in directives or b'private' in directives:
+        return None
+    
+    def seconds(name):
+        value = directives.get(name)
+        return int(value) if value and value.isdigit() else None
+    
+    ttl = seconds(b's-maxage')
+    if ttl is None: ttl = seconds(b'max-age')
+    if ttl is None:
+        expires = header_value(headers, b'expires')
+        if expires is not None:
+            try:
+                date = header_value(headers, b'date')
+                base = parsedate_to_datetime(date.decode()) if date else datetime.now(timezone.utc)
+                ttl = max(0, int((parsedate_to_datetime(expires.decode()) - base).total_seconds()))
+            except (TypeError, ValueError):
+                ttl = 0   # Expires tidak valid = sudah kedaluwarsa (RFC 9111)
+    if ttl is None: ttl = CACHE_TIMEOUT
+    
+    stale = seconds(b'stale-while-revalidate')
+    if stale is None: stale = STALE_WHILE_REVALIDATE
+    if b'must-revalidate' in directives or b'proxy-revalidate' in directives: stale = 0
+    if b'no-cache' in directives: ttl = stale = 0   # harus revalidasi sebelum dipakai
+    return ttl, stale, header_value(headers, b'etag'), header_value(headers, b'last-modified')
+
+def store_response(key, response, request):
+    fresh = response_freshness(response)
+    if fresh is None: return
+    ttl, stale, etag, last_modified = fresh
+    if ttl == 0 and stale == 0: return
+    cache.set(key, response, ttl, stale, etag, last_modified, request)
+
+CONDITIONAL_HEADERS = (b'if-none-match', b'if-modified-since', b'if-match',
+                       b'if-unmodified-since', b'if-range', b'range')
+
+def conditional_request(entry):
+    # request asli + validator dari entri cache
+    head, _, body = entry.request.partition(b'\r\n\r\n')
+    start_line, headers = split_head(head)
+    lines = [line for n, line in headers if n not in CONDITIONAL_HEADERS]
+    if entry.etag: lines.append(b'If-None-Match: ' + entry.etag)
+    if entry.last_modified: lines.append(b'If-Modified-Since: ' + entry.last_modified)
+    return b'\r\n'.join([start_line] + lines) + b'\r\n\r\n' + body
+
+class Refresher:
+    # revalidasi entri stale/hampir stale di background, maksimal satu per key
+    def __init__(self):
+        self.active = set()
+        self.lock = threading.Lock()
+        self.refreshed = self.not_modified = self.failed = 0
+    
+    def schedule(self, key, entry):
+        if entry.request is None: return
+        with self.lock:
+            if key in self.active: return
+            self.active.add(key)
+        threading.Thread(target=self._refresh, args=(key, entry), daemon=True).start()
+    
+    def _refresh(self, key, entry):
+        outcome = 'failed'
+        try:
+            status, _, response, _, _ = fetch_upstream(
+                conditional_request(entry), b'GET', None, CACHE_MAX_ENTRY)
+            if status == 304:
+                fresh = response_freshness(response) or (CACHE_TIMEOUT, STALE_WHILE_REVALIDATE, None, None)
+                cache.revalidated(key, entry, fresh[0], fresh[1])
+                outcome = 'not_modified'
+            elif status == 200 and response is not None:
+                store_response(key, response, entry.request)
+                outcome = 'refreshed'
+        except Exception:
+            pass   # entri lama tetap dipakai sampai expire_at
+        finally:
+            with self.lock:
+                self.active.discard(key)
+                setattr(self, outcome, getattr(self, outcome) + 1)
+
+refresher = Refresher()
+
+def refresh_scheduler():
+    # pre-warm: key populer direvalidasi sebelum basi, jadi klien tidak pernah lihat stale
+    while running:
+        time.sleep(1)
+        for key, entry in cache.due_for_refresh(PREFETCH_AHEAD, PREFETCH_MIN_HITS):
+            refresher.schedule(key, entry)
+
 # ========== CACHE CLEANER ==========
 def cache_cleaner():
     while running:
@@ -72,119 +888,769 @@ def cache_cleaner():
         cleaned = cache.clean()
         if cleaned > 0:
             print(f"🧹 Removed {cleaned} expired items")
+        cache.checkpoint()
 
 # ========== STATISTICS ==========
 def stats_monitor():
     while running:
         time.sleep(10)
         s = cache.stats()
-        print(f"📊 Threads: {pool.active}/{MAX_THREADS} | "
+        if engine == 'async':
+            print(f"⚡ Async clients: {async_clients}/{ASYNC_MAX_CLIENTS} (peak {async_peak}) | "
+                  f"Shed: {async_shed}")
+            busy = f"Clients: {async_clients}"
+        else:
+            p = pool.stats()
+            print(f"👷 Workers: {p['active']}/{p['workers']} busy | Queue: {p['queued']}/{pool.queue_cap} | "
+                  f"Done: {p['completed']} | Rejected: {p['rejected']} | Expired: {p['expired']} | "
+                  f"Wait avg {p['wait_avg'] * 1000:.1f}ms max {p['wait_max'] * 1000:.1f}ms")
+            busy = f"Threads: {p['active']}/{MAX_THREADS}"
+        print(f"📊 {busy} | "
               f"Cache: {s['hits']}H/{s['misses']}M ({s['rate']:.1f}%) | "
-              f"Size: {s['size']}")
+              f"Size: {s['size']} ({s['bytes']}B) | Evict: {s['evictions']} | "
+              f"Expired: {s['expirations']} | Coalesced: {flights.coalesced + async_flights.coalesced} | "
+              f"Log drops: {accesslog.stats()['dropped']}")
+        print(f"♻️  Stale served: {s['stale_hits']} | Refreshed: {refresher.refreshed} | "
+              f"304: {refresher.not_modified} | Failed: {refresher.failed}")
+        if s['l2'] is not None:
+            d = s['l2']
+            print(f"💾 L1 hit {s['l1_rate']:.1f}% | L2 hit {s['l2_rate']:.1f}% ({s['l2_hits']}) | "
+                  f"L2: {d['entries']} entries {d['bytes']}B (file {d['file_bytes']}B) | "
+                  f"promote {s['promoted']} | demote {s['demoted']} | "
+                  f"checkpoint {s['checkpointed']} | "
+                  f"corrupt {d['corrupt']} | compact {d['compactions']}")
+        pct = lambda h: "/".join(f"{v * 1000:.1f}" for v in h.percentiles())
+        print(f"⏱️  p50/p90/p99 ms | request {pct(m_request)} | ttfb {pct(m_ttfb)} | "
+              f"upstream {pct(m_upstream)} | lookup {pct(m_lookup)} | queue {pct(m_queue_wait)}")
+        d = udp_stats()
+        echo = f" | echoed {d['echoed']}" if UDP_LOCAL_ECHO else ""
+        print(f"📦 UDP sessions: {d['active']} (closed {d['sessions']}) | "
+              f"pkts {d['pkts_in']}>{d['pkts_out']} | bytes {d['bytes_in']}>{d['bytes_out']} | "
+              f"drops {d['drops']} | rejected {d['rejected']}{echo}")
+        u = (async_upstream_pool if engine == 'async' else upstream_pool).stats()
+        print(f"🔗 Upstream pool: idle {u['idle']} | new {u['created']} | "
+              f"reused {u['reused']} | stale {u['stale']}")
+        for b in upstreams.stats():
+            print(f"   {'🟢' if b['healthy'] else '🔴'} {b['label']} | active {b['active']} | "
+                  f"req {b['requests']} | err {b['errors']} (timeout {b['timeouts']}) | "
+                  f"eject {b['ejections']} | avg {b['latency_avg'] * 1000:.1f}ms "
+                  f"max {b['latency_max'] * 1000:.1f}ms")
 
 # ========== LOGGING ==========
-def log(proto, client, target, cache_stat, size, proc_time):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] {proto} | {client[0]}:{client[1]} → "
-          f"{target} | Cache:{cache_stat:4} | Bytes:{size:6} | Time:{proc_time:.3f}s")
+def fmt_log(ts, proto, client, target, cache_stat, size, proc_time):
+    return (f"[{datetime.fromtimestamp(ts).strftime('%H:%M:%S')}] {proto} | {client[0]}:{client[1]} → "
+            f"{target} | Cache:{cache_stat:4} | Bytes:{size:6} | Time:{proc_time:.3f}s")
+
+def log(proto, client, target, cache_stat, size, proc_time, status=None, ttfb=None):
+    # hanya enqueue; format + print dikerjakan thread accesslog secara batch
+    accesslog.emit(fmt_log, proto, client, target, cache_stat, size, proc_time)
+    if proto == 'TCP':
+        m_request.observe(proc_time)
+        m_ttfb.observe(proc_time if ttfb is None else ttfb)
+        m_cache_results.inc(1, cache_stat)
+        m_responses.inc(1, status or 'aborted')
+        m_bytes.inc(size)
 
 # ========== UDP HANDLER ==========
-def udp_server():
+# Relay UDP gaya NAT: tiap alamat klien dapat socket upstream sendiri (connected),
+# jadi balasan web server dikenali dari socket asalnya dan dikirim balik ke klien
+# yang benar. Semua socket non-blocking dan di-drain per batch; tidak ada log
+# per paket -- satu baris log per sesi saat ditutup, dengan counter-nya.
+# Tabel sesi hanya disentuh satu thread (thread UDP atau event loop), tanpa lock.
+class UdpSession:
+    __slots__ = ('client', 'target', 'sock', 'created', 'last_seen',
+                 'pkts_in', 'pkts_out', 'bytes_in', 'bytes_out', 'drops')
+    
+    def __init__(self, client, target):
+        self.client = client
+        self.target = target
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.connect(target)   # kernel hanya menerima balasan dari target
+        self.created = self.last_seen = time.monotonic()
+        self.pkts_in = self.pkts_out = self.bytes_in = self.bytes_out = self.drops = 0
+
+udp_sessions = {}                   # alamat klien -> UdpSession
+udp_closed = {'sessions': 0, 'pkts_in': 0, 'pkts_out': 0, 'bytes_in': 0, 'bytes_out': 0, 'drops': 0}
+udp_rejected = udp_echoed = 0
+udp_buf = bytearray(65535)
+udp_view = memoryview(udp_buf)
+
+def udp_listen_socket():
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_SOCK_BUF)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UDP_SOCK_BUF)
     sock.bind((PROXY_HOST, UDP_PORT))
-    print(f"✅ UDP: Port {UDP_PORT} | ECHO mode")
+    sock.setblocking(False)
+    return sock
+
+def udp_drain_clients(sock, on_open):
+    # paket dari klien -> socket upstream milik sesinya; on_open(session) daftarkan socket baru
+    global udp_rejected, udp_echoed
+    now = time.monotonic()
+    for _ in range(UDP_BATCH):
+        try:
+            n, client = sock.recvfrom_into(udp_buf)
+        except BlockingIOError:
+            break
+        except OSError:
+            continue
+        if UDP_LOCAL_ECHO and n >= 500:
+            try: sock.sendto(udp_view[:n], client)
+            except OSError: pass
+            udp_echoed += 1
+            continue
+        session = udp_sessions.get(client)
+        if session is None:
+            if len(udp_sessions) >= UDP_MAX_SESSIONS:
+                udp_rejected += 1
+                continue
+            try: session = UdpSession(client, upstreams.udp_target())
+            except OSError:
+                udp_rejected += 1
+                continue
+            udp_sessions[client] = session
+            on_open(session)
+        session.last_seen = now
+        session.pkts_in += 1
+        session.bytes_in += n
+        try:
+            session.sock.send(udp_view[:n])
+        except OSError:   # buffer penuh / ICMP port unreachable dari upstream
+            session.drops += 1
+
+def udp_drain_replies(session, sock):
+    # balasan upstream -> klien pemilik sesi, lewat socket yang didengar klien
+    for _ in range(UDP_BATCH):
+        try:
+            n = session.sock.recv_into(udp_buf)
+        except BlockingIOError:
+            break
+        except OSError:
+            session.drops += 1
+            continue
+        try:
+            sock.sendto(udp_view[:n], session.client)
+        except OSError:
+            session.drops += 1
+            continue
+        session.last_seen = time.monotonic()
+        session.pkts_out += 1
+        session.bytes_out += n
+
+def udp_expire(on_close, idle=None):
+    # tutup sesi yang idle; idle=0 menutup semuanya (shutdown)
+    limit = time.monotonic() - (UDP_SESSION_IDLE if idle is None else idle)
+    for client, session in list(udp_sessions.items()):
+        if session.last_seen > limit: continue
+        del udp_sessions[client]
+        on_close(session)
+        session.sock.close()
+        for field in ('pkts_in', 'pkts_out', 'bytes_in', 'bytes_out', 'drops'):
+            udp_closed[field] += getattr(session, field)
+        udp_closed['sessions'] += 1
+        log('UDP', client, f"{session.target[0]}:{session.target[1]}",
+            f"{session.pkts_in}>{session.pkts_out}", session.bytes_in + session.bytes_out,
+            session.last_seen - session.created)
+
+def udp_stats():
+    live = list(udp_sessions.values())
+    totals = dict(udp_closed)
+    for session in live:
+        for field in ('pkts_in', 'pkts_out', 'bytes_in', 'bytes_out', 'drops'):
+            totals[field] += getattr(session, field)
+    totals.update(active=len(live), rejected=udp_rejected, echoed=udp_echoed)
+    return totals
+
+def udp_server():
+    sock = udp_listen_socket()
+    sel = selectors.DefaultSelector()
+    sel.register(sock, selectors.EVENT_READ, None)
+    on_open = lambda session: sel.register(session.sock, selectors.EVENT_READ, session)
+    on_close = sel.unregister
+    print(f"✅ UDP: Port {UDP_PORT} | NAT relay -> :{UDP_UPSTREAM_PORT}"
+          f"{' | local echo >= 500B' if UDP_LOCAL_ECHO else ''}")
     
+    next_sweep = time.monotonic() + 1
     while running:
-        try:
-            data, client = sock.recvfrom(BUFFER_SIZE)
-            if len(data) >= 500:
-                sock.sendto(data, client)
-                log('UDP', client, "PROXY:ECHO", 'N/A', len(data), 0.001)
-            else:
-                sock.sendto(data, (WEB_SERVER_IP, 9000))
-                log('UDP', client, f"{WEB_SERVER_IP}:{9000}", 'N/A', len(data), 0.001)
-        except: pass
+        for key, _ in sel.select(1.0):
+            if key.data is None: udp_drain_clients(sock, on_open)
+            else: udp_drain_replies(key.data, sock)
+        if time.monotonic() >= next_sweep:
+            udp_expire(lambda session: on_close(session.sock))
+            next_sweep = time.monotonic() + 1
+    udp_expire(lambda session: on_close(session.sock), idle=0)
+    sock.close()
+
+# ========== REQUEST COALESCING ==========
+class InFlight:
+    __slots__ = ('done', 'response', 'failure')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None   # bytes response lengkap dari leader
+        self.failure = None    # 502 / 504 kalau fetch leader gagal
+
+class SingleFlight:
+    # satu fetch upstream per cache key; request lain untuk key sama menunggu hasilnya
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+    
+    def begin(self, key):
+        # hasil: (call, True kalau pemanggil jadi leader)
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self.calls[key] = InFlight()
+            return call, True
+    
+    def finish(self, key, call, response=None, failure=None):
+        # idempotent: hanya panggilan pertama yang dipakai
+        with self.lock:
+            if call.done.is_set(): return
+            if self.calls.get(key) is call: del self.calls[key]
+            call.response, call.failure = response, failure
+            call.done.set()
+
+flights = SingleFlight()
+
+def serve_coalesced(call, client_sock, client_addr, start):
+    # True kalau klien sudah dijawab dari hasil leader, False kalau harus fetch sendiri
+    if not call.done.wait(TIMEOUT) or call.failure == 504:
+        raise socket.timeout
+    if call.failure == 502:
+        client_sock.sendall(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+        log('TCP', client_addr, upstreams.label, 
+            'COAL', 0, time.time()-start, status=502)
+        return True
+    if call.response is None:
+        return False   # terlalu besar untuk di-tee atau leader aborted
+    client_sock.sendall(call.response)
+    log('TCP', client_addr, upstreams.label, 
+        'COAL', len(call.response), time.time()-start,
+        status=parse_status(call.response.split(b'\r\n', 1)[0]))
+    return True
 
 # ========== TCP HANDLER ==========
+def prepare_request(request):
+    # rewrite path singkat; hasil: (request, cache key) -- key None untuk selain GET
+    req_str = request.decode('utf-8', errors='ignore')
+    if not req_str.startswith('GET'):
+        return request, None
+    path = req_str.split()[1]
+    if path == '/index': req_str = req_str.replace('/index', '/index.html')
+    elif path == '/test': req_str = req_str.replace('/test', '/test.html')
+    request = req_str.encode()
+    # Vary: Accept-Encoding -- varian gzip/br/identity disimpan terpisah
+    _, headers = split_head(request.partition(b'\r\n\r\n')[0])
+    encoding = header_value(headers, b'accept-encoding') or b''
+    return request, req_str.split('\r\n')[0] + '|' + encoding.decode('latin-1')
+
+def read_request(sock):
+    # versi blocking read_request_async: header lengkap + body Content-Length.
+    # None = klien menutup, diam sampai TIMEOUT, atau header terpotong/terlalu besar;
+    # request seperti itu tidak boleh sampai ke koneksi upstream (pool keep-alive)
+    data = b''
+    try:
+        while b'\r\n\r\n' not in data:
+            if len(data) > MAX_REQUEST_HEAD: return None
+            chunk = sock.recv(BUFFER_SIZE)
+            if not chunk: return None
+            data += chunk
+        head, _, body = data.partition(b'\r\n\r\n')
+        _, headers = split_head(head)
+        length = header_value(headers, b'content-length')
+        need = int(length) - len(body) if length and length.isdigit() else 0
+        while need > 0:
+            chunk = sock.recv(min(need, BUFFER_SIZE))
+            if not chunk: return None
+            body += chunk
+            need -= len(chunk)
+    except (socket.timeout, OSError):
+        return None
+    return head + b'\r\n\r\n' + body
+
 def tcp_handler(client_sock, client_addr):
     start = time.time()
+    cache_stat = 'MISS'
     try:
         client_sock.settimeout(TIMEOUT)
-        request = client_sock.recv(BUFFER_SIZE)
-        
-        req_str = request.decode('utf-8', errors='ignore')
-        if req_str.startswith('GET'):
-            path = req_str.split()[1]
-            if path == '/index': req_str = req_str.replace('/index', '/index.html')
-            elif path == '/test': req_str = req_str.replace('/test', '/test.html')
-            request = req_str.encode()
+        request = read_request(client_sock)
+        if request is None: return
+        if request.startswith(b'GET /metrics '):
+            client_sock.sendall(metrics_response())
+            return
+        request, key = prepare_request(request)
         
-        cache_stat = 'MISS'
-        if request.startswith(b'GET'):
-            key = req_str.split('\r\n')[0] if req_str else request.split(b'\r\n')[0]
-            cached = cache.get(key)
-            if cached:
-                client_sock.sendall(cached)
-                log('TCP', client_addr, f"{WEB_SERVER_IP}:{WEB_SERVER_PORT}", 
-                    'HIT', len(cached), time.time()-start)
+        is_get = key is not None
+        if is_get:
+            t = time.perf_counter()
+            entry, fresh = cache.lookup(key)
+            m_lookup.observe(time.perf_counter() - t)
+            if entry:
+                if not fresh: refresher.schedule(key, entry)   # sajikan stale, revalidasi di background
+                client_sock.sendall(entry.value)
+                log('TCP', client_addr, upstreams.label, 
+                    'HIT' if fresh else 'STAL', len(entry.value), time.time()-start, status=200)
                 return
         
-        with socket.create_connection((WEB_SERVER_IP, WEB_SERVER_PORT), timeout=TIMEOUT) as s:
-            s.sendall(request)
-            response = b''
-            while True:
-                try:
-                    chunk = s.recv(BUFFER_SIZE)
-                    if not chunk: break
-                    response += chunk
-                except socket.timeout: break
+        call = leader = None
+        if is_get:
+            call, leader = flights.begin(key)
+            if not leader:
+                cache_stat = 'COAL'
+                if serve_coalesced(call, client_sock, client_addr, start): return
+                call = None   # response leader tidak bisa dibagi -> fetch sendiri
+        
+        try:
+            try:
+                status, sent, body, backend, first_byte = fetch_upstream(
+                    request, request.split(b' ', 1)[0], client_sock,
+                    CACHE_MAX_ENTRY if is_get else 0)
+            except RelayAborted:
+                # header sudah terkirim, klien/upstream putus di tengah body
+                log('TCP', client_addr, upstreams.label, 
+                    'ABRT', 0, time.time()-start)
+                return
+            except socket.timeout:
+                if call: flights.finish(key, call, failure=504)
+                raise
+            except (UpstreamClosed, OSError, ValueError):
+                status = None
             
-            if response:
-                client_sock.sendall(response)
-                if cache_stat == 'MISS' and b'200 OK' in response and request.startswith(b'GET'):
-                    cache.set(key, response)
-                log('TCP', client_addr, f"{WEB_SERVER_IP}:{WEB_SERVER_PORT}", 
-                    cache_stat, len(request)+len(response), time.time()-start)
+            if status is not None:
+                if call: flights.finish(key, call, response=body)
+                if cache_stat == 'MISS' and status == 200 and is_get and body is not None:
+                    store_response(key, body, request)
+                log('TCP', client_addr, backend.label, 
+                    cache_stat, len(request)+sent, time.time()-start,
+                    status=status, ttfb=first_byte - start)
             else:
+                if call: flights.finish(key, call, failure=502)
                 client_sock.sendall(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
-                log('TCP', client_addr, f"{WEB_SERVER_IP}:{WEB_SERVER_PORT}", 
-                    cache_stat, 0, time.time()-start)
+                log('TCP', client_addr, upstreams.label, 
+                    cache_stat, 0, time.time()-start, status=502)
+        finally:
+            # apa pun yang terjadi, follower tidak boleh menunggu selamanya
+            if call: flights.finish(key, call)
     except socket.timeout:
         client_sock.sendall(b"HTTP/1.1 504 Gateway Timeout\r\n\r\n")
-        log('TCP', client_addr, f"{WEB_SERVER_IP}:{WEB_SERVER_PORT}", 
-            cache_stat, 0, time.time()-start)
+        log('TCP', client_addr, upstreams.label, 
+            cache_stat, 0, time.time()-start, status=504)
     except: pass
     finally: 
         try: client_sock.close()
         except: pass
 
+def shed(client_sock, client_addr):
+    # dipanggil pool saat overload; jangan sampai accept loop tertahan klien lambat
+    try:
+        client_sock.settimeout(0.5)
+        client_sock.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                            b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+        client_sock.shutdown(socket.SHUT_WR)
+        # buang request yang sudah masuk supaya close() tidak jadi RST sebelum 503 terbaca
+        client_sock.setblocking(False)
+        while client_sock.recv(BUFFER_SIZE): pass
+    except OSError: pass
+    finally: client_sock.close()
+    log('TCP', client_addr, upstreams.label, 'SHED', 0, 0.0, status=503)
+
+# ========== ASYNC ENGINE ==========
+# Satu event loop untuk accept, cache, fetch+relay upstream dan UDP. Klien yang
+# menunggu upstream lambat hanya memegang satu task + buffer stream, bukan thread.
+# Cache, refresher, cleaner dan stats tetap dipakai bersama dengan engine threaded.
+async_clients = async_peak = async_shed = 0
+
+class AsyncUpstreamPool:
+    # versi asyncio dari UpstreamPool; hanya disentuh dari thread event loop, tanpa lock
+    def __init__(self, max_idle, idle_timeout):
+        self.idle = {}   # (host, port) -> deque[(reader, writer, last_used)]
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.created = self.reused = self.stale = 0
+    
+    async def acquire(self, addr):
+        now = time.monotonic()
+        conns = self.idle.get(addr)
+        while conns:
+            reader, writer, last_used = conns.pop()
+            # transport terus membaca, jadi FIN dari server sudah terlihat sebagai EOF
+            if now - last_used < self.idle_timeout and not reader.at_eof() and not writer.is_closing():
+                self.reused += 1
+                return reader, writer, True
+            self.stale += 1
+            writer.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(*addr, limit=RELAY_BUF_SIZE), TIMEOUT)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.created += 1
+        return reader, writer, False
+    
+    def release(self, addr, reader, writer):
+        conns = self.idle.setdefault(addr, deque())
+        if len(conns) < self.max_idle:
+            conns.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+    
+    def stats(self):
+        return {'idle': sum(len(c) for c in self.idle.values()), 'created': self.created,
+                'reused': self.reused, 'stale': self.stale}
+
+async_upstream_pool = AsyncUpstreamPool(POOL_MAX_IDLE, POOL_IDLE_TIMEOUT)
+
+class AsyncResponseRelay:
+    # padanan ResponseRelay di atas StreamReader; drain() memberi backpressure
+    # ke upstream kalau klien lambat, jadi memori per koneksi tetap terbatas
+    def __init__(self, reader, client_writer, tee_limit):
+        self.reader = reader
+        self.client = client_writer
+        self.tee = bytearray() if tee_limit > 0 else None
+        self.tee_limit = tee_limit
+        self.sent = 0
+        self.first_byte = None
+    
+    async def _out(self, data):
+        self.client.write(data)
+        await asyncio.wait_for(self.client.drain(), TIMEOUT)
+        if self.first_byte is None: self.first_byte = time.time()
+        self.sent += len(data)
+        if self.tee is not None:
+            if len(self.tee) + len(data) > self.tee_limit: self.tee = None
+            else: self.tee += data
+    
+    async def read_until(self, marker):
+        try:
+            return await asyncio.wait_for(self.reader.readuntil(marker), TIMEOUT)
+        except asyncio.IncompleteReadError as e:
+            raise UpstreamClosed("upstream closed connection") from e
+        except asyncio.LimitOverrunError as e:
+            raise ValueError("upstream header line too long") from e
+    
+    async def relay_exact(self, n):
+        while n > 0:
+            data = await asyncio.wait_for(self.reader.read(min(n, RELAY_BUF_SIZE)), TIMEOUT)
+            if not data: raise UpstreamClosed("upstream closed mid-body")
+            await self._out(data)
+            n -= len(data)
+    
+    async def relay_to_close(self):
+        while True:
+            data = await asyncio.wait_for(self.reader.read(RELAY_BUF_SIZE), TIMEOUT)
+            if not data: break
+            await self._out(data)
+    
+    async def relay(self, method):
+        head = (await self.read_until(b'\r\n\r\n'))[:-4]
+        status_line, headers = split_head(head)
+        status = parse_status(status_line)
+        reusable = b'close' not in (header_value(headers, b'connection') or b'').lower()
+        kind, length = body_framing(method, status, headers)
+        
+        await self._out(client_head(status_line, headers))
+        if kind == 'length':
+            await self.relay_exact(length)
+        elif kind == 'chunked':
+            while True:
+                size_line = await self.read_until(b'\r\n')
+                await self._out(size_line)
+                size = int(size_line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    while True:
+                        line = await self.read_until(b'\r\n')
+                        await self._out(line)
+                        if line == b'\r\n': break
+                    break
+                await self.relay_exact(size + 2)
+        elif kind == 'close':
+            await self.relay_to_close()
+            reusable = False
+        # sama dengan `not self.buf` di ResponseRelay: byte lebih setelah response
+        # akan terbaca sebagai awal response berikutnya di koneksi pool
+        return status, reusable and not self.reader._buffer
+
+async def fetch_upstream_async(request, method, client_writer, tee_limit=0):
+    # sama dengan fetch_upstream: retry sekali per koneksi reuse yang ternyata mati
+    backend = upstreams.pick(request_route(request))
+    addr = backend.addr
+    request = upstream_request(request)
+    started = time.monotonic()
+    try:
+        while True:
+            reader, writer, reused = await async_upstream_pool.acquire(addr)
+            relay = AsyncResponseRelay(reader, client_writer, tee_limit)
+            try:
+                writer.write(request)
+                status, reusable = await relay.relay(method)
+            except Exception as e:
+                writer.close()
+                if relay.sent: raise RelayAborted(e) from e
+                if reused and isinstance(e, (UpstreamClosed, ConnectionError)): continue
+                raise
+            if reusable: async_upstream_pool.release(addr, reader, writer)
+            else: writer.close()
+            upstreams.done(backend, time.monotonic() - started, status < 500)
+            tee = bytes(relay.tee) if relay.tee is not None else None
+            return status, relay.sent, tee, backend, relay.first_byte
+    except RelayAborted:
+        upstreams.done(backend, time.monotonic() - started, True)
+        raise
+    except Exception as e:
+        upstreams.done(backend, time.monotonic() - started, False, isinstance(e, asyncio.TimeoutError))
+        raise
+
+class AsyncSingleFlight:
+    # SingleFlight untuk task di event loop: follower await Future milik leader
+    def __init__(self):
+        self.calls = {}
+        self.coalesced = 0
+    
+    def begin(self, key):
+        call = self.calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            return call, False
+        call = self.calls[key] = asyncio.get_running_loop().create_future()
+        return call, True
+    
+    def finish(self, key, call, response=None, failure=None):
+        if call.done(): return
+        if self.calls.get(key) is call: del self.calls[key]
+        call.set_result((response, failure))
+
+async_flights = AsyncSingleFlight()
+
+async def serve_coalesced_async(call, writer, client_addr, start):
+    response, failure = await asyncio.wait_for(asyncio.shield(call), TIMEOUT)
+    if failure == 504: raise asyncio.TimeoutError
+    if failure == 502:
+        writer.write(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+        log('TCP', client_addr, upstreams.label, 
+            'COAL', 0, time.time()-start, status=502)
+        return True
+    if response is None:
+        return False
+    writer.write(response)
+    await asyncio.wait_for(writer.drain(), TIMEOUT)
+    log('TCP', client_addr, upstreams.label, 
+        'COAL', len(response), time.time()-start,
+        status=parse_status(response.split(b'\r\n', 1)[0]))
+    return True
+
+async def read_request_async(reader):
+    # header lengkap + body Content-Length (kalau ada)
+    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), TIMEOUT)
+    _, headers = split_head(head[:-4])
+    length = header_value(headers, b'content-length')
+    if length and length.isdigit() and int(length) > 0:
+        head += await asyncio.wait_for(reader.readexactly(int(length)), TIMEOUT)
+    return head
+
+async def async_tcp_handler(reader, writer):
+    global async_clients, async_peak, async_shed
+    client_addr = writer.get_extra_info('peername')[:2]
+    start = time.time()
+    cache_stat = 'MISS'
+    if async_clients >= ASYNC_MAX_CLIENTS:
+        async_shed += 1
+        writer.write(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                     b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+        # seperti shed() threaded: FIN dulu, buang request yang sudah masuk supaya
+        # close() tidak jadi RST sebelum 503 terbaca klien
+        try:
+            await asyncio.wait_for(writer.drain(), 0.5)
+            if writer.can_write_eof(): writer.write_eof()
+            await asyncio.wait_for(reader.read(BUFFER_SIZE), 0.05)
+        except (asyncio.TimeoutError, OSError): pass
+        writer.close()
+        log('TCP', client_addr, upstreams.label, 'SHED', 0, 0.0, status=503)
+        return
+    async_clients += 1
+    m_connections.inc()
+    async_peak = max(async_peak, async_clients)
+    try:
+        try:
+            request = await read_request_async(reader)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return
+        if request.startswith(b'GET /metrics '):
+            writer.write(metrics_response())
+            await asyncio.wait_for(writer.drain(), TIMEOUT)
+            return
+        request, key = prepare_request(request)
+        
+        is_get = key is not None
+        if is_get:
+            t = time.perf_counter()
+            entry, fresh = cache.lookup(key, l2=False)
+            if fresh is None:
+                # L1 miss, L2 aktif: baca disk di executor, bukan di event loop
+                entry, fresh = await asyncio.get_running_loop().run_in_executor(
+                    None, cache.lookup_l2, key)
+            m_lookup.observe(time.perf_counter() - t)
+            if entry:
+                if not fresh: refresher.schedule(key, entry)
+                writer.write(entry.value)
+                await asyncio.wait_for(writer.drain(), TIMEOUT)
+                log('TCP', client_addr, upstreams.label, 
+                    'HIT' if fresh else 'STAL', len(entry.value), time.time()-start, status=200)
+                return
+        
+        call = leader = None
+        if is_get:
+            call, leader = async_flights.begin(key)
+            if not leader:
+                cache_stat = 'COAL'
+                if await serve_coalesced_async(call, writer, client_addr, start): return
+                call = None
+        
+        try:
+            try:
+                status, sent, body, backend, first_byte = await fetch_upstream_async(
+                    request, request.split(b' ', 1)[0], writer,
+                    CACHE_MAX_ENTRY if is_get else 0)
+            except RelayAborted:
+                log('TCP', client_addr, upstreams.label, 
+                    'ABRT', 0, time.time()-start)
+                return
+            except asyncio.TimeoutError:
+                if call: async_flights.finish(key, call, failure=504)
+                raise
+            except (UpstreamClosed, OSError, ValueError):
+                status = None
+            
+            if status is not None:
+                if call: async_flights.finish(key, call, response=body)
+                if cache_stat == 'MISS' and status == 200 and is_get and body is not None:
+                    store_response(key, body, request)
+                log('TCP', client_addr, backend.label, 
+                    cache_stat, len(request)+sent, time.time()-start,
+                    status=status, ttfb=first_byte - start)
+            else:
+                if call: async_flights.finish(key, call, failure=502)
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+                log('TCP', client_addr, upstreams.label, 
+                    cache_stat, 0, time.time()-start, status=502)
+        finally:
+            if call: async_flights.finish(key, call)
+    except asyncio.TimeoutError:
+        writer.write(b"HTTP/1.1 504 Gateway Timeout\r\n\r\n")
+        log('TCP', client_addr, upstreams.label, 
+            cache_stat, 0, time.time()-start, status=504)
+    except Exception: pass
+    finally:
+        async_clients -= 1
+        writer.close()
+
+async def udp_relay_async():
+    # relay UDP yang sama, socket-nya didaftarkan langsung ke event loop
+    loop = asyncio.get_running_loop()
+    sock = udp_listen_socket()
+    loop.add_reader(sock, udp_drain_clients, sock,
+                    lambda session: loop.add_reader(session.sock, udp_drain_replies, session, sock))
+    on_close = lambda session: loop.remove_reader(session.sock)
+    print(f"✅ UDP: Port {UDP_PORT} | NAT relay -> :{UDP_UPSTREAM_PORT}"
+          f"{' | local echo >= 500B' if UDP_LOCAL_ECHO else ''}")
+    try:
+        while running:
+            await asyncio.sleep(1)
+            udp_expire(on_close)
+    finally:
+        udp_expire(on_close, idle=0)
+        loop.remove_reader(sock)
+        sock.close()
+
+def raise_nofile_limit():
+    # ribuan klien bersamaan butuh ribuan fd; naikkan soft limit ke hard limit (Unix saja)
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard != resource.RLIM_INFINITY else 65536
+    if soft < target:
+        try: resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError): pass
+
+async def async_main():
+    udp_task = asyncio.create_task(udp_relay_async())
+    server = await asyncio.start_server(
+        async_tcp_handler, PROXY_HOST, TCP_PORT,
+        backlog=ASYNC_BACKLOG, reuse_address=True, limit=RELAY_BUF_SIZE)
+    print(f"✅ TCP: Port {TCP_PORT} | asyncio | Max clients: {ASYNC_MAX_CLIENTS}")
+    print("📊 Stats setiap 10 detik")
+    print("="*50)
+    async with server:
+        while running:
+            await asyncio.sleep(0.5)
+    udp_task.cancel()
+
 # ========== MAIN SERVER ==========
-def start_proxy():
-    global running, pool
+def start_background():
+    global upstreams
+    upstreams = Balancer(UPSTREAMS or [(WEB_SERVER_IP, WEB_SERVER_PORT)], LB_STRATEGY)
+    if L2_CACHE_PATH and cache.l2 is None:
+        cache.attach_l2(diskcache.DiskCache(L2_CACHE_PATH, L2_CACHE_MAX_BYTES))
     
     print("="*50)
-    print(f"🚀 PROXY | TCP:{TCP_PORT} | UDP:{UDP_PORT}")
-    print(f"📡 Target: {WEB_SERVER_IP}:{WEB_SERVER_PORT}")
+    print(f"🚀 PROXY | TCP:{TCP_PORT} | UDP:{UDP_PORT} | Engine: {engine}")
+    print(f"📡 Target: {', '.join(b.label for b in upstreams.backends)} | LB: {LB_STRATEGY}")
+    if cache.l2 is not None:
+        d = cache.l2.stats()
+        print(f"💾 L2: {L2_CACHE_PATH} | {d['entries']} entries dimuat "
+              f"dalam {d['rebuild_time'] * 1000:.0f}ms")
     print("="*50)
     
-    pool = ThreadPool(MAX_THREADS)
-    
-    threading.Thread(target=udp_server, daemon=True).start()
+    accesslog.start()
     threading.Thread(target=cache_cleaner, daemon=True).start()
+    threading.Thread(target=refresh_scheduler, daemon=True).start()
     threading.Thread(target=stats_monitor, daemon=True).start()
+    threading.Thread(target=health_checker, daemon=True).start()
+
+def start_proxy_async():
+    global running
+    
+    cache.defer_demote = True   # demote eviction lewat cache_cleaner, bukan di event loop
+    start_background()
+    raise_nofile_limit()
+    try:
+        asyncio.run(async_main())
+    except KeyboardInterrupt:
+        print("\n⚠️  Shutting down...")
+    running = False
+    cache.checkpoint()
+
+def start_proxy():
+    global running, pool
+    
+    pool = ThreadPool(MAX_THREADS, QUEUE_DEPTH, OVERLOAD_POLICY, QUEUE_DEADLINE, reject=shed)
+    start_background()
+    threading.Thread(target=udp_server, daemon=True).start()
     
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.bind((PROXY_HOST, TCP_PORT))
     sock.listen(100)
     sock.settimeout(1.0)
-    print(f"✅ TCP: Port {TCP_PORT} | Threads: {MAX_THREADS}")
-    print("📊 Stats setiap 10 detik")
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda *_: adjust_threads(THREAD_STEP))
+        signal.signal(signal.SIGUSR2, lambda *_: adjust_threads(-THREAD_STEP))
+    print(f"✅ TCP: Port {TCP_PORT} | Threads: {MAX_THREADS} | Queue: {pool.queue_cap} ({OVERLOAD_POLICY})")
+    print(f"📊 Stats setiap 10 detik | kill -USR1/-USR2 {os.getpid()}: worker ±{THREAD_STEP}")
     print("="*50)
     
     try:
         while running:
+            # MAX_THREADS diubah saat runtime lewat SIGUSR1/SIGUSR2; pool ikut menyesuaikan
+            if pool.size != MAX_THREADS: pool.resize(MAX_THREADS)
             try:
                 client, addr = sock.accept()
+                m_connections.inc()
                 pool.submit(tcp_handler, (client, addr))
             except socket.timeout:
                 continue
@@ -193,20 +1659,71 @@ def start_proxy():
     
     running = False
     sock.close()
+    cache.checkpoint()
     time.sleep(1)
      
+def parse_args():
+    # tiap opsi juga bisa diisi lewat environment (PROXY_*), CLI tetap menang
+    env = os.environ.get
+    ap = argparse.ArgumentParser(description="Caching proxy socket programming")
+    ap.add_argument("--engine", choices=("threaded", "async"), default=env("PROXY_ENGINE", "threaded"),
+                    help="threaded: worker pool, satu thread per klien | "
+                         "async: satu event loop untuk ribuan klien (env PROXY_ENGINE)")
+    ap.add_argument("--host", default=env("PROXY_HOST", PROXY_HOST), help="alamat bind, env PROXY_HOST")
+    ap.add_argument("--port", type=int, default=int(env("PROXY_PORT", TCP_PORT)),
+                    help="port HTTP proxy, env PROXY_PORT")
+    ap.add_argument("--udp-port", type=int, default=int(env("PROXY_UDP_PORT", UDP_PORT)),
+                    help="port UDP proxy, env PROXY_UDP_PORT")
+    ap.add_argument("--upstream", action="append", metavar="HOST:PORT",
+                    help="web server tujuan, boleh diulang (default WEB_SERVER_IP:WEB_SERVER_PORT); "
+                         "env PROXY_UPSTREAMS dipisah koma")
+    ap.add_argument("--udp-upstream-port", type=int,
+                    default=int(env("PROXY_UDP_UPSTREAM_PORT", UDP_UPSTREAM_PORT)),
+                    help="port UDP echo di web server, env PROXY_UDP_UPSTREAM_PORT")
+    ap.add_argument("--max-threads", type=int, default=int(env("PROXY_MAX_THREADS", MAX_THREADS)),
+                    help="worker engine threaded, env PROXY_MAX_THREADS")
+    ap.add_argument("--lb", choices=("round_robin", "least_conn", "hash"), default=LB_STRATEGY,
+                    help="strategi load balancing; hash = per path, cache tiap backend lebih efektif")
+    ap.add_argument("--l2-cache", metavar="PATH",
+                    help="aktifkan cache L2 di disk (file append-only, tetap hangat setelah restart)")
+    ap.add_argument("--l2-max-mb", type=int, default=L2_CACHE_MAX_BYTES // (1024 * 1024),
+                    help="batas ukuran data hidup di cache L2 (MB)")
+    ap.add_argument("--udp-echo", action="store_true",
+                    help="datagram >= 500 B dipantulkan proxy sendiri, tidak diteruskan ke web server")
+    args = ap.parse_args()
+    # append + default list akan menggabungkan env dan CLI; env hanya dipakai kalau CLI kosong
+    args.upstream = args.upstream or [u for u in env("PROXY_UPSTREAMS", "").split(",") if u.strip()]
+    return args
+
+def parse_hostport(value):
+    host, _, port = value.rpartition(':')
+    return host or value, int(port) if port.isdigit() else WEB_SERVER_PORT
+
 if __name__ == "__main__":
+    args = parse_args()
+    engine, LB_STRATEGY = args.engine, args.lb
+    PROXY_HOST, TCP_PORT, UDP_PORT = args.host, args.port, args.udp_port
+    UDP_UPSTREAM_PORT, MAX_THREADS = args.udp_upstream_port, args.max_threads
+    UPSTREAMS = [parse_hostport(u) for u in args.upstream or []]
+    L2_CACHE_PATH, L2_CACHE_MAX_BYTES = args.l2_cache, args.l2_max_mb * 1024 * 1024
+    UDP_LOCAL_ECHO = args.udp_echo
     try:
-        start_proxy()
+        if engine == 'async': start_proxy_async()
+        else: start_proxy()
     except KeyboardInterrupt:
         print("\n🛑 Forced exit")
         print("\n" + "="*50)
         s = cache.stats()
         print(f"📊 FINAL STATS")
         print("-"*50)
-        print(f"• Threads: {pool.active}/{MAX_THREADS}")
+        if pool is not None:
+            p = pool.stats()
+            print(f"• Threads: {p['active']}/{MAX_THREADS} | Rejected: {p['rejected']} | Expired: {p['expired']}")
+        else:
+            print(f"• Async clients peak: {async_peak} | Shed: {async_shed}")
         print(f"• Cache: {s['hits']}H/{s['misses']}M ({s['rate']:.1f}%)")
         print(f"• Cache Size: {s['size']} items")
+        print(f"• Stale served: {s['stale_hits']} | Refreshed: {refresher.refreshed} | 304: {refresher.not_modified}")
         print("="*50)
         print("✅ Proxy stopped")
         print("="*50)
\ No newline at end of file
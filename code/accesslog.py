@@ -0,0 +1,149 @@
+# ========== ACCESS LOG NON-BLOCKING ==========
+# Dipakai bersama oleh web.py dan Proxy.py.
+# Thread request hanya memasukkan tuple (ts, formatter, args) ke antrean;
+# formatting (datetime, f-string) dan write ke stdout/file dikerjakan thread
+# writer di background secara batch, jadi logging tidak pernah menahan request.
+#
+# Konfigurasi lewat configure(...) atau environment:
+#   ACCESSLOG_FILE    path file log (default: stdout), dirotasi per ukuran
+#   ACCESSLOG_SAMPLE  0.0-1.0, fraksi record yang dicatat (default 1.0)
+import atexit
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+QUEUE_MAX      = 65536          # record di antrean; lebih dari ini -> drop
+FLUSH_INTERVAL = 0.2            # detik antar batch
+WAKE_AT        = 4096           # antrean sepanjang ini -> writer dibangunkan sebelum interval
+MAX_BYTES      = 10 * 1024 * 1024
+BACKUPS        = 3
+
+sample_rate = float(os.environ.get("ACCESSLOG_SAMPLE", "1.0"))
+log_file = os.environ.get("ACCESSLOG_FILE") or None
+
+_queue = deque()                # append/popleft atomik di CPython, tanpa lock
+_wake = threading.Event()       # di-set emit() saat burst, supaya antrean tidak sampai penuh
+_drop_lock = threading.Lock()   # hanya dipakai di jalur drop (jarang)
+_flush_lock = threading.Lock()  # flush() dari thread writer vs main thread (shutdown/atexit)
+_writer = None
+_out = None
+_out_size = 0
+
+dropped = 0
+sampled_out = 0
+written = 0
+
+
+def configure(sample=None, path=None, queue_max=None):
+    global sample_rate, log_file, QUEUE_MAX
+    if sample is not None:
+        sample_rate = max(0.0, min(1.0, sample))
+    if path is not None:
+        log_file = path or None
+    if queue_max is not None:
+        QUEUE_MAX = queue_max
+
+
+def emit(fmt, *args):
+    # fmt(ts, *args) -> str, dipanggil nanti oleh thread writer
+    global dropped, sampled_out
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        sampled_out += 1   # perkiraan; tidak perlu presisi
+        return
+    n = len(_queue)
+    if n >= QUEUE_MAX:
+        with _drop_lock:
+            dropped += 1
+        return
+    _queue.append((time.time(), fmt, args))
+    if n >= WAKE_AT and not _wake.is_set():
+        _wake.set()
+
+
+def start():
+    # idempotent; dipanggil sekali per proses (setelah fork juga)
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    _writer = threading.Thread(target=_run, name="accesslog", daemon=True)
+    _writer.start()
+
+
+def stats():
+    return {"queued": len(_queue), "written": written,
+            "dropped": dropped, "sampled_out": sampled_out}
+
+
+def flush():
+    # drain + write di bawah satu lock: dua pemanggil bersamaan tidak saling
+    # rebut popleft() (IndexError) dan batch tetap tertulis sesuai urutan
+    global written
+    with _flush_lock:
+        lines = []
+        popleft = _queue.popleft
+        while _queue:
+            ts, fmt, args = popleft()
+            try:
+                lines.append(fmt(ts, *args))
+            except Exception as e:
+                lines.append(f"[LOG-ERROR] {fmt.__name__}: {e}")
+        if not lines:
+            return
+        _write("\n".join(lines) + "\n")
+        written += len(lines)
+
+
+def _run():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            print(f"[LOG-ERROR] {e}", file=sys.stderr)
+
+
+def _write(text):
+    global _out, _out_size
+    if log_file is None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        return
+    if _out is None:
+        _out = open(log_file, "a", encoding="utf-8")
+        _out_size = _out.tell()
+    _out.write(text)
+    _out.flush()
+    _out_size += len(text)
+    if _out_size >= MAX_BYTES:
+        _rotate()
+
+
+def _rotate():
+    # access.log -> access.log.1 -> ... -> access.log.BACKUPS
+    global _out, _out_size
+    _out.close()
+    for i in range(BACKUPS - 1, 0, -1):
+        src = f"{log_file}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{log_file}.{i + 1}")
+    os.replace(log_file, f"{log_file}.1")
+    _out = open(log_file, "a", encoding="utf-8")
+    _out_size = 0
+
+
+def _after_fork():
+    # thread writer tidak ikut ter-fork; worker baru mulai dengan antrean kosong
+    global _writer, _out, _flush_lock
+    _writer = None
+    _out = None
+    _flush_lock = threading.Lock()   # bisa saja sedang dipegang thread lain saat fork
+    _queue.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+atexit.register(flush)
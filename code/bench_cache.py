@@ -0,0 +1,73 @@
+# ========== MICRO-BENCHMARK CACHE PROXY ==========
+# Bandingkan throughput get/set dan biaya clean() antara Cache lama (dict +
+# scan penuh) dengan Cache baru di Proxy.py (LRU + expiry heap).
+#   python code/bench_cache.py [jumlah_key]
+import random
+import sys
+import time
+
+from Proxy import Cache
+
+
+class LegacyCache:
+    # salinan Cache sebelum LRU/heap, sebagai baseline
+    def __init__(self, timeout=15):
+        self.cache = {}
+        self.hits = self.misses = 0
+        self.timeout = timeout
+
+    def get(self, key):
+        if key in self.cache:
+            val, t = self.cache[key]
+            if time.time() - t > self.timeout:
+                del self.cache[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return val
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.cache[key] = (value, time.time())
+
+    def clean(self):
+        expired = [k for k, (_, t) in self.cache.items()
+                   if time.time() - t > self.timeout]
+        for k in expired:
+            del self.cache[k]
+        return len(expired)
+
+
+def bench(name, cache, keys, value, ops):
+    for k in keys:
+        cache.set(k, value)
+
+    t = time.perf_counter()
+    for k in keys:
+        cache.set(k, value)
+    set_rate = len(keys) / (time.perf_counter() - t)
+
+    lookups = [random.choice(keys) for _ in range(ops)]
+    t = time.perf_counter()
+    for k in lookups:
+        cache.get(k)
+    get_rate = ops / (time.perf_counter() - t)
+
+    # clean() tanpa ada yang kedaluwarsa: biaya yang dibayar cache_cleaner tiap 5 detik
+    t = time.perf_counter()
+    for _ in range(100):
+        cache.clean()
+    clean_us = (time.perf_counter() - t) / 100 * 1e6
+
+    print(f"{name:8} | set {set_rate:12,.0f}/s | get {get_rate:12,.0f}/s | "
+          f"clean {clean_us:10,.1f} us")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    keys = [f"GET /page{i}.html HTTP/1.1" for i in range(n)]
+    value = b"x" * 512
+    print(f"keys={n} value={len(value)}B")
+    bench("legacy", LegacyCache(15), keys, value, 500_000)
+    bench("lru+heap", Cache(15, max_bytes=n * 1024, max_entries=n), keys, value, 500_000)
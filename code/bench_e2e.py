@@ -0,0 +1,497 @@
+# ========== BENCHMARK END-TO-END (LOOPBACK) ==========
+# Menjalankan rantai client -> proxy -> web server di 127.0.0.1 dengan skenario
+# tetap, lalu menyimpan hasilnya ke riwayat JSON supaya perubahan performa
+# bisa dibandingkan antar commit.
+#
+#   python code/bench_e2e.py list
+#   python code/bench_e2e.py run [--scenario warm-small-c10 ...] [--duration 5]
+#                                [--delay-ms 2 --loss 0.01] [--check]
+#   python code/bench_e2e.py compare [--max-throughput-drop 10 --max-p99-rise 20]
+#
+# web.py dan Proxy.py dijalankan sebagai proses terpisah di port bebas, dengan
+# folder static sementara (small.html 1 KB, large.bin 512 KB). Client memakai
+# load_test()/udp_qos_test() dari clientfix.py langsung. Run dibatalkan tanpa
+# menyentuh riwayat kalau warm-up lewat rantai gagal atau p50 suatu skenario
+# melewati timeout web server (hasil macet, bukan angka performa).
+#
+# --delay-ms/--loss memasang relay di antara proxy dan web server (pengganti
+# `tc netem`, tanpa root). TCP tidak bisa kehilangan byte di atas socket, jadi
+# "loss" TCP dimodelkan sebagai tambahan delay RTO (TCP_LOSS_PENALTY) pada
+# segmen yang terkena, urutan tetap terjaga. Datagram UDP benar-benar dibuang.
+#
+# compare membandingkan run terakhir dengan run sebelumnya (konfigurasi sama)
+# dan keluar dengan kode 1 kalau throughput turun atau p99 naik melebihi batas.
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import resource
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import clientfix
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOST = "127.0.0.1"
+HISTORY_FILE = "bench_history.json"
+SMALL_SIZE = 1024
+LARGE_SIZE = 512 * 1024
+START_TIMEOUT = 10.0
+SERVER_TIMEOUT = 5.0            # = TIMEOUT di web.py; p50 di atas ini berarti rantai macet
+TCP_LOSS_PENALTY = 0.2          # detik, kira-kira RTO minimum Linux
+UDP_PROBE_COUNT = 500
+UDP_PROBE_RATE = 200
+
+# nama -> parameter; rate 0 = closed-loop (tiap koneksi kirim request berikutnya
+# segera setelah response), jadi throughput = kapasitas rantai
+SCENARIOS = {
+    "cold-small-c10":        {"web": "threaded", "cache": "cold", "path": "/small.html", "clients": 10},
+    "single-cold-small-c10": {"web": "single",   "cache": "cold", "path": "/small.html", "clients": 10},
+    "warm-small-c1":         {"web": "threaded", "cache": "warm", "path": "/small.html", "clients": 1},
+    "warm-small-c10":        {"web": "threaded", "cache": "warm", "path": "/small.html", "clients": 10},
+    "warm-small-c100":       {"web": "threaded", "cache": "warm", "path": "/small.html", "clients": 100},
+    "warm-small-c1000":      {"web": "threaded", "cache": "warm", "path": "/small.html", "clients": 1000},
+    "cold-large-c10":        {"web": "threaded", "cache": "cold", "path": "/large.bin",  "clients": 10},
+    "warm-large-c10":        {"web": "threaded", "cache": "warm", "path": "/large.bin",  "clients": 10},
+    "udp-probe":             {"web": "threaded", "udp": True},
+}
+
+
+# ========== RELAY (NETEM-STYLE) ==========
+
+class _UdpRelay(asyncio.DatagramProtocol):
+    # satu socket sisi proxy + satu socket ke web per alamat proxy (NAT sederhana)
+    def __init__(self, target, delay, loss, rng):
+        self.target, self.delay, self.loss, self.rng = target, delay, loss, rng
+        self.sessions = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        loop = asyncio.get_running_loop()
+        if self.rng.random() < self.loss:
+            return
+        up = self.sessions.get(addr)
+        if up is None:
+            up = self.sessions[addr] = _UdpUpstream(self, addr)
+            loop.create_task(loop.create_datagram_endpoint(lambda: up, remote_addr=self.target))
+        loop.call_later(self.delay, up.send, data)
+
+
+class _UdpUpstream(asyncio.DatagramProtocol):
+    def __init__(self, relay, client):
+        self.relay, self.client = relay, client
+        self.transport = None
+        self.pending = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        for data in self.pending:
+            transport.sendto(data)
+        self.pending = []
+
+    def send(self, data):
+        if self.transport is None:
+            self.pending.append(data)
+        else:
+            self.transport.sendto(data)
+
+    def datagram_received(self, data, addr):
+        relay = self.relay
+        if relay.rng.random() < relay.loss:
+            return
+        asyncio.get_running_loop().call_later(relay.delay, relay.transport.sendto, data, self.client)
+
+
+async def _pipe(reader, writer, delay, loss, rng):
+    # tiap chunk dijadwalkan pada waktu tiba + delay (+ penalti RTO bila "hilang");
+    # waktu kirim tidak pernah mundur supaya urutan byte tetap
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    async def sender():
+        while True:
+            due, data = await queue.get()
+            wait = due - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if data is None:
+                break
+            writer.write(data)
+            await writer.drain()
+
+    task = loop.create_task(sender())
+    last_due = 0.0
+    try:
+        while True:
+            data = await reader.read(65536)
+            due = loop.time() + delay
+            if data and rng.random() < loss:
+                due += TCP_LOSS_PENALTY
+            last_due = max(last_due, due)
+            await queue.put((last_due, data or None))
+            if not data:
+                break
+        await task
+    except (ConnectionError, OSError):
+        task.cancel()
+    finally:
+        writer.close()
+
+
+async def run_relay(listen_port, target_port, udp_listen, udp_target, delay, loss, seed):
+    rng = random.Random(seed)
+
+    async def handle(c_reader, c_writer):
+        try:
+            u_reader, u_writer = await asyncio.open_connection(HOST, target_port)
+        except OSError:
+            c_writer.close()
+            return
+        await asyncio.gather(_pipe(c_reader, u_writer, delay, loss, rng),
+                             _pipe(u_reader, c_writer, delay, loss, rng),
+                             return_exceptions=True)
+
+    server = await asyncio.start_server(handle, HOST, listen_port, backlog=1024)
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(lambda: _UdpRelay((HOST, udp_target), delay, loss, rng),
+                                        local_addr=(HOST, udp_listen))
+    async with server:
+        await server.serve_forever()
+
+
+# ========== PROSES ==========
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def http_status(port, path, timeout=1.0):
+    # satu request HTTP lengkap; hasil: kode status (0 kalau response tidak valid)
+    with socket.create_connection((HOST, port), timeout) as s:
+        s.sendall(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n".encode())
+        head = b""
+        while b"\r\n" not in head:
+            data = s.recv(4096)
+            if not data:
+                break
+            head += data
+    parts = head.split(b"\r\n", 1)[0].split()
+    return int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+
+def wait_ready(port, proc, timeout=START_TIMEOUT):
+    # siap = GET /metrics dijawab 200. Connect lalu close kosong tidak dipakai:
+    # di proxy itu jadi request kosong yang bisa menahan web server mode single
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[2]} keluar dengan kode {proc.returncode}")
+        try:
+            if http_status(port, "/metrics") == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"port {port} tidak menjawab GET /metrics dalam {timeout:.0f} detik")
+
+
+def make_workdir():
+    # isi acak supaya ukuran di kabel = ukuran file (tidak terkompresi gzip)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    static = os.path.join(workdir, "static")
+    os.makedirs(static)
+    rng = random.Random(1)
+    with open(os.path.join(static, "small.html"), "w") as f:
+        f.write("".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(SMALL_SIZE)))
+    with open(os.path.join(static, "large.bin"), "wb") as f:
+        f.write(rng.randbytes(LARGE_SIZE))
+    return workdir
+
+
+class Stack:
+    # web.py + (relay) + Proxy.py di loopback; dipakai sebagai context manager
+    def __init__(self, web_mode, proxy_engine, delay_ms=0.0, loss=0.0, workdir=None):
+        self.web_mode, self.proxy_engine = web_mode, proxy_engine
+        self.delay_ms, self.loss = delay_ms, loss
+        self.workdir = workdir
+        self.procs = []
+        self.logs = []
+
+    def _spawn(self, name, args):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "wb")
+        env = dict(os.environ, ACCESSLOG_SAMPLE="0", PYTHONUNBUFFERED="1")
+        proc = subprocess.Popen([sys.executable, "-u"] + args, cwd=self.workdir, env=env,
+                                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        self.procs.append(proc)
+        self.logs.append(log)
+        return proc
+
+    def __enter__(self):
+        web_port, web_udp = free_port(), free_port(socket.SOCK_DGRAM)
+        self.proxy_port, self.proxy_udp = free_port(), free_port(socket.SOCK_DGRAM)
+        try:
+            web = self._spawn("web", [os.path.join(HERE, "web.py"), "--mode", self.web_mode,
+                                      "--host", HOST, "--port", str(web_port),
+                                      "--udp-port", str(web_udp), "--log-sample", "0"])
+            wait_ready(web_port, web)
+            up_port, up_udp = web_port, web_udp
+            if self.delay_ms or self.loss:
+                up_port, up_udp = free_port(), free_port(socket.SOCK_DGRAM)
+                relay = self._spawn("relay", [os.path.abspath(__file__), "relay",
+                                              str(up_port), str(web_port), str(up_udp), str(web_udp),
+                                              "--delay-ms", str(self.delay_ms), "--loss", str(self.loss)])
+                wait_ready(up_port, relay)
+            proxy = self._spawn("proxy", [os.path.join(HERE, "Proxy.py"), "--engine", self.proxy_engine,
+                                          "--host", HOST, "--port", str(self.proxy_port),
+                                          "--udp-port", str(self.proxy_udp),
+                                          "--upstream", f"{HOST}:{up_port}",
+                                          "--udp-upstream-port", str(up_udp)])
+            wait_ready(self.proxy_port, proxy)
+            # warm-up: satu request lewat seluruh rantai (GET /metrics dijawab proxy sendiri)
+            try:
+                status = http_status(self.proxy_port, "/small.html?warmup", SERVER_TIMEOUT)
+            except OSError as e:
+                status = repr(e)
+            if status != 200:
+                raise RuntimeError(f"warm-up client -> proxy -> web gagal (status {status})")
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        # SIGINT = Ctrl+C, jalur shutdown normal kedua server
+        for proc in reversed(self.procs):
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+        for proc in self.procs:
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        for log in self.logs:
+            log.close()
+        self.procs, self.logs = [], []
+
+
+# ========== SKENARIO ==========
+
+def raise_nofile_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def run_scenario(name, stack, duration, rate):
+    sc = SCENARIOS[name]
+    if sc.get("udp"):
+        count = max(UDP_PROBE_COUNT, int(duration * UDP_PROBE_RATE))
+        r = clientfix.udp_qos_test(packet_count=count, packet_size=512, rate=UDP_PROBE_RATE,
+                                   host=HOST, port=stack.proxy_udp, save=False)
+        return {"throughput_pps": r["received"] / r["duration_s"] if r["duration_s"] else 0.0,
+                "p50_ms": r["latency_ms"].get("p50", 0.0), "p99_ms": r["latency_ms"].get("p99", 0.0),
+                "loss_pct": r["loss_pct"], "jitter_ms": r["jitter_rfc3550_ms"], "samples": r["received"]}
+
+    common = dict(host=HOST, port=stack.proxy_port, paths=sc["path"], keep_alive=True, save=False)
+    if sc["cache"] == "warm":
+        # isi cache proxy dulu; hasil pemanasan tidak dicatat
+        clientfix.load_test(connections=1, rate=0, duration=0.5, seed=0, **common)
+    r = clientfix.load_test(connections=sc["clients"], rate=rate, duration=duration, seed=1,
+                            cache_bust=sc["cache"] == "cold", **common)
+    # hasil macet jangan sampai masuk riwayat sebagai baseline
+    p50 = r["latency_ms"]["p50"]
+    if not r["completed"] or p50 >= SERVER_TIMEOUT * 1000:
+        raise RuntimeError(f"{name}: p50 {p50:.0f} ms dari {r['completed']} request melewati "
+                           f"timeout server {SERVER_TIMEOUT:g}s, run dibatalkan")
+    # throughput = response sukses saja; 503 dari shed proxy cepat dan akan menggelembungkannya
+    good = r["completed"] - r["http_errors"]
+    return {"throughput_rps": good / r["elapsed_s"] if r["elapsed_s"] else 0.0,
+            "throughput_bps": r["throughput_bps"],
+            "p50_ms": r["latency_ms"]["p50"], "p99_ms": r["latency_ms"]["p99"],
+            "errors": r["errors"] + r["http_errors"], "samples": r["completed"]}
+
+
+def run_all(names, duration, rate, delay_ms, loss, proxy_engine):
+    raise_nofile_limit()
+    workdir = make_workdir()
+    results = {}
+    try:
+        # satu stack per mode web; tiap skenario cold pakai query unik jadi tidak saling hangatkan
+        for mode in dict.fromkeys(SCENARIOS[n]["web"] for n in names):
+            group = [n for n in names if SCENARIOS[n]["web"] == mode]
+            with Stack(mode, proxy_engine, delay_ms, loss, workdir) as stack:
+                for name in group:
+                    print(f"\n>>> {name} (web={mode}, proxy={proxy_engine})")
+                    results[name] = run_scenario(name, stack, duration, rate)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# ========== RIWAYAT + PERBANDINGAN ==========
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                             capture_output=True, text=True, timeout=5)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True, timeout=5).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp, path)
+
+
+def throughput(result):
+    return result.get("throughput_rps", result.get("throughput_pps", 0.0))
+
+
+def compare(base, head, max_drop, max_rise, min_p99):
+    # hasil: daftar regresi (string); skenario yang tidak ada di keduanya dilewati
+    regressions = []
+    print(f"\n{'scenario':24} {'thrpt base':>11} {'thrpt now':>11} {'diff':>7} "
+          f"{'p99 base':>9} {'p99 now':>9} {'diff':>7}")
+    for name, now in head["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            continue
+        t_old, t_new = throughput(old), throughput(now)
+        t_diff = (t_new - t_old) / t_old * 100 if t_old else 0.0
+        p_diff = (now["p99_ms"] - old["p99_ms"]) / old["p99_ms"] * 100 if old["p99_ms"] else 0.0
+        flag = ""
+        if t_diff < -max_drop:
+            regressions.append(f"{name}: throughput {t_diff:+.1f}% (batas -{max_drop:g}%)")
+            flag = " <- REGRESI"
+        # p99 di bawah min_p99 ms terlalu dekat noise scheduler untuk dinilai
+        if p_diff > max_rise and now["p99_ms"] >= min_p99:
+            regressions.append(f"{name}: p99 {p_diff:+.1f}% (batas +{max_rise:g}%)")
+            flag = " <- REGRESI"
+        print(f"{name:24} {t_old:11.1f} {t_new:11.1f} {t_diff:+6.1f}% "
+              f"{old['p99_ms']:9.2f} {now['p99_ms']:9.2f} {p_diff:+6.1f}%{flag}")
+    return regressions
+
+
+def check_history(history, max_drop, max_rise, min_p99):
+    # run terakhir vs run sebelumnya dengan config (durasi, delay, loss, engine) yang sama
+    if not history:
+        print("Riwayat kosong, jalankan `run` dulu.")
+        return 0
+    head = history[-1]
+    base = next((h for h in reversed(history[:-1]) if h["config"] == head["config"]), None)
+    if base is None:
+        print("Belum ada run pembanding dengan konfigurasi yang sama.")
+        return 0
+    print(f"base: {base['time']} {base['commit']} | now: {head['time']} {head['commit']}")
+    regressions = compare(base, head, max_drop, max_rise, min_p99)
+    if regressions:
+        print("\nREGRESI:")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1
+    print("\nOK, tidak ada regresi.")
+    return 0
+
+
+# ========== CLI ==========
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmark end-to-end client -> proxy -> web di loopback")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="daftar skenario")
+
+    def compare_opts(p):
+        p.add_argument("--history", default=HISTORY_FILE)
+        p.add_argument("--max-throughput-drop", type=float, default=10.0, help="persen")
+        p.add_argument("--max-p99-rise", type=float, default=20.0, help="persen")
+        p.add_argument("--min-p99-ms", type=float, default=1.0,
+                       help="kenaikan p99 di bawah nilai ini tidak dihitung regresi")
+
+    run = sub.add_parser("run", help="jalankan skenario dan simpan ke riwayat")
+    run.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                     help="boleh diulang (default semua)")
+    run.add_argument("-d", "--duration", type=float, default=5.0, help="detik per skenario")
+    run.add_argument("-r", "--rate", type=float, default=0.0, help="req/detik, 0 = closed-loop")
+    run.add_argument("--delay-ms", type=float, default=0.0, help="delay satu arah proxy <-> web")
+    run.add_argument("--loss", type=float, default=0.0, help="probabilitas loss per segmen/datagram")
+    run.add_argument("--proxy-engine", choices=("threaded", "async"), default="threaded")
+    run.add_argument("--label", help="catatan bebas di entri riwayat")
+    run.add_argument("--check", action="store_true", help="langsung bandingkan dengan run sebelumnya")
+    compare_opts(run)
+
+    cmp = sub.add_parser("compare", help="bandingkan run terakhir dengan run sebelumnya")
+    compare_opts(cmp)
+
+    relay = sub.add_parser("relay", help=argparse.SUPPRESS)
+    relay.add_argument("listen", type=int)
+    relay.add_argument("target", type=int)
+    relay.add_argument("udp_listen", type=int)
+    relay.add_argument("udp_target", type=int)
+    relay.add_argument("--delay-ms", type=float, default=0.0)
+    relay.add_argument("--loss", type=float, default=0.0)
+    relay.add_argument("--seed", type=int, default=1)
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "list":
+        for name, sc in SCENARIOS.items():
+            print(f"{name:24} {sc}")
+    elif args.command == "relay":
+        try:
+            asyncio.run(run_relay(args.listen, args.target, args.udp_listen, args.udp_target,
+                                  args.delay_ms / 1000, args.loss, args.seed))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "compare":
+        sys.exit(check_history(load_history(args.history), args.max_throughput_drop,
+                               args.max_p99_rise, args.min_p99_ms))
+    else:
+        names = args.scenario or list(SCENARIOS)
+        try:
+            results = run_all(names, args.duration, args.rate, args.delay_ms, args.loss,
+                              args.proxy_engine)
+        except RuntimeError as e:
+            sys.exit(f"GAGAL: {e} (riwayat tidak diubah)")
+        config = {"duration": args.duration, "rate": args.rate, "delay_ms": args.delay_ms,
+                  "loss": args.loss, "proxy_engine": args.proxy_engine}
+        entry = {"time": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "commit": git_commit(), "label": args.label, "config": config, "results": results}
+        history = load_history(args.history)
+        history.append(entry)
+        save_history(args.history, history)
+
+        print("\n" + "=" * 70)
+        for name, r in results.items():
+            extra = f"err {r['errors']}" if "errors" in r else f"loss {r['loss_pct']:.1f}%"
+            print(f"{name:24} {throughput(r):10.1f}/s  p50 {r['p50_ms']:7.2f} ms  "
+                  f"p99 {r['p99_ms']:7.2f} ms  {extra}")
+        print(f"Riwayat disimpan ke {args.history} ({len(history)} run)")
+        if args.check:
+            sys.exit(check_history(history, args.max_throughput_drop,
+                                   args.max_p99_rise, args.min_p99_ms))
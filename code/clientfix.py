@@ -1,20 +1,27 @@
+import argparse
+import asyncio
 import datetime
+import itertools
+import json
+import math
+import random
 import socket
+import struct
 import threading
 import time
 import webbrowser
 import csv
 import webbrowser
 import os
-PROXY_IP = "192.168.26.180"   # IP Proxy Server
-TCP_PORT = 8080
-UDP_PORT = 9090
+PROXY_IP = os.environ.get("PROXY_IP", "192.168.26.180")   # IP Proxy Server
+TCP_PORT = int(os.environ.get("PROXY_TCP_PORT", 8080))
+UDP_PORT = int(os.environ.get("PROXY_UDP_PORT", 9090))
 
 
 # =========================================================
 #  MODE: HTTP via TCP
 # ========================================================= 
-def http_request(path="/"):
+def http_request(path="/", open_browser=True):
     try:
         client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         client.settimeout(8)
@@ -45,7 +52,8 @@ def http_request(path="/"):
         with open(filename, "w", encoding="utf-8") as f:
             f.write(response)
 
-        webbrowser.open(filename)
+        if open_browser:
+            webbrowser.open(filename)
 
         client.close()
 
@@ -56,61 +64,138 @@ def http_request(path="/"):
 # =========================================================
 #  MODE: UDP QoS Testing
 # =========================================================
-def udp_qos_test(packet_count=50, packet_size=512, interval=0.05):
-    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    client.settimeout(8)
+# Pengirim mengirim paket sesuai jadwal (t0 + i/rate) tanpa menunggu echo;
+# thread penerima mencocokkan echo lewat nomor urut di payload, jadi satu paket
+# hilang tidak menahan paket berikutnya. Payload: seq (uint32) + waktu kirim
+# perf_counter_ns (uint64) + padding. RTT diukur dengan clock monotonic yang sama.
+PROBE_HEADER = struct.Struct("!IQ")
+UDP_SOCK_BUF = 4 * 1024 * 1024
+UDP_DRAIN_TIMEOUT = 2.0    # detik menunggu echo setelah paket terakhir dikirim
+UDP_VERBOSE_MAX = 100      # tampilkan baris per paket hanya untuk test kecil
+
+
+class ProbeReceiver(threading.Thread):
+    def __init__(self, sock, packet_count):
+        super().__init__(daemon=True)
+        self.sock = sock
+        self.rtt_ns = [None] * packet_count
+        self.arrivals = []         # (seq, rtt_ns) urutan datang, untuk jitter
+        self.received = 0
+        self.duplicates = 0
+        self.reordered = 0         # datang setelah seq yang lebih besar
+        self.foreign = 0           # datagram bukan milik test ini
+        self.last_recv = None
+        self.stop = threading.Event()
+
+    def run(self):
+        buf = bytearray(65536)
+        view = memoryview(buf)
+        highest = -1
+        count = len(self.rtt_ns)
+        clock = time.perf_counter_ns
+        while not self.stop.is_set():
+            try:
+                n = self.sock.recv_into(buf)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self.stop.is_set():
+                    return
+                continue
+            now = clock()
+            if n < PROBE_HEADER.size:
+                self.foreign += 1
+                continue
+            seq, sent_ns = PROBE_HEADER.unpack_from(view)
+            if seq >= count:
+                self.foreign += 1
+                continue
+            if self.rtt_ns[seq] is not None:
+                self.duplicates += 1
+                continue
+            rtt = now - sent_ns
+            self.rtt_ns[seq] = rtt
+            self.arrivals.append((seq, rtt))
+            self.received += 1
+            self.last_recv = now
+            if seq < highest:
+                self.reordered += 1
+            else:
+                highest = seq
+
+
+def rfc3550_jitter(arrivals):
+    # J = J + (|D(i-1,i)| - J) / 16, D = selisih transit dua paket berurutan datang
+    jitter = 0.0
+    prev = None
+    for _, transit in arrivals:
+        if prev is not None:
+            jitter += (abs(transit - prev) - jitter) / 16.0
+        prev = transit
+    return jitter
+
+
+def udp_qos_test(packet_count=50, packet_size=512, interval=0.05, rate=None,
+                 host=None, port=None, drain=UDP_DRAIN_TIMEOUT, save=True):
+    # rate (paket/detik) menggantikan interval kalau diisi; rate <= 0 = secepatnya
+    host = host or PROXY_IP
+    port = port or UDP_PORT
+    if rate is None:
+        rate = 1.0 / interval if interval > 0 else 0
+    packet_size = max(packet_size, PROBE_HEADER.size)
+    verbose = packet_count <= UDP_VERBOSE_MAX
 
-    latencies = []          # hanya yang sukses (float ms)
-    per_packet = []         # panjang = packet_count, isi float ms atau None (LOST)
-    packet_sent = 0
-    packet_received = 0
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for opt in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+        try:
+            client.setsockopt(socket.SOL_SOCKET, opt, UDP_SOCK_BUF)
+        except OSError:
+            pass
+    client.connect((host, port))   # filter datagram dari alamat lain di kernel
+    client.settimeout(0.2)
 
-    test_start = None       # timestamp send paket pertama
-    test_end = None         # timestamp event terakhir (recv/timeout) paket terakhir
+    receiver = ProbeReceiver(client, packet_count)
+    receiver.start()
 
+    payload = bytearray(packet_size)
+    packet_sent = 0
+    send_errors = 0
+    clock = time.perf_counter_ns
+    step = int(1e9 / rate) if rate > 0 else 0
+    test_start = clock()
     for i in range(packet_count):
-        message = ("X" * packet_size).encode()
-
-        send_time = time.time()
-        if test_start is None:
-            test_start = send_time
-
+        if step:
+            # jadwal absolut: kalau tertinggal, kirim beruntun sampai kejar jadwal
+            delay = test_start + i * step - clock()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+        PROBE_HEADER.pack_into(payload, 0, i, clock())
         try:
-            client.sendto(message, (PROXY_IP, UDP_PORT))
+            client.send(payload)
             packet_sent += 1
-
-            data, _ = client.recvfrom(2048)
-            recv_time = time.time()
-
-            latency_ms = (recv_time - send_time) * 1000.0
-            latencies.append(latency_ms)
-            per_packet.append(latency_ms)
-            packet_received += 1
-
-            print(f"Packet {i+1}/{packet_count}, Latency: {latency_ms:.2f} ms")
-            test_end = recv_time  # update terus, terakhir = recv terakhir
-
-        except socket.timeout:
-            timeout_time = time.time()
-            per_packet.append(None)
-            print(f"Packet {i+1}/{packet_count}: LOST")
-            test_end = timeout_time  # terakhir = timeout terakhir (kalau paket terakhir lost)
-
-        # sleep hanya di antara paket, bukan setelah paket terakhir
-        if i != packet_count - 1:
-            time.sleep(interval)
-
+        except OSError:
+            send_errors += 1
+    send_end = clock()
+
+    # tunggu echo yang masih di jalan
+    deadline = time.perf_counter() + drain
+    while receiver.received < packet_sent and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    receiver.stop.set()
+    receiver.join()
     client.close()
 
     # ---------- QoS Calculation ----------
-    # durasi test yang "fair" (tanpa sleep setelah paket terakhir)
-    if test_start is None:
-        test_duration = 0.0
-    else:
-        # kalau semuanya lost dan test_end belum ke-set, pakai time.now()
-        if test_end is None:
-            test_end = time.time()
-        test_duration = max(0.0, test_end - test_start)
+    per_packet = [r / 1e6 if r is not None else None for r in receiver.rtt_ns]
+    latencies = [lat for lat in per_packet if lat is not None]
+    packet_received = receiver.received
+    test_end = max(send_end, receiver.last_recv or send_end)
+    test_duration = (test_end - test_start) / 1e9
+
+    if verbose:
+        for i, lat in enumerate(per_packet):
+            print(f"Packet {i+1}/{packet_count}, Latency: {lat:.2f} ms" if lat is not None
+                  else f"Packet {i+1}/{packet_count}: LOST")
 
     avg_latency = (sum(latencies) / len(latencies)) if latencies else 0.0
 
@@ -119,25 +204,42 @@ def udp_qos_test(packet_count=50, packet_size=512, interval=0.05):
         jitter = sum(abs(latencies[i] - latencies[i-1]) for i in range(1, len(latencies))) / (len(latencies) - 1)
     else:
         jitter = 0.0
+    jitter_rfc = rfc3550_jitter(receiver.arrivals) / 1e6
 
     packet_loss = ((packet_sent - packet_received) / packet_sent * 100.0) if packet_sent else 0.0
 
     # throughput berbasis payload murni (packet_size) dibagi durasi test
     if test_duration > 0:
         throughput = (packet_received * packet_size * 8) / test_duration  # bps
+        send_rate = packet_sent / ((send_end - test_start) / 1e9 or 1e-9)
     else:
-        throughput = 0.0
+        throughput = send_rate = 0.0
+
+    ordered = sorted(latencies)
+    pcts = {f"p{q:g}": percentile(ordered, q) for q in LOAD_PERCENTILES}
 
     print("\n===== QoS RESULT =====")
-    print(f"Sent: {packet_sent}")
+    print(f"Sent: {packet_sent} ({send_rate:.0f} pkt/s)" + (f", send errors {send_errors}" if send_errors else ""))
     print(f"Received: {packet_received}")
     print(f"Packet Loss: {packet_loss:.2f}%")
+    print(f"Reordered: {receiver.reordered} | Duplicates: {receiver.duplicates}")
     print(f"Avg Latency (RTT): {avg_latency:.2f} ms")
-    print(f"Jitter (avg |Δdelay|): {jitter:.2f} ms")
+    print("RTT: " + " | ".join(f"{k} {v:.3f} ms" for k, v in pcts.items()))
+    print(f"Jitter (RFC 3550): {jitter_rfc:.3f} ms | avg |Δdelay|: {jitter:.3f} ms")
     print(f"Throughput: {throughput:.2f} bps ({throughput/1000:.2f} kbps)")
     print(f"Test Duration: {test_duration:.4f} s")
     print("======================\n")
 
+    result = {"sent": packet_sent, "received": packet_received, "loss_pct": packet_loss,
+              "reordered": receiver.reordered, "duplicates": receiver.duplicates,
+              "send_errors": send_errors, "send_rate_pps": send_rate,
+              "latency_ms": dict(pcts, min=ordered[0] if ordered else 0.0,
+                                 mean=avg_latency, max=ordered[-1] if ordered else 0.0),
+              "jitter_rfc3550_ms": jitter_rfc, "jitter_avg_ms": jitter,
+              "throughput_bps": throughput, "duration_s": test_duration}
+    if not save:
+        return result
+
     # Save CSV
     with open("qos_result.csv", "w", newline="", encoding="utf-8-sig") as file:
         writer = csv.writer(file)
@@ -150,9 +252,16 @@ def udp_qos_test(packet_count=50, packet_size=512, interval=0.05):
         writer.writerow(["Packets Sent", packet_sent, "packets"])
         writer.writerow(["Packets Received", packet_received, "packets"])
         writer.writerow(["Packet Loss", f"{packet_loss:.2f}", "%"])
+        writer.writerow(["Packets Reordered", receiver.reordered, "packets"])
+        writer.writerow(["Duplicate Packets", receiver.duplicates, "packets"])
+        writer.writerow(["Send Errors", send_errors, "packets"])
+        writer.writerow(["Send Rate", f"{send_rate:.2f}", "packets/s"])
         writer.writerow(["Average Latency (RTT)", f"{avg_latency:.4f}", "ms"])
         writer.writerow(["Minimum Latency", f"{min(latencies):.4f}" if latencies else "0", "ms"])
         writer.writerow(["Maximum Latency", f"{max(latencies):.4f}" if latencies else "0", "ms"])
+        for name, value in pcts.items():
+            writer.writerow([f"Latency {name}", f"{value:.4f}", "ms"])
+        writer.writerow(["Jitter (RFC 3550)", f"{jitter_rfc:.4f}", "ms"])
         writer.writerow(["Jitter (avg |Δdelay|)", f"{jitter:.4f}", "ms"])
         writer.writerow(["Throughput (payload-based)", f"{throughput:.2f}", "bps"])
         writer.writerow(["Test Duration", f"{test_duration:.4f}", "seconds"])
@@ -164,23 +273,331 @@ def udp_qos_test(packet_count=50, packet_size=512, interval=0.05):
             writer.writerow([idx, f"{lat:.4f}" if lat is not None else "LOST"])
 
     print("QoS results saved to qos_result.csv")
+    return result
 
 
 # =========================================================
-#  MODE: MULTI CLIENT (5 parallel)
+#  MODE: LOAD TEST (open-loop, asyncio)
 # =========================================================
+# Request dijadwalkan pada waktu tetap (t0 + i/rate) tanpa menunggu response
+# sebelumnya. Latency diukur dari waktu JADWAL, bukan waktu kirim, jadi antrean
+# saat server lambat ikut terhitung (menghindari coordinated omission).
+# rate = 0 -> closed-loop: tiap koneksi kirim secepatnya (latency = service time).
+LOAD_CONNECTIONS = 50
+LOAD_RATE = 200            # request/detik total; 0 = closed-loop
+LOAD_DURATION = 10         # detik
+LOAD_PATHS = "/index.html"  # "path:bobot,..." mis. "/index.html:3,/test.html:1"
+LOAD_KEEPALIVE = True
+LOAD_TIMEOUT = 8
+LOAD_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def parse_path_mix(spec):
+    # "/a:3,/b" -> (["/a", "/b"], [3.0, 1.0])
+    paths, weights = [], []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        path, sep, weight = item.rpartition(":")
+        if not sep or not weight.replace(".", "", 1).isdigit():
+            path, weight = item, "1"
+        paths.append(path if path.startswith("/") else "/" + path)
+        weights.append(float(weight))
+    if not paths:
+        raise ValueError("path mix kosong")
+    return paths, weights
+
+
+def percentile(sorted_values, q):
+    # nearest-rank; sorted_values sudah terurut
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def read_http_response(reader, method="GET"):
+    # baca satu response penuh: Content-Length, chunked, atau sampai EOF
+    # hasil: (status, jumlah byte body, koneksi boleh dipakai lagi)
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ValueError(f"status line tidak valid: {lines[0]!r}")
+    status = int(parts[1])
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    conn = headers.get("connection", "").lower()
+    keep = ("close" not in conn) if parts[0] == "HTTP/1.1" else ("keep-alive" in conn)
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        return status, 0, keep
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        size = 0
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            n = int(line.split(b";", 1)[0], 16)
+            if n == 0:
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass   # trailer
+                return status, size, keep
+            await reader.readexactly(n + 2)
+            size += n
+    if "content-length" in headers:
+        n = int(headers["content-length"])
+        await reader.readexactly(n)
+        return status, n, keep
+    # tanpa framing: body berakhir saat server menutup koneksi
+    size = 0
+    while True:
+        chunk = await reader.read(65536)
+        if not chunk:
+            return status, size, False
+        size += len(chunk)
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []        # detik, dari waktu jadwal sampai response lengkap
+        self.service = []          # detik, dari kirim sampai response lengkap
+        self.statuses = {}
+        self.errors = {}           # jenis error -> jumlah
+        self.bytes = 0
+        self.connects = 0
+        self.timeline = {}         # detik ke- -> [ok, error, [latency]]
+        self.t0 = self.elapsed = 0.0
+        self.scheduled = self.unsent = self.max_backlog = 0
+
+    def record(self, second, latency, service, status, size):
+        self.latencies.append(latency)
+        self.service.append(service)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += size
+        slot = self.timeline.setdefault(second, [0, 0, []])
+        slot[0] += 1
+        slot[2].append(latency)
+
+    def error(self, second, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+        self.timeline.setdefault(second, [0, 0, []])[1] += 1
+
+
+async def load_worker(queue, stats, host, port, paths, weights, keep_alive, timeout, rng,
+                      bust=None):
+    # bust: itertools.count bersama; tiap request dapat query unik sehingga cache proxy selalu MISS
+    reader = writer = None
+    conn_header = "keep-alive" if keep_alive else "close"
+    try:
+        while True:
+            scheduled = await queue.get()
+            if scheduled is None:
+                return
+            path = rng.choices(paths, weights)[0]
+            if bust is not None:
+                path = f"{path}{'&' if '?' in path else '?'}nocache={next(bust)}"
+            second = int(scheduled - stats.t0)
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(host, port), timeout)
+                    stats.connects += 1
+                sent_at = time.perf_counter()
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                             f"Connection: {conn_header}\r\n\r\n".encode())
+                status, size, keep = await asyncio.wait_for(read_http_response(reader), timeout)
+                done = time.perf_counter()
+                stats.record(second, done - scheduled, done - sent_at, status, size)
+                if not (keep and keep_alive):
+                    writer.close()
+                    reader = writer = None
+            except asyncio.TimeoutError:
+                stats.error(second, "timeout")
+                reader, writer = None, _close_quietly(writer)
+            except (OSError, ValueError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError) as e:
+                stats.error(second, type(e).__name__)
+                reader, writer = None, _close_quietly(writer)
+    finally:
+        _close_quietly(writer)
+
+
+def _close_quietly(writer):
+    if writer is not None:
+        try:
+            writer.close()
+        except Exception:
+            pass
+    return None
+
+
+async def run_load(host, port, connections, rate, duration, paths, weights,
+                   keep_alive, timeout, seed=None, cache_bust=False):
+    stats = LoadStats()
+    queue = asyncio.Queue()
+    rng = random.Random(seed)
+    bust = itertools.count() if cache_bust else None
+    stats.t0 = t0 = time.perf_counter()
+    workers = [asyncio.ensure_future(load_worker(queue, stats, host, port, paths, weights,
+                                                 keep_alive, timeout, rng, bust))
+               for _ in range(connections)]
+    if rate > 0:
+        # open-loop: jadwal absolut, sleep tidak menumpuk drift
+        interval = 1.0 / rate
+        total = int(duration * rate)
+        for i in range(total):
+            at = t0 + i * interval
+            delay = at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait(at)
+            stats.scheduled += 1
+            stats.max_backlog = max(stats.max_backlog, queue.qsize())
+        # request yang masih antre setelah durasi + timeout dianggap tidak terkirim
+        deadline = t0 + duration + timeout
+        while queue.qsize() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        while not queue.empty():
+            queue.get_nowait()
+            stats.unsent += 1
+    else:
+        # closed-loop: jaga tiap worker selalu punya satu request berikutnya
+        end = t0 + duration
+        while time.perf_counter() < end:
+            while queue.qsize() < connections:
+                queue.put_nowait(time.perf_counter())
+                stats.scheduled += 1
+            await asyncio.sleep(0.001)
+        while not queue.empty():
+            queue.get_nowait()
+            stats.scheduled -= 1
+    for _ in workers:
+        queue.put_nowait(None)
+    await asyncio.gather(*workers)
+    stats.elapsed = time.perf_counter() - t0
+    return stats
+
+
+def load_summary(stats, config):
+    lat = sorted(stats.latencies)
+    svc = sorted(stats.service)
+    ok = len(lat)
+    errors = sum(stats.errors.values())
+    summary = {
+        "config": config,
+        "scheduled": stats.scheduled,
+        "completed": ok,
+        "errors": errors,
+        "error_kinds": stats.errors,
+        "unsent": stats.unsent,
+        "http_errors": sum(n for s, n in stats.statuses.items() if s >= 400),
+        "status": {str(s): n for s, n in sorted(stats.statuses.items())},
+        "connections_opened": stats.connects,
+        "max_backlog": stats.max_backlog,
+        "elapsed_s": stats.elapsed,
+        "throughput_rps": ok / stats.elapsed if stats.elapsed else 0.0,
+        "throughput_bps": stats.bytes * 8 / stats.elapsed if stats.elapsed else 0.0,
+        "bytes": stats.bytes,
+        "latency_ms": {"min": lat[0] * 1000 if lat else 0.0,
+                       "mean": sum(lat) / ok * 1000 if ok else 0.0,
+                       "max": lat[-1] * 1000 if lat else 0.0},
+        "service_ms": {},
+    }
+    for q in LOAD_PERCENTILES:
+        summary["latency_ms"][f"p{q:g}"] = percentile(lat, q) * 1000
+        summary["service_ms"][f"p{q:g}"] = percentile(svc, q) * 1000
+    return summary
+
+
+def save_load_result(summary, timeline, csv_path="load_result.csv", json_path="load_result.json"):
+    # layout CSV sama dengan qos_result.csv: SUMMARY METRICS lalu detail
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file)
+        writer.writerow(["HTTP Load Test Results"])
+        writer.writerow([])
 
-def spawn_multi_clients(n=5):
-    threads = []
-    for i in range(n):
-        t = threading.Thread(target=http_request, args=("/index.html",))
-        threads.append(t)
-        t.start()
+        writer.writerow(["SUMMARY METRICS"])
+        writer.writerow(["Metric", "Value", "Unit"])
+        cfg = summary["config"]
+        writer.writerow(["Target", f"{cfg['host']}:{cfg['port']}", ""])
+        writer.writerow(["Connections", cfg["connections"], "connections"])
+        writer.writerow(["Target Rate", cfg["rate"] or "closed-loop", "req/s"])
+        writer.writerow(["Keep-Alive", "on" if cfg["keep_alive"] else "off", ""])
+        writer.writerow(["Requests Scheduled", summary["scheduled"], "requests"])
+        writer.writerow(["Requests Completed", summary["completed"], "requests"])
+        writer.writerow(["Errors", summary["errors"], "requests"])
+        writer.writerow(["HTTP Errors (>=400)", summary["http_errors"], "responses"])
+        writer.writerow(["Not Sent (backlog at end)", summary["unsent"], "requests"])
+        writer.writerow(["Throughput", f"{summary['throughput_rps']:.2f}", "req/s"])
+        writer.writerow(["Throughput (body bytes)", f"{summary['throughput_bps']:.2f}", "bps"])
+        for name, value in summary["latency_ms"].items():
+            writer.writerow([f"Latency {name}", f"{value:.4f}", "ms"])
+        for name, value in summary["service_ms"].items():
+            writer.writerow([f"Service Time {name}", f"{value:.4f}", "ms"])
+        writer.writerow(["Test Duration", f"{summary['elapsed_s']:.4f}", "seconds"])
+        writer.writerow([])
 
-    for t in threads:
-        t.join()
+        writer.writerow(["STATUS CODES"])
+        writer.writerow(["Status", "Count"])
+        for status, n in summary["status"].items():
+            writer.writerow([status, n])
+        for kind, n in sorted(summary["error_kinds"].items()):
+            writer.writerow([kind, n])
+        writer.writerow([])
 
-    print("\n===== MULTI CLIENT DONE =====")
+        writer.writerow(["DETAILED PER SECOND"])
+        writer.writerow(["Second", "Completed", "Errors", "p50 (ms)", "p99 (ms)"])
+        for second in sorted(timeline):
+            ok, err, lat = timeline[second]
+            lat.sort()
+            writer.writerow([second, ok, err, f"{percentile(lat, 50) * 1000:.4f}",
+                             f"{percentile(lat, 99) * 1000:.4f}"])
+
+    with open(json_path, "w", encoding="utf-8") as file:
+        json.dump(summary, file, indent=2)
+
+
+def load_test(host=None, port=None, connections=LOAD_CONNECTIONS, rate=LOAD_RATE,
+              duration=LOAD_DURATION, paths=LOAD_PATHS, keep_alive=LOAD_KEEPALIVE,
+              timeout=LOAD_TIMEOUT, seed=None, cache_bust=False, save=True):
+    host = host or PROXY_IP
+    port = port or TCP_PORT
+    path_list, weights = parse_path_mix(paths)
+    config = {"host": host, "port": port, "connections": connections, "rate": rate,
+              "duration": duration, "paths": paths, "keep_alive": keep_alive,
+              "timeout": timeout, "cache_bust": cache_bust}
+    mode = f"{rate} req/s open-loop" if rate > 0 else "closed-loop"
+    print(f"Load test -> {host}:{port}, {connections} koneksi, {mode}, {duration}s, "
+          f"keep-alive {'on' if keep_alive else 'off'}")
+
+    stats = asyncio.run(run_load(host, port, connections, rate, duration, path_list,
+                                 weights, keep_alive, timeout, seed, cache_bust))
+    summary = load_summary(stats, config)
+    if save:
+        save_load_result(summary, stats.timeline)
+
+    lat = summary["latency_ms"]
+    print("\n===== LOAD TEST RESULT =====")
+    print(f"Completed: {summary['completed']}/{summary['scheduled']} "
+          f"(errors {summary['errors']}, http>=400 {summary['http_errors']}, "
+          f"not sent {summary['unsent']})")
+    print(f"Throughput: {summary['throughput_rps']:.2f} req/s "
+          f"({summary['throughput_bps'] / 1e6:.2f} Mbps body)")
+    print("Latency: " + " | ".join(f"{k} {v:.2f} ms" for k, v in lat.items()))
+    if summary["error_kinds"]:
+        print("Errors: " + ", ".join(f"{k}={v}" for k, v in sorted(summary["error_kinds"].items())))
+    print("============================\n")
+    if save:
+        print("Load test results saved to load_result.csv / load_result.json")
+    return summary
+
+
+def ask(prompt, default, cast=str):
+    value = input(f"{prompt} [{default}]: ").strip()
+    return cast(value) if value else default
 
 # =========================================================
 #  MAIN MENU
@@ -192,7 +609,7 @@ def main():
         print("1. HTTP Request - Index Page (/static/index.html)")
         print("2. HTTP Request - Test Page (/static/test.html)")
         print("3. UDP QoS Test")
-        print("4. Multi Client (5 clients)")
+        print("4. HTTP Load Test (open-loop)")
         print("5. Exit")
         choice = input("Pilih: ")
 
@@ -206,10 +623,17 @@ def main():
             
         elif choice == "3":
             count = int(input("Jumlah paket: "))
-            udp_qos_test(packet_count=count)
+            udp_qos_test(packet_count=count,
+                         packet_size=ask("Ukuran paket (byte)", 512, int),
+                         rate=ask("Rate paket/detik (0 = secepatnya)", 20.0, float))
 
         elif choice == "4":
-            spawn_multi_clients()
+            load_test(
+                connections=ask("Jumlah koneksi", LOAD_CONNECTIONS, int),
+                rate=ask("Target request/detik (0 = closed-loop)", LOAD_RATE, float),
+                duration=ask("Durasi (detik)", LOAD_DURATION, float),
+                paths=ask("Path mix", LOAD_PATHS),
+                keep_alive=ask("Keep-alive (y/n)", "y" if LOAD_KEEPALIVE else "n").lower().startswith("y"))
 
         elif choice == "5":
             break
@@ -217,5 +641,44 @@ def main():
         else:
             print("Pilihan tidak valid!")
 
+def parse_args():
+    # tanpa sub-command -> menu interaktif seperti biasa
+    ap = argparse.ArgumentParser(description="Client HTTP/UDP untuk proxy socket programming")
+    ap.add_argument("--proxy", default=PROXY_IP, help="IP proxy, env PROXY_IP")
+    ap.add_argument("--tcp-port", type=int, default=TCP_PORT, help="port HTTP proxy, env PROXY_TCP_PORT")
+    ap.add_argument("--udp-port", type=int, default=UDP_PORT, help="port UDP proxy, env PROXY_UDP_PORT")
+    sub = ap.add_subparsers(dest="command")
+
+    http = sub.add_parser("http", help="satu request HTTP")
+    http.add_argument("path", nargs="?", default="/")
+    http.add_argument("--no-browser", action="store_true", help="jangan buka browser")
+
+    load = sub.add_parser("load", help="load test HTTP (open-loop)")
+    load.add_argument("-c", "--connections", type=int, default=LOAD_CONNECTIONS)
+    load.add_argument("-r", "--rate", type=float, default=LOAD_RATE, help="request/detik, 0 = closed-loop")
+    load.add_argument("-d", "--duration", type=float, default=LOAD_DURATION)
+    load.add_argument("-p", "--paths", default=LOAD_PATHS, help='mis. "/index.html:3,/test.html:1"')
+    load.add_argument("--no-keepalive", action="store_true")
+    load.add_argument("--cache-bust", action="store_true", help="query unik per request (cache selalu MISS)")
+    load.add_argument("--timeout", type=float, default=LOAD_TIMEOUT)
+
+    udp = sub.add_parser("udp", help="UDP QoS probe")
+    udp.add_argument("-n", "--count", type=int, default=50)
+    udp.add_argument("-s", "--size", type=int, default=512)
+    udp.add_argument("-r", "--rate", type=float, default=20.0, help="paket/detik, 0 = secepatnya")
+    return ap.parse_args()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    PROXY_IP, TCP_PORT, UDP_PORT = args.proxy, args.tcp_port, args.udp_port
+    if args.command == "http":
+        http_request(args.path, open_browser=not args.no_browser)
+    elif args.command == "load":
+        load_test(connections=args.connections, rate=args.rate, duration=args.duration,
+                  paths=args.paths, keep_alive=not args.no_keepalive, timeout=args.timeout,
+                  cache_bust=args.cache_bust)
+    elif args.command == "udp":
+        udp_qos_test(packet_count=args.count, packet_size=args.size, rate=args.rate)
+    else:
+        main()
\ No newline at end of file
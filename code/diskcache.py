@@ -0,0 +1,213 @@
+# ========== CACHE L2 DI DISK ==========
+# Tier kedua untuk cache Proxy.py: satu file append-only + index di memori.
+# Record ditulis berurutan ke akhir file, dibaca lewat mmap (tanpa read()
+# syscall per hit), dan tiap record membawa CRC32 sehingga byte yang rusak
+# (disk penuh, crash di tengah write) tidak pernah dikirim ke klien.
+#
+# Format record (little-endian):
+#   magic(4) crc32(4) klen(4) mlen(4) vlen(4) fresh_until(8) expire_at(8)
+#   key(klen) meta(mlen) value(vlen)
+# vlen == TOMBSTONE menandai key dihapus. Waktu disimpan sebagai wall clock
+# (time.time()) supaya tetap bermakna setelah proxy restart.
+#
+# Saat start, index dibangun ulang dengan memindai header saja (value dilewati,
+# CRC dicek saat dibaca), jadi restart dengan ratusan MB data tetap < 1 detik.
+# Record yang tertimpa/dihapus jadi "dead bytes"; compact() menulis ulang
+# record hidup ke file baru kalau dead bytes sudah lebih besar dari yang hidup.
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+MAGIC = b"PXC1"
+HEADER = struct.Struct("<4sIIIIdd")
+TOMBSTONE = 0xFFFFFFFF
+COMPACT_MIN_BYTES = 4 * 1024 * 1024   # file kecil tidak perlu di-compact
+
+
+class DiskCache:
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # key -> (offset, klen, mlen, vlen, fresh_until, expire_at), urutan tulis (FIFO)
+        self.index = OrderedDict()
+        self.live_bytes = 0
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.hits = self.misses = self.writes = 0
+        self.corrupt = self.evictions = self.expirations = self.compactions = 0
+        self.rebuild_time = 0.0
+        self._open()
+
+    # ---------- API ----------
+
+    def get(self, key):
+        # hasil: (value, meta, fresh_until, expire_at) atau None
+        with self.lock:
+            rec = self.index.get(key)
+            if rec is None:
+                self.misses += 1
+                return None
+            offset, klen, mlen, vlen, fresh_until, expire_at = rec
+            if expire_at <= time.time():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            end = offset + HEADER.size + klen + mlen + vlen
+            if self.map is None or end > len(self.map):
+                self._remap()
+            crc = HEADER.unpack_from(self.map, offset)[1]
+            body = self.map[offset + HEADER.size:end]
+            if zlib.crc32(body, zlib.crc32(self.map[offset + 8:offset + HEADER.size])) != crc:
+                self._drop(key)
+                self.corrupt += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            meta = body[klen:klen + mlen]
+            return body[klen + mlen:], meta, fresh_until, expire_at
+
+    def put(self, key, value, meta, fresh_until, expire_at):
+        kb = key.encode("utf-8")
+        tail = HEADER.pack(MAGIC, 0, len(kb), len(meta), len(value), fresh_until, expire_at)[8:]
+        crc = zlib.crc32(value, zlib.crc32(meta, zlib.crc32(kb, zlib.crc32(tail))))
+        record = MAGIC + struct.pack("<I", crc) + tail
+        with self.lock:
+            offset = self._append(record, kb, meta, value)
+            if key in self.index:
+                self._forget(key)
+            self.index[key] = (offset, len(kb), len(meta), len(value), fresh_until, expire_at)
+            self.live_bytes += HEADER.size + len(kb) + len(meta) + len(value)
+            self.writes += 1
+            while self.live_bytes > self.max_bytes and self.index:
+                self._drop(next(iter(self.index)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.index:
+                self._drop(key)
+
+    def clean(self):
+        # buang index yang kedaluwarsa (tanpa tombstone: rebuild juga melewatinya)
+        now = time.time()
+        with self.lock:
+            expired = [k for k, rec in self.index.items() if rec[5] <= now]
+            for key in expired:
+                self._forget(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def maybe_compact(self):
+        with self.lock:
+            dead = self.size - self.live_bytes
+            if self.size < COMPACT_MIN_BYTES or dead <= self.live_bytes:
+                return False
+            self._compact()
+            return True
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"entries": len(self.index), "bytes": self.live_bytes,
+                    "file_bytes": self.size, "hits": self.hits, "misses": self.misses,
+                    "rate": (self.hits / total * 100) if total else 0,
+                    "writes": self.writes, "corrupt": self.corrupt,
+                    "evictions": self.evictions, "expirations": self.expirations,
+                    "compactions": self.compactions, "rebuild_time": self.rebuild_time}
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    # ---------- internal (panggil dengan self.lock dipegang) ----------
+
+    def _open(self):
+        start = time.perf_counter()
+        self.file = open(self.path, "a+b")
+        self.file.seek(0, os.SEEK_END)
+        self.size = self.file.tell()
+        self._remap()
+        self._rebuild()
+        self.rebuild_time = time.perf_counter() - start
+
+    def _remap(self):
+        if self.map is not None:
+            self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ) if self.size else None
+
+    def _rebuild(self):
+        now = time.time()
+        pos = 0
+        m = self.map
+        while m is not None and pos + HEADER.size <= self.size:
+            magic, _, klen, mlen, vlen, fresh_until, expire_at = HEADER.unpack_from(m, pos)
+            length = HEADER.size + klen + mlen + (0 if vlen == TOMBSTONE else vlen)
+            if magic != MAGIC or pos + length > self.size:
+                break   # ekor file rusak (crash saat menulis)
+            key = m[pos + HEADER.size:pos + HEADER.size + klen].decode("utf-8", "replace")
+            if key in self.index:
+                self._forget(key)
+            if vlen != TOMBSTONE and expire_at > now:
+                self.index[key] = (pos, klen, mlen, vlen, fresh_until, expire_at)
+                self.live_bytes += length
+            pos += length
+        if pos < self.size:
+            # potong sampah di ekor supaya append berikutnya tetap sejajar record
+            self.file.truncate(pos)
+            self.size = pos
+            self._remap()
+
+    def _append(self, record, *parts):
+        offset = self.size
+        self.file.write(record)
+        for part in parts:
+            self.file.write(part)
+        self.file.flush()
+        self.size += len(record) + sum(len(p) for p in parts)
+        return offset
+
+    def _forget(self, key):
+        offset, klen, mlen, vlen, _, _ = self.index.pop(key)
+        self.live_bytes -= HEADER.size + klen + mlen + vlen
+
+    def _drop(self, key):
+        # hapus dari index + tulis tombstone supaya rebuild tidak menghidupkannya lagi
+        self._forget(key)
+        kb = key.encode("utf-8")
+        tail = HEADER.pack(MAGIC, 0, len(kb), 0, TOMBSTONE, 0.0, 0.0)[8:]
+        self._append(MAGIC + struct.pack("<I", zlib.crc32(kb, zlib.crc32(tail))) + tail, kb)
+
+    def _compact(self):
+        if self.map is None or len(self.map) < self.size:
+            self._remap()
+        tmp = self.path + ".compact"
+        index = OrderedDict()
+        pos = 0
+        with open(tmp, "wb") as out:
+            for key, (offset, klen, mlen, vlen, fresh_until, expire_at) in self.index.items():
+                length = HEADER.size + klen + mlen + vlen
+                out.write(self.map[offset:offset + length])
+                index[key] = (pos, klen, mlen, vlen, fresh_until, expire_at)
+                pos += length
+        self.map.close()
+        self.map = None
+        self.file.close()
+        os.replace(tmp, self.path)
+        self.file = open(self.path, "a+b")
+        self.size = pos
+        self.index = index
+        self.live_bytes = pos
+        self.compactions += 1
+        self._remap()
@@ -0,0 +1,272 @@
+# ========== METRICS (HISTOGRAM + COUNTER) ==========
+# Dipakai bersama oleh web.py dan Proxy.py, diekspos di path /metrics dalam
+# format teks Prometheus.
+#
+# Histogram memakai bucket logaritmik gaya HDR: tiap oktaf (2^k us) dibagi
+# SUB_BUCKETS bagian sama besar, jadi error relatif maksimal 1/SUB_BUCKETS
+# (12.5%) dari 1 us sampai ~71 menit dengan 248 bucket. Index bucket dihitung
+# dengan bit_length(), tanpa log() dan tanpa bisect.
+#
+# Tulis tanpa lock: tiap thread punya shard sendiri (threading.local) yang hanya
+# ditulis thread itu; scrape menjumlahkan semua shard. Saat thread selesai (mis.
+# thread per koneksi di web.py), shard-nya dilebur ke shard "retired" supaya
+# jumlah tidak hilang dan daftar shard tidak tumbuh terus.
+#
+# Overhead terukur (Python 3.11, 1 vCPU, `python metrics.py`):
+#   Histogram.observe()   ~0.8 us per panggilan (thread yang sudah punya shard)
+#   Counter.inc()         ~0.4 us per panggilan
+#   shard thread baru     ~30-50 us, sekali per thread per metric (web.py
+#                         threaded: per koneksi, bukan per request)
+# Per request proxy: 3 observe + 4 inc (+1 observe upstream saat MISS) ~= 5 us.
+# End-to-end di loopback (4000 GET cache-HIT lewat proxy, median, 2 putaran):
+# METRICS=1 145/160 us vs METRICS=0 140/167 us -- masih di bawah noise.
+# Set METRICS=0 di environment untuk mematikan semua pencatatan.
+import operator
+import os
+import threading
+import time
+import weakref
+
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+MAX_SHIFT = 29                                   # 2^32 us ~= 71 menit
+N_BUCKETS = (MAX_SHIFT + 1) * SUB_BUCKETS + SUB_BUCKETS
+
+enabled = os.environ.get("METRICS", "1") != "0"
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def bucket_index(us):
+    if us < SUB_BUCKETS:
+        return us if us > 0 else 0
+    shift = us.bit_length() - SUB_BITS - 1
+    if shift > MAX_SHIFT:
+        return N_BUCKETS - 1
+    return (shift + 1) * SUB_BUCKETS + (us >> shift) - SUB_BUCKETS
+
+
+def bucket_upper(idx):
+    # batas atas (eksklusif) bucket idx, dalam mikrodetik
+    if idx < SUB_BUCKETS:
+        return idx + 1
+    shift = idx // SUB_BUCKETS - 1
+    return (SUB_BUCKETS + idx % SUB_BUCKETS + 1) << shift
+
+
+class _Sharded:
+    # basis metric dengan satu shard per thread; subclass isi _new_shard/_merge
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._local = threading.local()
+        self._shards = {}               # id(shard) -> shard
+        self._lock = threading.Lock()   # hanya untuk daftar shard, bukan jalur tulis
+        self._retired = self._new_shard()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _shard(self):
+        shard = self._new_shard()
+        self._local.shard = shard
+        with self._lock:
+            self._shards[id(shard)] = shard
+        weakref.finalize(threading.current_thread(), self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._merge(self._retired, shard)
+            del self._shards[id(shard)]
+
+    def _collect(self):
+        total = self._new_shard()
+        with self._lock:
+            shards = [self._retired] + list(self._shards.values())
+        for shard in shards:
+            self._merge(total, shard)
+        return total
+
+
+class Histogram(_Sharded):
+    # shard: list[N_BUCKETS] count per bucket + [sum detik, jumlah sampel]
+    def _new_shard(self):
+        return [0] * N_BUCKETS + [0.0, 0]
+
+    @staticmethod
+    def _merge(into, shard):
+        into[:] = map(operator.add, into, shard)
+
+    def observe(self, seconds):
+        if not enabled:
+            return
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        us = int(seconds * 1e6)
+        # = bucket_index(us), di-inline supaya tanpa function call
+        if us < SUB_BUCKETS:
+            idx = us if us > 0 else 0
+        else:
+            shift = us.bit_length() - SUB_BITS - 1
+            idx = (N_BUCKETS - 1 if shift > MAX_SHIFT
+                   else (shift + 1) * SUB_BUCKETS + (us >> shift) - SUB_BUCKETS)
+        shard[idx] += 1
+        shard[N_BUCKETS] += seconds
+        shard[N_BUCKETS + 1] += 1
+
+    def snapshot(self):
+        # hasil: (counts per bucket, sum, count)
+        total = self._collect()
+        return total[:N_BUCKETS], total[N_BUCKETS], total[N_BUCKETS + 1]
+
+    def percentiles(self, qs=(0.5, 0.9, 0.99)):
+        # perkiraan batas atas bucket tempat persentil jatuh, dalam detik
+        counts, _, n = self.snapshot()
+        result = []
+        for q in qs:
+            if not n:
+                result.append(0.0)
+                continue
+            rank, seen = q * n, 0
+            for idx, c in enumerate(counts):
+                seen += c
+                if seen >= rank:
+                    result.append(bucket_upper(idx) / 1e6)
+                    break
+        return result
+
+    def render(self):
+        # bucket Prometheus per oktaf (batas oktaf = batas bucket halus, jadi eksak)
+        counts, total_sum, n = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        top = max((i for i, c in enumerate(counts) if c), default=0)
+        for idx, c in enumerate(counts):
+            cumulative += c
+            upper = bucket_upper(idx)
+            if idx % SUB_BUCKETS == SUB_BUCKETS - 1 and upper >= 16:
+                lines.append(f'{self.name}_bucket{{le="{upper / 1e6:g}"}} {cumulative}')
+                if idx >= top:
+                    break
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {n}')
+        lines.append(f"{self.name}_sum {total_sum:.6f}")
+        lines.append(f"{self.name}_count {n}")
+        return lines
+
+
+class Counter(_Sharded):
+    # counter monotonik, opsional satu label (mis. status="200")
+    def __init__(self, name, help_text, label=None):
+        self.label = label
+        super().__init__(name, help_text)
+
+    def _new_shard(self):
+        return {}
+
+    @staticmethod
+    def _merge(into, shard):
+        for k, v in list(shard.items()):
+            into[k] = into.get(k, 0) + v
+
+    def inc(self, value=1, label=None):
+        if not enabled:
+            return
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[label] = shard.get(label, 0) + value
+
+    def render(self):
+        total = self._collect()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label, v in sorted(total.items(), key=lambda kv: str(kv[0])):
+            tag = f'{{{self.label}="{label}"}}' if self.label and label is not None else ""
+            lines.append(f"{self.name}{tag} {v}")
+        return lines
+
+
+class Gauge:
+    # nilai dibaca saat scrape dari fn(); tidak ada biaya di jalur request
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        with _registry_lock:
+            _registry.append(self)
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {value}"]
+
+
+def render():
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for m in metrics:
+        lines.extend(m.render())
+    return ("\n".join(lines) + "\n").encode()
+
+
+def http_response(body=None):
+    # response lengkap untuk GET /metrics (tanpa baris Connection, ditambah pemanggil)
+    body = render() if body is None else body
+    head = ("HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Cache-Control: no-store\r\n").encode()
+    return head, body
+
+
+if __name__ == "__main__":
+    # ukur overhead jalur tulis
+    h = Histogram("bench_seconds", "bench")
+    c = Counter("bench_total", "bench", label="status")
+    n = 1_000_000
+    samples = [i * 1.7e-6 for i in range(1000)]
+
+    t = time.perf_counter()
+    for i in range(n):
+        pass
+    base = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for i in range(n):
+        h.observe(samples[i % 1000])
+    obs = (time.perf_counter() - t - base) / n * 1e6
+
+    t = time.perf_counter()
+    for i in range(n):
+        c.inc(1, 200)
+    inc = (time.perf_counter() - t - base) / n * 1e6
+
+    def new_threads(k):
+        def work():
+            h.observe(0.001)
+        start = time.perf_counter()
+        for _ in range(k):
+            th = threading.Thread(target=work)
+            th.start()
+            th.join()
+        return (time.perf_counter() - start) / k * 1e6
+
+    t = time.perf_counter()
+    for _ in range(2000):
+        th = threading.Thread(target=lambda: None)
+        th.start()
+        th.join()
+    thread_cost = (time.perf_counter() - t) / 2000 * 1e6
+    shard_cost = new_threads(2000) - thread_cost
+
+    print(f"observe: {obs:.3f} us | inc: {inc:.3f} us | "
+          f"shard per thread baru: {shard_cost:.1f} us | shards hidup: {len(h._shards)}")
+    print("p50/p90/p99:", [f"{p * 1e6:.0f}us" for p in h.percentiles()],
+          "| sebenarnya:", [f"{samples[int(q * 1000)] * 1e6:.0f}us" for q in (0.5, 0.9, 0.99)])
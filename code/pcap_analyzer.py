@@ -0,0 +1,712 @@
+# ========== ANALISIS CAPTURE PCAPNG ==========
+# Menghitung QoS dari capture Wireshark (.pcapng) untuk flow proyek ini
+# (TCP 8000/8080, UDP 9000/9090) tanpa memuat seluruh file ke memori:
+#   python pcap_analyzer.py ../wireshark/single-web.pcapng
+#   python pcap_analyzer.py client=c.pcapng proxy=p.pcapng server=s.pcapng
+#
+# File di-mmap dan diproses per jendela (READ_SIZE). Tidak ada loop Python per
+# paket: batas block EPB, SNAP byte pertama tiap paket, decode header
+# Ethernet/IPv4/TCP/UDP, pengelompokan flow, handshake, TTFB, retransmisi, RTT
+# UDP, dan pencocokan paket antar capture semuanya operasi NumPy per kolom.
+# Yang disimpan hanya kolom header paket yang cocok port (~50 byte per paket),
+# bukan isi paket. Terukur (1 vCPU): capture 2 GB / 3 juta paket ~6.5 detik
+# total, ~4.5 detik di antaranya parse.
+#
+# Per-hop delay: paket yang sama (alamat, port, IP ID, seq/tag) dicari di dua
+# capture; selisih waktunya = delay satu arah antar titik capture. Kalau jam
+# dua mesin tidak sinkron, offset ikut terbaca -- karena itu dilaporkan juga
+# perkiraan offset ((up - down) / 2) dan delay rata-rata dua arah yang bebas
+# offset. Dalam satu capture di proxy, koneksi 8080 (klien) dipasangkan dengan
+# koneksi 8000 (upstream) berdasarkan waktu untuk delay forward/relay proxy.
+#
+# Hanya IPv4; link type Ethernet (+VLAN), Linux SLL/SLL2, raw IP, dan loopback.
+import argparse
+import csv
+import mmap
+import os
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    raise SystemExit("pcap_analyzer butuh numpy: pip install numpy")
+
+PORTS = (8000, 8080, 9000, 9090)
+SNAP = 128                      # byte per paket yang di-decode (L2+IP+TCP/UDP+8 byte payload)
+CHUNK_PACKETS = 1 << 14         # paket per batch decode (matriks index ~4 MB)
+READ_SIZE = 16 * 1024 * 1024    # jendela mmap per putaran
+PERCENTILES = (50, 90, 99)
+
+SHB, IDB, SPB, EPB, OPB = 0x0A0D0D0A, 1, 3, 6, 2
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# link type -> offset awal header IP (Ethernet dihitung per paket karena VLAN)
+LINK_ETHERNET, LINK_NULL, LINK_RAW, LINK_LOOP = 1, 0, 101, 108
+LINK_SLL, LINK_SLL2, LINK_IPV4 = 113, 276, 228
+IP_OFFSET = {LINK_NULL: 4, LINK_LOOP: 4, LINK_RAW: 0, LINK_IPV4: 0,
+             LINK_SLL: 16, LINK_SLL2: 20}
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK = 0x01, 0x02, 0x04, 0x10
+
+COLUMNS = (("ts", np.int64), ("src", np.uint32), ("dst", np.uint32),
+           ("sport", np.uint16), ("dport", np.uint16), ("proto", np.uint8),
+           ("flags", np.uint8), ("seq", np.uint32), ("ack", np.uint32),
+           ("plen", np.int32), ("ipid", np.uint16), ("tag", np.uint64))
+
+
+# ---------- pembacaan pcapng (streaming) ----------
+
+def _ts_scale(options, endian):
+    # hasil: (pengali, pembagi, offset detik) untuk mengubah unit timestamp ke ns
+    resol, offset = 6, 0
+    pos = 0
+    while pos + 4 <= len(options):
+        code, length = struct.unpack_from(endian + "HH", options, pos)
+        if code == 0:
+            break
+        value = options[pos + 4:pos + 4 + length]
+        if code == 9 and length >= 1:
+            resol = value[0]
+        elif code == 14 and length >= 8:
+            offset = struct.unpack_from(endian + "q", value)[0]
+        pos += 4 + length + (-length % 4)
+    if resol & 0x80:
+        return 1_000_000_000, 1 << (resol & 0x7F), offset
+    exp = resol
+    return (10 ** (9 - exp), 1, offset) if exp <= 9 else (1, 10 ** (exp - 9), offset)
+
+
+BLOCK_HEAD = {"<": struct.Struct("<II"), ">": struct.Struct(">II")}
+
+
+class _EpbRuns:
+    # deretan EPB berurutan dalam satu buffer, tanpa loop Python per paket.
+    # Kandidat = word bernilai EPB yang panjang block-nya cocok dengan salinan
+    # panjang di trailer block, dan block sesudahnya tepat kandidat berikutnya.
+    # Deretan putus di block non-EPB, di ujung buffer, atau di kandidat palsu
+    # (byte payload yang kebetulan mirip header); titik putus dilanjutkan oleh
+    # loop Python di PcapngReader.chunks, yang melompati kandidat palsu karena
+    # ia mulai lagi dari posisi block asli berikutnya.
+    def __init__(self, buf, endian):
+        words = np.frombuffer(buf, dtype=endian + "u4", count=len(buf) // 4)
+        cand = np.nonzero(words == EPB)[0]
+        cand = cand[cand + 1 < len(words)]
+        length = words[cand + 1].astype(np.int64)
+        nxt = cand + length // 4
+        ok = (length >= 32) & (length % 4 == 0) & (nxt <= len(words))
+        cand, nxt = cand[ok], nxt[ok]
+        ok = words[nxt - 1] == length[ok]
+        self.cand, self.nxt = cand[ok], nxt[ok]
+        # index kandidat terakhir tiap deretan (block sesudahnya bukan kandidat berikut)
+        self.breaks = np.append(np.nonzero(self.nxt[:-1] != self.cand[1:])[0], len(self.cand) - 1)
+
+    def follow(self, pos):
+        # hasil: (offset byte EPB berurutan mulai dari pos, posisi setelah EPB terakhir)
+        start = np.searchsorted(self.cand, pos // 4)
+        if start >= len(self.cand) or self.cand[start] != pos // 4:
+            return (), pos
+        last = self.breaks[np.searchsorted(self.breaks, start)]
+        return self.cand[start:last + 1] * 4, int(self.nxt[last]) * 4
+
+
+class PcapngReader:
+    # iterasi potongan paket: (matriks header SNAP byte, ts ns, link type, caplen)
+    def __init__(self, path):
+        self.path = path
+        self.packets = 0
+        self.bytes = 0
+        self.interfaces = []     # [(linktype, mul, div, offset_s)] section aktif
+
+    def chunks(self):
+        # file di-mmap dan diproses per jendela READ_SIZE tanpa salinan buffer.
+        # Deretan EPB dicari dengan NumPy (_EpbRuns); loop Python hanya menangani
+        # block lain (SHB, IDB, OPB, ...) yang jumlahnya sedikit
+        endian = "<"
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return
+            whole = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                whole.madvise(mmap.MADV_SEQUENTIAL)   # halaman yang sudah lewat boleh dibuang
+            start, window = 0, READ_SIZE
+            while start + 12 <= size:
+                buf = memoryview(whole)[start:start + window]
+                end = len(buf)
+                runs = _EpbRuns(buf, endian)
+                pending, obsolete = [], []
+                pos = 0
+                while pos + 12 <= end:
+                    offsets, stop = runs.follow(pos)
+                    if len(offsets):
+                        pending.append(offsets)
+                        pos = stop
+                        continue
+                    btype, blen = BLOCK_HEAD[endian].unpack_from(buf, pos)
+                    if btype == SHB:
+                        # section baru: byte order bisa berubah, interface id mulai dari 0 lagi
+                        if pending:
+                            yield from self._gather(buf, pending, obsolete, endian)
+                            pending, obsolete = [], []
+                        magic = struct.unpack_from("<I", buf, pos + 8)[0]
+                        new_endian = "<" if magic == BYTE_ORDER_MAGIC else ">"
+                        if new_endian != endian:
+                            endian = new_endian
+                            runs = _EpbRuns(buf, endian)
+                        blen = BLOCK_HEAD[endian].unpack_from(buf, pos)[1]
+                        self.interfaces = []
+                    if blen < 12 or blen % 4:
+                        raise ValueError(f"{self.path}: block rusak di offset {start + pos}")
+                    if pos + blen > end:
+                        break    # block terpotong di batas jendela, lanjut jendela berikutnya
+                    if btype == IDB:
+                        # IDB bisa muncul setelah paket; paket sebelumnya diproses dulu
+                        if pending:
+                            yield from self._gather(buf, pending, obsolete, endian)
+                            pending, obsolete = [], []
+                        linktype = struct.unpack_from(endian + "H", buf, pos + 8)[0]
+                        self.interfaces.append(
+                            (linktype,) + _ts_scale(buf[pos + 16:pos + blen - 4], endian))
+                    elif btype == OPB or btype == EPB:
+                        # OPB, atau EPB yang tidak lolos cek cepat (mis. tepat di ujung buffer)
+                        pending.append(np.array([pos], dtype=np.int64))
+                        if btype == OPB:
+                            obsolete.append(pos)
+                    # SPB/ISB/NRB: tanpa interface id / timestamp, tidak berguna untuk delay
+                    pos += blen
+                if pending:
+                    yield from self._gather(buf, pending, obsolete, endian)
+                if pos == 0:
+                    if start + end >= size:
+                        break          # ekor file terpotong (capture berhenti di tengah block)
+                    window *= 2        # block lebih besar dari jendela
+                    continue
+                start += pos
+                window = READ_SIZE
+            self.bytes = start
+
+    def _gather(self, buf, pending, obsolete, endian):
+        words = np.frombuffer(buf, dtype=endian + "u4", count=len(buf) // 4)
+        # header diambil per word 4 byte (data EPB sejajar 4 byte), lalu dilihat sebagai byte
+        native = np.frombuffer(buf, dtype=np.uint32, count=len(buf) // 4)
+        word_cols = np.arange(SNAP // 4, dtype=np.int64)
+        cols = np.arange(SNAP, dtype=np.int64)
+        all_offsets = np.concatenate(pending)
+        for start in range(0, len(all_offsets), CHUNK_PACKETS):
+            off = all_offsets[start:start + CHUNK_PACKETS]
+            w = off // 4     # block pcapng selalu sejajar 4 byte
+            if_id = words[w + 2].astype(np.int64)
+            if obsolete:
+                # OPB: interface id 16 bit, diikuti drops count 16 bit
+                opb = np.isin(off, np.asarray(obsolete, dtype=np.int64))
+                shift = 0 if endian == "<" else 16
+                if_id[opb] = (if_id[opb] >> shift) & 0xFFFF
+            ts_raw = (words[w + 3].astype(np.uint64) << np.uint64(32)) | words[w + 4]
+            caplen = np.minimum(words[w + 5].astype(np.int64), SNAP)
+            idx = np.minimum(w[:, None] + 7 + word_cols, len(native) - 1)
+            hdr = native[idx].view(np.uint8)
+            short = np.nonzero(caplen < SNAP)[0]   # sisa baris = byte block berikutnya, nolkan
+            if len(short):
+                hdr[short] *= (cols < caplen[short, None]).astype(np.uint8)
+            self.packets += len(off)
+            yield (hdr,) + self._timestamps(ts_raw, if_id) + (caplen,)
+
+    def _timestamps(self, ts_raw, if_id):
+        ts = np.zeros(len(ts_raw), dtype=np.int64)
+        link = np.full(len(ts_raw), -1, dtype=np.int32)   # interface tanpa IDB: dilewati
+        for i, (linktype, mul, div, off) in enumerate(self.interfaces):
+            sel = if_id == i
+            if not sel.any():
+                continue
+            if div == 1:
+                ts[sel] = ts_raw[sel].astype(np.int64) * mul + off * 1_000_000_000
+            else:
+                ts[sel] = (ts_raw[sel].astype(np.float64) * mul / div).astype(np.int64) + off * 1_000_000_000
+            link[sel] = linktype
+        return ts, link
+
+
+# ---------- decode header (vektor) ----------
+
+# index absolut ke matriks header yang diratakan (1-D take jauh lebih cepat dari 2-D)
+
+def _u16(flat, at):
+    return (flat[at].astype(np.uint32) << 8) | flat[at + 1]
+
+
+def _u32(flat, at):
+    return ((flat[at].astype(np.uint32) << 24) | (flat[at + 1].astype(np.uint32) << 16)
+            | (flat[at + 2].astype(np.uint32) << 8) | flat[at + 3])
+
+
+def decode(hdr, ts, link, caplen, ports):
+    # hasil: dict kolom (COLUMNS) untuk paket IPv4 TCP/UDP yang salah satu port-nya di ports
+    n = len(ts)
+    flat = hdr.reshape(-1)
+    base = np.arange(n, dtype=np.int64) * SNAP
+    ip = np.full(n, -1, dtype=np.int64)
+    eth = link == LINK_ETHERNET
+    if eth.any():
+        etype = _u16(flat, base + 12)
+        vlan = eth & (etype == 0x8100)
+        inner = _u16(flat, base + 16)
+        ip[eth & (etype == 0x0800)] = 14
+        ip[vlan & (inner == 0x0800)] = 18
+    for linktype, offset in IP_OFFSET.items():
+        sel = link == linktype
+        if sel.any():
+            ip[sel] = offset
+    sll = (link == LINK_SLL) | (link == LINK_SLL2)
+    if sll.any():
+        proto_at = np.where(link == LINK_SLL, 14, 0)
+        ip[sll & (_u16(flat, base + proto_at) != 0x0800)] = -1
+
+    ok = ip >= 0
+    ipo = np.where(ok, ip, 0)
+    ipa = base + ipo
+    first = flat[ipa]
+    ok &= (first >> 4) == 4
+    ihl = (first & 0x0F).astype(np.int64) * 4
+    proto = flat[ipa + 9]
+    ok &= ((proto == 6) | (proto == 17)) & (ihl >= 20)
+    ok &= (_u16(flat, ipa + 6) & 0x1FFF) == 0          # fragment lanjutan tidak punya header L4
+    ok &= ipo + ihl + 20 <= SNAP
+
+    sel = np.nonzero(ok)[0]
+    ipa, ihl, proto = ipa[sel], ihl[sel], proto[sel]
+    l4a = ipa + ihl
+    sport = _u16(flat, l4a)
+    dport = _u16(flat, l4a + 2)
+    port_set = np.array(ports, dtype=np.uint32)
+    keep = np.isin(sport, port_set) | np.isin(dport, port_set)
+    sel, ipa, ihl, proto, l4a, sport, dport = (
+        a[keep] for a in (sel, ipa, ihl, proto, l4a, sport, dport))
+
+    tcp = proto == 6
+    total_len = _u16(flat, ipa + 2).astype(np.int64)
+    doff = (flat[l4a + 12] >> 4).astype(np.int64) * 4
+    plen = np.where(tcp, total_len - ihl - doff, _u16(flat, l4a + 4).astype(np.int64) - 8)
+
+    # tag UDP: 8 byte pertama payload (seq + timestamp probe clientfix), pencocok echo
+    tag = np.zeros(len(sel), dtype=np.uint64)
+    has_tag = ~tcp & (l4a - sel * SNAP + 16 <= caplen[sel]) & (plen >= 8)
+    if has_tag.any():
+        at = l4a[has_tag]
+        tag[has_tag] = ((_u32(flat, at + 8).astype(np.uint64) << np.uint64(32))
+                        | _u32(flat, at + 12).astype(np.uint64))
+
+    zero32 = np.zeros(len(sel), dtype=np.uint32)
+    return {
+        "ts": ts[sel],
+        "src": _u32(flat, ipa + 12),
+        "dst": _u32(flat, ipa + 16),
+        "sport": sport.astype(np.uint16),
+        "dport": dport.astype(np.uint16),
+        "proto": proto,
+        "flags": np.where(tcp, flat[l4a + 13], 0).astype(np.uint8),
+        "seq": np.where(tcp, _u32(flat, l4a + 4), zero32),
+        "ack": np.where(tcp, _u32(flat, l4a + 8), zero32),
+        "plen": np.maximum(plen, 0).astype(np.int32),
+        "ipid": _u16(flat, ipa + 4).astype(np.uint16),
+        "tag": tag,
+    }
+
+
+def load_capture(path, ports=PORTS):
+    reader = PcapngReader(path)
+    parts = {name: [] for name, _ in COLUMNS}
+    start = time.perf_counter()
+    for chunk in reader.chunks():
+        cols = decode(*chunk, ports)
+        for name, _ in COLUMNS:
+            parts[name].append(cols[name])
+    pk = {name: (np.concatenate(parts[name]).astype(dtype) if parts[name]
+                 else np.zeros(0, dtype=dtype)) for name, dtype in COLUMNS}
+    order = np.argsort(pk["ts"], kind="stable")
+    pk = {name: col[order] for name, col in pk.items()}
+    pk["meta"] = {"path": path, "packets": reader.packets, "bytes": reader.bytes,
+                  "parse_time": time.perf_counter() - start}
+    return pk
+
+
+# ---------- flow ----------
+
+def flows(pk, ports=PORTS):
+    # flow = (client ip, client port, server ip, server port); server = sisi yang port-nya di ports
+    # hasil: (flow id per paket, up: arah klien -> server, tabel flow)
+    up = np.isin(pk["dport"], np.array(ports, dtype=np.uint16))
+    cip = np.where(up, pk["src"], pk["dst"]).astype(np.uint64)
+    sip = np.where(up, pk["dst"], pk["src"]).astype(np.uint64)
+    cport = np.where(up, pk["sport"], pk["dport"]).astype(np.uint64)
+    sport = np.where(up, pk["dport"], pk["sport"]).astype(np.uint64)
+    # unique per pasangan kolom 64 bit lalu gabungkan; unique(axis=0) jauh lebih lambat
+    _, ips = np.unique((cip << np.uint64(32)) | sip, return_inverse=True)
+    ports_key = (pk["proto"].astype(np.uint64) << np.uint64(32)) | (cport << np.uint64(16)) | sport
+    uports, port_id = np.unique(ports_key, return_inverse=True)
+    combined = ips.reshape(-1).astype(np.int64) * len(uports) + port_id.reshape(-1)
+    _, first, fid = np.unique(combined, return_index=True, return_inverse=True)
+    table = np.stack([pk["proto"][first].astype(np.uint64), cip[first], cport[first],
+                      sip[first], sport[first]], axis=1)
+    return fid.reshape(-1), up, table
+
+
+def _first(fid, mask, values, nflows, fill=np.nan):
+    # nilai pertama (paket sudah urut waktu) per flow untuk paket yang memenuhi mask
+    out = np.full(nflows, fill, dtype=np.float64)
+    idx = np.nonzero(mask)[0]
+    if len(idx):
+        ids, first = np.unique(fid[idx], return_index=True)
+        out[ids] = values[idx[first]]
+    return out
+
+
+def _last(fid, mask, values, nflows, fill=np.nan):
+    out = np.full(nflows, fill, dtype=np.float64)
+    idx = np.nonzero(mask)[0][::-1]
+    if len(idx):
+        ids, first = np.unique(fid[idx], return_index=True)
+        out[ids] = values[idx[first]]
+    return out
+
+
+def retransmissions(fid, up, pk):
+    # segmen data yang awalnya < byte tertinggi yang sudah terlihat di arah yang sama
+    data = np.nonzero((pk["proto"] == 6) & (pk["plen"] > 0))[0]
+    count = np.zeros(fid.max() + 1 if len(fid) else 0, dtype=np.int64)
+    if not len(data):
+        return count
+    group = fid[data].astype(np.int64) * 2 + up[data]
+    order = np.lexsort((pk["ts"][data], group))
+    data, group = data[order], group[order]
+    starts = np.r_[True, group[1:] != group[:-1]]
+    base = np.maximum.accumulate(np.where(starts, np.arange(len(data)), 0))
+    seq = pk["seq"][data].astype(np.int64)
+    rel = (seq - seq[base]) & 0xFFFFFFFF
+    # offset per grup supaya maximum.accumulate tidak melewati batas grup
+    span = np.int64(1) << 34
+    gidx = np.cumsum(starts) - 1
+    end = gidx * span + rel + pk["plen"][data]
+    seen = np.maximum.accumulate(end)
+    prev = np.r_[np.int64(-1), seen[:-1]]
+    prev = np.where(starts, gidx * span - 1, prev)
+    retrans = (gidx * span + rel) < prev
+    np.add.at(count, fid[data][retrans], 1)
+    return count
+
+
+def tcp_connections(pk, fid, up, table):
+    nflows = len(table)
+    ts = pk["ts"].astype(np.float64) / 1e6        # ms
+    flags, plen = pk["flags"], pk["plen"]
+    syn = (flags & TCP_SYN) != 0
+    ackf = (flags & TCP_ACK) != 0
+    data = plen > 0
+
+    t_syn = _first(fid, up & syn & ~ackf, ts, nflows)
+    t_synack = _first(fid, ~up & syn & ackf, ts, nflows)
+    syn_seen = _first(fid, ~up & syn & ackf, np.arange(len(ts), dtype=np.float64), nflows, fill=np.inf)
+    t_ack = _first(fid, up & ackf & ~syn & (np.arange(len(ts)) > syn_seen[fid]), ts, nflows)
+    t_req = _first(fid, up & data, ts, nflows)
+    t_resp = _first(fid, ~up & data, ts, nflows)
+    t_resp_end = _last(fid, ~up & data, ts, nflows)
+    t_start = _first(fid, np.ones(len(ts), bool), ts, nflows)
+    t_end = _last(fid, np.ones(len(ts), bool), ts, nflows)
+
+    bytes_up = np.bincount(fid, weights=np.where(up, plen, 0), minlength=nflows)
+    bytes_down = np.bincount(fid, weights=np.where(up, 0, plen), minlength=nflows)
+    packets = np.bincount(fid, minlength=nflows)
+    syns = np.bincount(fid, weights=(up & syn & ~ackf).astype(np.float64), minlength=nflows)
+    retrans = retransmissions(fid, up, pk)
+    retrans = np.pad(retrans, (0, nflows - len(retrans))) + np.maximum(syns - 1, 0)
+
+    transfer = t_resp_end - t_req
+    throughput = np.where(transfer > 0, bytes_down * 8 / (transfer / 1e3), np.nan)
+    return {
+        "start": t_start, "end": t_end,
+        "syn_synack": t_synack - t_syn, "handshake": t_ack - t_syn,
+        "ttfb": t_resp - t_req, "t_req": t_req, "t_resp": t_resp, "t_resp_end": t_resp_end,
+        "bytes_up": bytes_up, "bytes_down": bytes_down, "throughput": throughput,
+        "retrans": retrans, "packets": packets,
+    }
+
+
+def udp_exchanges(pk, fid, up, table):
+    # cocokkan echo: (flow, tag, kemunculan ke-k) arah naik dengan arah turun
+    nflows = len(table)
+    udp = pk["proto"] == 17
+    ts = pk["ts"]
+
+    def keyed(mask):
+        idx = np.nonzero(mask)[0]
+        order = np.lexsort((ts[idx], pk["tag"][idx], fid[idx]))
+        idx = idx[order]
+        f, t = fid[idx].astype(np.uint64), pk["tag"][idx]
+        starts = np.r_[True, (f[1:] != f[:-1]) | (t[1:] != t[:-1])] if len(idx) else np.zeros(0, bool)
+        pos = np.arange(len(idx))
+        occ = pos - np.maximum.accumulate(np.where(starts, pos, 0))
+        key = np.stack([f, t, occ.astype(np.uint64)], axis=1)
+        return idx, key
+
+    sent_idx, sent_key = keyed(udp & up)
+    recv_idx, recv_key = keyed(udp & ~up)
+    sent = np.bincount(fid[sent_idx], minlength=nflows)
+    arrived = np.bincount(fid[recv_idx], minlength=nflows)
+    rtt = np.zeros(0)
+    rtt_fid = np.zeros(0, dtype=np.int64)
+    if len(sent_idx) and len(recv_idx):
+        view = lambda k: np.ascontiguousarray(k).view(np.dtype((np.void, 24))).reshape(-1)
+        _, a, b = np.intersect1d(view(sent_key), view(recv_key), return_indices=True)
+        rtt = (ts[recv_idx[b]] - ts[sent_idx[a]]) / 1e6
+        rtt_fid = fid[sent_idx[a]]
+        good = rtt >= 0
+        rtt, rtt_fid, a = rtt[good], rtt_fid[good], a[good]
+        order = np.argsort(ts[sent_idx[a]], kind="stable")
+        rtt, rtt_fid = rtt[order], rtt_fid[order]
+    # received = echo yang punya pasangan; sisanya duplikat / tidak dikenal
+    received = np.bincount(rtt_fid, minlength=nflows)
+    return {"sent": sent, "received": received, "extra": arrived - received,
+            "rtt": rtt, "rtt_fid": rtt_fid}
+
+
+# ---------- korelasi ----------
+
+def packet_keys(pk):
+    # identitas paket yang sama di capture berbeda: alamat, port, IP ID, seq/tag, panjang
+    k = np.zeros(len(pk["ts"]), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for name, mult in (("src", 0x9E3779B97F4A7C15), ("dst", 0xC2B2AE3D27D4EB4F),
+                           ("sport", 0x165667B19E3779F9), ("dport", 0xD6E8FEB86659FD93),
+                           ("proto", 0xFF51AFD7ED558CCD), ("ipid", 0xC4CEB9FE1A85EC53),
+                           ("seq", 0x2545F4914F6CDD1D), ("plen", 0x9FB21C651E98DF25),
+                           ("tag", 0x94D049BB133111EB)):
+            k = (k ^ (pk[name].astype(np.uint64) * np.uint64(mult))) * np.uint64(0xBF58476D1CE4E5B9)
+            k ^= k >> np.uint64(31)
+    return k
+
+
+def hop_delay(a, b, ports=PORTS):
+    # paket yang terlihat di capture a dan b; hasil per arah (klien->server / server->klien)
+    ka, kb = packet_keys(a), packet_keys(b)
+    _, ia, ib = np.intersect1d(ka, kb, return_indices=True)
+    if not len(ia):
+        return None
+    # a lebih dekat ke klien: arah naik a -> b, arah turun b -> a
+    delay = (b["ts"][ib] - a["ts"][ia]) / 1e6
+    up = np.isin(a["dport"][ia], np.array(ports, dtype=np.uint16))
+    result = {"matched": len(ia), "up": delay[up], "down": -delay[~up]}
+    if len(result["up"]) and len(result["down"]):
+        mu, md = np.median(result["up"]), np.median(result["down"])
+        result["offset"] = (mu - md) / 2          # jam b lebih maju dari jam a (ms)
+        result["symmetric"] = (mu + md) / 2       # delay satu arah rata-rata, bebas offset
+    return result
+
+
+def proxy_pairs(conn, table, client_port=8080, upstream_port=8000):
+    # koneksi klien (server port 8080) -> koneksi upstream (8000) pertama yang
+    # request-nya keluar setelah request klien masuk dan sebelum response klien
+    tcp = table[:, 0] == 6
+    front = np.nonzero(tcp & (table[:, 4] == client_port) & ~np.isnan(conn["t_req"]))[0]
+    back = np.nonzero(tcp & (table[:, 4] == upstream_port) & ~np.isnan(conn["t_req"]))[0]
+    if not len(front) or not len(back):
+        return []
+    back = back[np.argsort(conn["t_req"][back])]
+    back_req = conn["t_req"][back]
+    used = np.zeros(len(back), bool)
+    pairs = []
+    for f in front[np.argsort(conn["t_req"][front])]:
+        limit = conn["t_resp"][f] if not np.isnan(conn["t_resp"][f]) else np.inf
+        j = np.searchsorted(back_req, conn["t_req"][f])
+        while j < len(back) and back_req[j] <= limit and used[j]:
+            j += 1
+        if j < len(back) and back_req[j] <= limit:
+            used[j] = True
+            pairs.append((f, back[j]))
+        else:
+            pairs.append((f, None))     # dilayani dari cache proxy
+    return pairs
+
+
+# ---------- laporan ----------
+
+def ip_str(v):
+    v = int(v)
+    return f"{v >> 24}.{(v >> 16) & 255}.{(v >> 8) & 255}.{v & 255}"
+
+
+def stats_ms(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    out = {"mean": values.mean(), "min": values.min(), "max": values.max()}
+    for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        out[f"p{q}"] = v
+    return out
+
+
+def fmt(v, digits=4):
+    return "" if v is None or (isinstance(v, float) and np.isnan(v)) else f"{v:.{digits}f}"
+
+
+def analyze(name, pk, ports=PORTS):
+    fid, up, table = flows(pk, ports)
+    conn = tcp_connections(pk, fid, up, table) if len(table) else None
+    udp = udp_exchanges(pk, fid, up, table) if len(table) else None
+    return {"name": name, "pk": pk, "table": table, "conn": conn, "udp": udp,
+            "pairs": proxy_pairs(conn, table) if conn else []}
+
+
+def summary_rows(cap):
+    meta, table, conn, udp = cap["pk"]["meta"], cap["table"], cap["conn"], cap["udp"]
+    rows = [["Capture", cap["name"], ""],
+            ["Packets in File", meta["packets"], "packets"],
+            ["Packets Matched (ports)", len(cap["pk"]["ts"]), "packets"],
+            ["Parse Time", fmt(meta["parse_time"]), "seconds"]]
+    if conn is None:
+        return rows
+    tcp = table[:, 0] == 6
+    rows.append(["TCP Connections", int(tcp.sum()), "connections"])
+    for label, key in (("Handshake Time", "handshake"), ("SYN to SYN-ACK", "syn_synack"),
+                       ("Time to First Byte", "ttfb")):
+        s = stats_ms(conn[key][tcp])
+        if s:
+            rows.append([f"Average {label}", fmt(s["mean"]), "ms"])
+            rows.append([f"{label} p50/p90/p99",
+                         "/".join(fmt(s[f"p{q}"], 3) for q in PERCENTILES), "ms"])
+    s = stats_ms(conn["throughput"][tcp])
+    if s:
+        rows.append(["Average Throughput (response)", f"{s['mean']:.2f}", "bps"])
+    rows.append(["TCP Retransmissions", int(conn["retrans"][tcp].sum()), "segments"])
+    rows.append(["TCP Bytes Up/Down", f"{int(conn['bytes_up'][tcp].sum())}/"
+                 f"{int(conn['bytes_down'][tcp].sum())}", "bytes"])
+
+    udp_flows = table[:, 0] == 17
+    if udp_flows.any():
+        sent, received = int(udp["sent"].sum()), int(udp["received"].sum())
+        rtt = udp["rtt"]
+        rows.append(["UDP Packets Sent", sent, "packets"])
+        rows.append(["UDP Packets Received", received, "packets"])
+        rows.append(["UDP Packet Loss", fmt((sent - received) / sent * 100 if sent else 0.0, 2), "%"])
+        rows.append(["UDP Duplicate/Unmatched", int(udp["extra"].sum()), "packets"])
+        s = stats_ms(rtt)
+        if s:
+            rows.append(["Average Latency (RTT)", fmt(s["mean"]), "ms"])
+            rows.append(["Minimum Latency", fmt(s["min"]), "ms"])
+            rows.append(["Maximum Latency", fmt(s["max"]), "ms"])
+            rows.append(["Latency p50/p90/p99", "/".join(fmt(s[f"p{q}"], 3) for q in PERCENTILES), "ms"])
+            jitter = np.abs(np.diff(rtt)).mean() if len(rtt) > 1 else 0.0
+            rows.append(["Jitter (avg |Δdelay|)", fmt(jitter), "ms"])
+    return rows
+
+
+def write_report(captures, hops, path):
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file)
+        writer.writerow(["PCAP Analysis Results"])
+        writer.writerow([])
+
+        for cap in captures:
+            writer.writerow(["SUMMARY METRICS"])
+            writer.writerow(["Metric", "Value", "Unit"])
+            writer.writerows(summary_rows(cap))
+            writer.writerow([])
+
+        writer.writerow(["DETAILED PER CONNECTION"])
+        writer.writerow(["Capture", "Proto", "Client", "Server", "Start (s)", "Packets",
+                         "SYN to SYN-ACK (ms)", "Handshake (ms)", "TTFB (ms)", "Bytes Up",
+                         "Bytes Down", "Throughput (bps)", "Retransmissions",
+                         "UDP Sent", "UDP Received", "Duration (ms)"])
+        for cap in captures:
+            table, conn, udp = cap["table"], cap["conn"], cap["udp"]
+            if conn is None:
+                continue
+            t0 = np.nanmin(conn["start"])
+            for i, (proto, cip, cport, sip, sport) in enumerate(table):
+                is_tcp = proto == 6
+                writer.writerow([
+                    cap["name"], "TCP" if is_tcp else "UDP",
+                    f"{ip_str(cip)}:{cport}", f"{ip_str(sip)}:{sport}",
+                    fmt((conn["start"][i] - t0) / 1e3), int(conn["packets"][i]),
+                    fmt(conn["syn_synack"][i]) if is_tcp else "",
+                    fmt(conn["handshake"][i]) if is_tcp else "",
+                    fmt(conn["ttfb"][i]) if is_tcp else "",
+                    int(conn["bytes_up"][i]), int(conn["bytes_down"][i]),
+                    fmt(conn["throughput"][i], 2) if is_tcp else "",
+                    int(conn["retrans"][i]) if is_tcp else "",
+                    "" if is_tcp else int(udp["sent"][i]),
+                    "" if is_tcp else int(udp["received"][i]),
+                    fmt(conn["end"][i] - conn["start"][i])])
+        writer.writerow([])
+
+        if any(cap["pairs"] for cap in captures):
+            writer.writerow(["PROXY CORRELATION (client 8080 -> upstream 8000)"])
+            writer.writerow(["Capture", "Client Connection", "Upstream Connection",
+                             "Forward Delay (ms)", "Upstream TTFB (ms)",
+                             "Response Relay Delay (ms)", "Client TTFB (ms)"])
+            for cap in captures:
+                table, conn = cap["table"], cap["conn"]
+                for f, b in cap["pairs"]:
+                    client = f"{ip_str(table[f, 1])}:{table[f, 2]}"
+                    if b is None:
+                        writer.writerow([cap["name"], client, "(cache hit)", "", "", "",
+                                         fmt(conn["ttfb"][f])])
+                        continue
+                    writer.writerow([
+                        cap["name"], client, f"{ip_str(table[b, 1])}:{table[b, 2]}",
+                        fmt(conn["t_req"][b] - conn["t_req"][f]), fmt(conn["ttfb"][b]),
+                        fmt(conn["t_resp"][f] - conn["t_resp"][b]), fmt(conn["ttfb"][f])])
+            writer.writerow([])
+
+        if hops:
+            writer.writerow(["PER-HOP DELAY"])
+            writer.writerow(["From", "To", "Direction", "Matched Packets", "Mean (ms)",
+                             "p50 (ms)", "p99 (ms)", "Est. Clock Offset (ms)",
+                             "Symmetric One-Way (ms)"])
+            for a, b, result in hops:
+                for direction in ("up", "down"):
+                    s = stats_ms(result[direction])
+                    if not s:
+                        continue
+                    writer.writerow([a, b, "client->server" if direction == "up" else "server->client",
+                                     len(result[direction]), fmt(s["mean"]), fmt(s["p50"]),
+                                     fmt(s["p99"]), fmt(result.get("offset")),
+                                     fmt(result.get("symmetric"))])
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Analisis QoS dari capture pcapng")
+    ap.add_argument("captures", nargs="+", metavar="[role=]file.pcapng",
+                    help="satu atau lebih capture; role (client/proxy/server) opsional")
+    ap.add_argument("--ports", default=",".join(map(str, PORTS)),
+                    help="port server yang dianalisis (default 8000,8080,9000,9090)")
+    ap.add_argument("--out", default="pcap_result.csv", help="file CSV hasil")
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ports = tuple(int(p) for p in args.ports.split(",") if p.strip())
+    captures = []
+    for item in args.captures:
+        name, sep, path = item.partition("=")
+        if not sep or os.path.exists(item):
+            name, path = os.path.splitext(os.path.basename(item))[0], item
+        pk = load_capture(path, ports)
+        meta = pk["meta"]
+        print(f"[PCAP] {name}: {meta['packets']} paket ({meta['bytes'] / 1e6:.1f} MB), "
+              f"{len(pk['ts'])} cocok port, parse {meta['parse_time']:.2f}s")
+        captures.append(analyze(name, pk, ports))
+
+    # pasangan capture urut argumen: client -> proxy -> server
+    hops = []
+    for a, b in zip(captures, captures[1:]):
+        result = hop_delay(a["pk"], b["pk"], ports)
+        if result:
+            hops.append((a["name"], b["name"], result))
+
+    write_report(captures, hops, args.out)
+    for cap in captures:
+        for metric, value, unit in summary_rows(cap):
+            print(f"  {metric}: {value} {unit}")
+    print(f"Hasil disimpan ke {args.out}")
@@ -1,5 +1,16 @@
-import socket, threading, time, os
+import socket, threading, time, os, stat, signal, asyncio, argparse
+import multiprocessing, mimetypes, gzip, uuid, selectors, queue
+from collections import OrderedDict
 from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+
+import accesslog
+import metrics
+
+try:
+    import brotli   # opsional: pip install brotli
+except ImportError:
+    brotli = None
 
 HOST       = "0.0.0.0"
 TCP_PORT   = 8000
@@ -7,85 +18,582 @@ UDP_PORT   = 9000
 BACKLOG    = 5
 BUF_SIZE   = 4096
 TIMEOUT    = 5
+KEEPALIVE_TIMEOUT      = 5     # detik idle sebelum koneksi keep-alive ditutup
+MAX_KEEPALIVE_REQUESTS = 100   # maksimal request per koneksi
+MAX_HEADER_SIZE        = 16384
+ASYNC_BACKLOG = 1024   # mode async: antrean accept lebih panjang
+
+STATIC_DIR      = "static"           # root file yang dilayani (relatif ke cwd)
+CACHE_MAX_BYTES = 32 * 1024 * 1024   # budget total isi file di cache
+NEG_CACHE_TTL   = 1.0                # detik, cache untuk 404
+NEG_CACHE_MAX   = 1024               # maksimal entri 404 yang diingat
+SENDFILE_THRESHOLD = 1024 * 1024     # file > ini dikirim via sendfile (zero-copy)
+MIN_COMPRESS_SIZE  = 256             # file lebih kecil tidak dikompres
+PRECOMPRESS_LEVEL  = {"br": 11, "gzip": 9}   # precompress_static saat start
+ONTHEFLY_LEVEL     = {"br": 5, "gzip": 6}    # file baru/berubah, dikompres di background
+MAX_RANGES         = 16              # Range dengan bagian lebih banyak diabaikan (200)
+
+UDP_SOCK_BUF        = 4 * 1024 * 1024   # SO_RCVBUF/SO_SNDBUF untuk engine "fast"
+UDP_BATCH           = 256               # datagram maksimal per putaran drain
+UDP_REPORT_INTERVAL = 5                 # detik antar laporan counter
 
 server_running = True
-mode = "threaded"   # "single" atau "threaded"
+mode = "threaded"   # "single", "threaded" atau "async"
 conn_id = 0
+worker_id = None    # diisi saat jalan sebagai worker pre-fork (--workers N)
+reuse_port = False  # worker pakai SO_REUSEPORT supaya bisa bind port yang sama
+udp_engine = "simple"   # "simple" (print per paket) atau "fast" (batch + counter)
+udp_sockets = 1         # engine fast: jumlah socket SO_REUSEPORT (1 thread per socket)
+
+# ---------- METRICS ----------
+# GET /metrics; dengan --workers N tiap worker punya angka sendiri (scrape per proses)
+m_request = metrics.Histogram("web_request_seconds", "Waktu total request sampai body terkirim")
+m_ttfb = metrics.Histogram("web_ttfb_seconds", "Waktu sampai header response terkirim")
+m_responses = metrics.Counter("web_responses_total", "Response per status", label="status")
+m_bytes = metrics.Counter("web_bytes_sent_total", "Byte response terkirim (header + body)")
+m_connections = metrics.Counter("web_connections_total", "Koneksi TCP diterima")
+metrics.Gauge("web_static_cache_bytes", "Byte file di static cache", lambda: static_cache.total)
+metrics.Gauge("web_static_cache_entries", "File di static cache", lambda: len(static_cache.entries))
+
+def observe_http(status, sent, start, header_sent):
+    # sent = byte yang benar-benar ditulis ke socket (HEAD/304 tanpa body),
+    # dihitung sama seperti proxy_bytes_sent_total di Proxy.py
+    m_ttfb.observe(header_sent - start)
+    m_request.observe(time.time() - start)
+    m_responses.inc(1, status)
+    m_bytes.inc(sent)
+
+# ---------- RESPONSE HELPERS ----------
+
+# header response disimpan tanpa baris Connection; baris penutup ditambah saat kirim
+CONN_CLOSE = b"Connection: close\r\n\r\n"
+CONN_KEEP_ALIVE = (
+    "Connection: keep-alive\r\n"
+    f"Keep-Alive: timeout={KEEPALIVE_TIMEOUT}, max={MAX_KEEPALIVE_REQUESTS}\r\n\r\n"
+).encode()
+
+def error_response(status_line, body):
+    body = body.encode()
+    head = (
+        f"HTTP/1.1 {status_line}\r\n"
+        "Content-Type: text/html; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+    ).encode()
+    return head, body
+
+def not_found_response(filename):
+    return error_response(
+        "404 Not Found", f"<h1>404 Not Found</h1><p>{filename} tidak ditemukan</p>"
+    )
+
+class FileBody:
+    # body file besar: tidak dibaca ke memori, dikirim langsung dari disk
+    __slots__ = ("path", "size", "offset")
+
+    def __init__(self, path, size, offset=0):
+        self.path = path
+        self.size = size
+        self.offset = offset
+
+    def __len__(self):
+        return self.size
+
+def body_cost(content):
+    return 0 if isinstance(content, FileBody) else len(content)
+
+def body_slice(content, start, end):
+    # potongan [start, end] inklusif tanpa menyalin isi
+    if isinstance(content, FileBody):
+        return FileBody(content.path, end - start + 1, content.offset + start)
+    return memoryview(content)[start:end + 1]
+
+# ---------- COMPRESSION / MIME ----------
+
+COMPRESSIBLE_TYPES = ("application/javascript", "application/json",
+                      "application/xml", "image/svg+xml")
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)   # urutan preferensi server
+
+def guess_ctype(filename):
+    ctype, _ = mimetypes.guess_type(filename)
+    if ctype is None:
+        return "application/octet-stream"
+    if ctype.startswith("text/") or ctype in COMPRESSIBLE_TYPES:
+        return ctype + "; charset=utf-8"
+    return ctype
+
+def is_compressible(ctype, content):
+    if isinstance(content, FileBody) or len(content) < MIN_COMPRESS_SIZE:
+        return False
+    base = ctype.split(";")[0]
+    return base.startswith("text/") or base in COMPRESSIBLE_TYPES
+
+def compress(data, encoding, level):
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, level, mtime=0)
+
+def choose_encodings(accept):
+    # Accept-Encoding -> daftar encoding yang kita dukung, urut q terbesar dulu
+    if not accept:
+        return ()
+    prefs = {}
+    for item in accept.split(","):
+        name, _, params = item.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[name.strip().lower()] = q
+    wildcard = prefs.get("*", 0.0)
+    ranked = [(prefs.get(enc, wildcard), -i, enc) for i, enc in enumerate(ENCODINGS)]
+    return tuple(enc for q, _, enc in sorted(ranked, reverse=True) if q > 0)
+
+# ---------- STATIC FILE CACHE ----------
+
+class StaticEntry:
+    # satu versi file: identity + varian terkompresi (encoding -> (header, body, enc) / None)
+    __slots__ = ("mtime_ns", "mtime", "size", "ctype", "content", "header",
+                 "etag", "last_modified", "compressible", "variants", "pending", "cost")
+
+    def __init__(self, st, ctype, content):
+        self.mtime_ns = st.st_mtime_ns
+        self.mtime = int(st.st_mtime)
+        self.size = st.st_size
+        self.ctype = ctype
+        self.content = content
+        self.compressible = is_compressible(ctype, content)
+        self.etag = f'"{self.size:x}-{self.mtime_ns:x}"'   # strong ETag per versi file
+        self.last_modified = formatdate(st.st_mtime, usegmt=True)
+        self.header = self.make_header("200 OK", len(content))
+        self.variants = {}
+        self.pending = set()   # encoding yang sedang antre dikompres di background
+        self.cost = body_cost(content)
+
+    def etag_for(self, enc):
+        # varian terkompresi punya byte berbeda -> ETag berbeda
+        return self.etag if enc is None else f'{self.etag[:-1]}-{enc}"'
+
+    def make_header(self, status_line, length, enc=None, ctype=None, extra=""):
+        lines = [f"HTTP/1.1 {status_line}\r\n"]
+        if length is not None:
+            lines.append(f"Content-Type: {ctype or self.ctype}\r\n")
+            if enc:
+                lines.append(f"Content-Encoding: {enc}\r\n")
+            lines.append(f"Content-Length: {length}\r\n")
+        lines.append(f"ETag: {self.etag_for(enc)}\r\n")
+        lines.append(f"Last-Modified: {self.last_modified}\r\n")
+        lines.append("Accept-Ranges: bytes\r\n")
+        if self.compressible:
+            lines.append("Vary: Accept-Encoding\r\n")
+        lines.append(extra)
+        return "".join(lines).encode()
+
+class StaticCache:
+    # LRU per filepath berisi StaticEntry, dibatasi total byte (termasuk varian gzip/br)
+    # divalidasi ulang dengan os.stat setiap hit; 404 disimpan sebentar
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.missing = OrderedDict()   # filepath -> (expire_at, header 404, body 404)
+        self.total = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()   # (filepath, entry, enc) untuk thread kompresi
+        self.compressor = None
+
+    def get(self, filepath, filename):
+        # hasil: ("ok", StaticEntry) atau ("missing", (header, body))
+        now = time.time()
+        with self.lock:
+            neg = self.missing.get(filepath)
+            if neg is not None:
+                if neg[0] > now:
+                    self.hits += 1
+                    return "missing", neg[1:]
+                del self.missing[filepath]
+
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            return self._remember_missing(filepath, filename, now)
+
+        with self.lock:
+            entry = self.entries.get(filepath)
+            if entry is not None:
+                if entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                    self.entries.move_to_end(filepath)
+                    self.hits += 1
+                    return "ok", entry
+                self._drop(filepath)
+            self.misses += 1
+
+        try:
+            with open(filepath, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_size > SENDFILE_THRESHOLD:
+                    content = FileBody(filepath, st.st_size)
+                else:
+                    content = f.read()
+        except OSError:
+            return self._remember_missing(filepath, filename, now)
+
+        entry = StaticEntry(st, guess_ctype(filename), content)
+        if entry.cost <= self.max_bytes:
+            with self.lock:
+                if filepath in self.entries:
+                    self._drop(filepath)
+                self.entries[filepath] = entry
+                self._grow(entry.cost)
+        return "ok", entry
+
+    def variant(self, filepath, entry, encodings, background=True):
+        # pilih (header, body, encoding) terbaik; kompresi dibayar sekali per versi file.
+        # background=False (precompress_static): kompres langsung dengan level maksimal.
+        # Di jalur request varian yang belum ada dikompres thread background dengan
+        # level ringan dan request ini dilayani identity, jadi event loop mode async
+        # tidak pernah tertahan brotli/gzip.
+        if not entry.compressible:
+            return entry.header, entry.content, None
+        for enc in encodings:
+            v = entry.variants.get(enc, False)
+            if v is False:
+                if background:
+                    self._schedule(filepath, entry, enc)
+                    continue
+                v = self._compress(filepath, entry, enc, PRECOMPRESS_LEVEL[enc])
+            if v:
+                return v
+        return entry.header, entry.content, None
+
+    def _compress(self, filepath, entry, enc, level):
+        data = compress(entry.content, enc, level)
+        v = None
+        if len(data) < len(entry.content):
+            v = (entry.make_header("200 OK", len(data), enc), data, enc)
+        with self.lock:
+            entry.pending.discard(enc)
+            if enc not in entry.variants:
+                entry.variants[enc] = v
+                if v is not None:
+                    entry.cost += len(data)
+                    if self.entries.get(filepath) is entry:
+                        self._grow(len(data))
+        return v
+
+    def _schedule(self, filepath, entry, enc):
+        with self.lock:
+            if enc in entry.pending:
+                return
+            entry.pending.add(enc)
+            # thread dibuat saat pertama dibutuhkan (juga di tiap worker setelah fork)
+            if self.compressor is None or not self.compressor.is_alive():
+                self.compressor = threading.Thread(target=self._compress_loop,
+                                                   name="compress", daemon=True)
+                self.compressor.start()
+        self.jobs.put((filepath, entry, enc))
+
+    def _compress_loop(self):
+        while True:
+            filepath, entry, enc = self.jobs.get()
+            try:
+                self._compress(filepath, entry, enc, ONTHEFLY_LEVEL[enc])
+            except Exception as e:
+                with self.lock:
+                    entry.pending.discard(enc)
+                print(f"[CACHE] compress {filepath} ({enc}) gagal: {e}")
+
+    def _remember_missing(self, filepath, filename, now):
+        head, body = not_found_response(filename)
+        with self.lock:
+            self.misses += 1
+            self.missing[filepath] = (now + NEG_CACHE_TTL, head, body)
+            if len(self.missing) > NEG_CACHE_MAX:
+                self.missing.popitem(last=False)
+        return "missing", (head, body)
+
+    def _grow(self, nbytes):
+        # panggil dengan self.lock dipegang
+        self.total += nbytes
+        while self.total > self.max_bytes and self.entries:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, filepath):
+        # panggil dengan self.lock dipegang
+        entry = self.entries.pop(filepath)
+        self.total -= entry.cost
+
+static_cache = StaticCache()
 
 # ---------- HTTP HANDLER ----------
 
-def handle_http(client, addr, conn_no):  # NEW: tambah conn_no
-    start = time.time()
-    client.settimeout(TIMEOUT)
+def parse_request(head):
+    # head = bytes sampai sebelum \r\n\r\n -> (method, path, version, headers) atau None
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) < 3:
+        return None
+    method, path, version = parts[0], parts[1], parts[2]
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, path, version, headers
 
-    try:
+def wants_keep_alive(version, headers):
+    conn = headers.get("connection", "").lower()
+    if version == "HTTP/1.1":
+        return "close" not in conn
+    return "keep-alive" in conn   # HTTP/1.0: default close
+
+def is_not_modified(headers, entry, enc):
+    # If-None-Match menang atas If-Modified-Since (RFC 9110)
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        if inm.strip() == "*":
+            return True
+        etag = entry.etag_for(enc)
+        return any(t.strip().removeprefix("W/") == etag for t in inm.split(","))
+    ims = headers.get("if-modified-since")
+    if ims:
+        try:
+            return entry.mtime <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_range(value, size):
+    # None = abaikan header (kirim 200), [] = tidak bisa dipenuhi (416)
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges = []
+    for part in spec.split(","):
+        first, dash, last = part.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first == "":
+                n = int(last)   # suffix: N byte terakhir
+                if n <= 0:
+                    continue
+                start, end = max(0, size - n), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None   # sintaks tidak valid
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+def range_response(entry, ranges):
+    # 206 satu bagian, atau multipart/byteranges untuk beberapa bagian
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        header = entry.make_header(
+            "206 Partial Content", end - start + 1,
+            extra=f"Content-Range: bytes {start}-{end}/{entry.size}\r\n"
+        )
+        return header, body_slice(entry.content, start, end)
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    for start, end in ranges:
+        parts.append((
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {entry.ctype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{entry.size}\r\n\r\n"
+        ).encode())
+        parts.append(body_slice(entry.content, start, end))
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    header = entry.make_header(
+        "206 Partial Content", sum(len(p) for p in parts),
+        ctype=f"multipart/byteranges; boundary={boundary}"
+    )
+    return header, parts
+
+def build_response(method, path, headers):
+    # hasil: (header tanpa baris Connection, body, status, size) -- dipakai semua mode
+    # body: bytes, FileBody, atau list keduanya (multipart range)
+    if method not in ("GET", "HEAD"):
+        head, body = error_response(
+            "501 Not Implemented",
+            f"<h1>501 Not Implemented</h1><p>{method} not supported</p>"
+        )
+        return head, body, 501, len(body)
+
+    if path == "/metrics":
+        head, body = metrics.http_response()
+        return head, body if method == "GET" else b"", 200, len(body)
+
+    # resolve path -> filename
+    if path == "/" or path == "":
+        filename = "index.html"
+    else:
+        filename = path.lstrip("/").split("?")[0] or "index.html"
+
+    filepath = os.path.normpath(os.path.join(STATIC_DIR, filename))
+    # tolak path yang keluar dari STATIC_DIR (../, symlink ke luar) -> 404
+    root = os.path.realpath(STATIC_DIR)
+    if os.path.commonpath([root, os.path.realpath(filepath)]) != root:
+        head, body = not_found_response(filename)
+        return head, body if method == "GET" else b"", 404, len(body)
+
+    kind, entry = static_cache.get(filepath, filename)
+    if kind == "missing":
+        header, content = entry
+        if method == "GET":
+            return header, content, 404, len(content)
+        return header, b"", 404, len(content)
+
+    # Range dilayani dari representasi identity (tanpa kompresi)
+    ranges = None
+    range_hdr = headers.get("range")
+    if range_hdr and method == "GET":
+        if_range = headers.get("if-range")
+        if not if_range or if_range in (entry.etag, entry.last_modified):
+            ranges = parse_range(range_hdr, entry.size)
+
+    if ranges is None:
+        encodings = choose_encodings(headers.get("accept-encoding"))
+        header, content, enc = static_cache.variant(filepath, entry, encodings)
+    else:
+        header, content, enc = entry.header, entry.content, None
+
+    if is_not_modified(headers, entry, enc):
+        return entry.make_header("304 Not Modified", None, enc), b"", 304, 0
+
+    if ranges == []:
+        head, body = error_response("416 Range Not Satisfiable", "")
+        return head + f"Content-Range: bytes */{entry.size}\r\n".encode(), body, 416, 0
+    if ranges:
+        header, body = range_response(entry, ranges)
+        size = sum(map(len, body)) if isinstance(body, list) else len(body)
+        return header, body, 206, size
+
+    if method == "GET":
+        return header, content, 200, len(content)
+    return header, b"", 200, len(content)
+
+def fmt_http(ts, conn_no, addr, method, path, status, size, dur):
+    return (
+        f"[HTTP][Conn #{conn_no}] {datetime.fromtimestamp(ts)} "   # NEW: tampilkan Connection #
+        f"{addr[0]}:{addr[1]} \"{method} {path}\" {status} "
+        f"size={size}B time={dur:.1f}ms"
+    )
+
+def fmt_conn(ts, conn_no, addr):
+    return f"[TCP] Connection #{conn_no} from {addr[0]}:{addr[1]}"
+
+def fmt_udp_echo(ts, n, addr):
+    return f"[UDP] echo {n}B to {addr[0]}:{addr[1]}"
+
+def log_http(conn_no, addr, method, path, status, size, start):
+    # LOG singkat -- hanya enqueue, format & print di thread accesslog
+    dur = (time.time() - start) * 1000
+    accesslog.emit(fmt_http, conn_no, addr, method, path, status, size, dur)
+
+def send_file(client, body):
+    # socket.sendfile -> os.sendfile di Linux, payload tidak lewat memori Python
+    with open(body.path, "rb") as f:
+        client.sendfile(f, body.offset, body.size)
+
+def send_body(client, body):
+    # hasil: jumlah byte body yang dikirim
+    sent = 0
+    for part in (body if isinstance(body, list) else (body,)):
+        if isinstance(part, FileBody):
+            send_file(client, part)
+            sent += part.size
+        elif part:
+            client.sendall(part)
+            sent += len(part)
+    return sent
+
+def read_head(client, buf):
+    # baca sampai \r\n\r\n; sisa byte (request pipelined) tetap di buf
+    while True:
+        idx = buf.find(b"\r\n\r\n")
+        if idx >= 0:
+            head = bytes(buf[:idx])
+            del buf[:idx + 4]
+            return head
+        if len(buf) > MAX_HEADER_SIZE:
+            return None
         data = client.recv(BUF_SIZE)
         if not data:
-            return
-
-        # parse request line
-        req_line = data.decode(errors="ignore").split("\r\n")[0]
-        parts = req_line.split()
-        if len(parts) < 3:
-            return
-
-        method, path, _ = parts
-        if method not in ("GET", "HEAD"):
-            body = f"<h1>501 Not Implemented</h1><p>{method} not supported</p>"
-            resp = (
-                "HTTP/1.1 501 Not Implemented\r\n"
-                "Content-Type: text/html; charset=utf-8\r\n"
-                f"Content-Length: {len(body)}\r\n"
-                "Connection: close\r\n\r\n"
-                f"{body}"
-            )
-            client.sendall(resp.encode())
-            return
-
-        # resolve path -> filename
-        if path == "/" or path == "":
-            filename = "index.html"
-        else:
-            filename = path.lstrip("/").split("?")[0] or "index.html"
-
-        filepath = os.path.join("static", filename)
-
-        if os.path.isfile(filepath):
-            with open(filepath, "rb") as f:
-                content = f.read()
-
-            ctype = "text/html; charset=utf-8"
-            header = (
-                "HTTP/1.1 200 OK\r\n"
-                f"Content-Type: {ctype}\r\n"
-                f"Content-Length: {len(content)}\r\n"
-                "Connection: close\r\n\r\n"
-            )
-            client.sendall(header.encode())
-            if method == "GET":
-                client.sendall(content)
-            status = 200
-            size = len(content)
-        else:
-            body = f"<h1>404 Not Found</h1><p>{filename} tidak ditemukan</p>"
-            resp = (
-                "HTTP/1.1 404 Not Found\r\n"
-                "Content-Type: text/html; charset=utf-8\r\n"
-                f"Content-Length: {len(body)}\r\n"
-                "Connection: close\r\n\r\n"
-                f"{body}"
-            )
-            client.sendall(resp.encode())
-            status = 404
-            size = len(body)
-
-        # LOG singkat
-        dur = (time.time() - start) * 1000
-        print(
-            f"[HTTP][Conn #{conn_no}] {datetime.now()} "   # NEW: tampilkan Connection #
-            f"{addr[0]}:{addr[1]} \"{method} {path}\" {status} "
-            f"size={size}B time={dur:.1f}ms"
-        )
+            return None
+        buf += data
+
+def discard_body(client, buf, headers):
+    # GET/HEAD jarang punya body, tapi harus dibuang supaya request berikutnya terbaca benar
+    try:
+        remaining = int(headers.get("content-length", 0))
+    except ValueError:
+        return False
+    take = min(remaining, len(buf))
+    del buf[:take]
+    remaining -= take
+    while remaining > 0:
+        data = client.recv(min(BUF_SIZE, remaining))
+        if not data:
+            return False
+        remaining -= len(data)
+    return True
+
+def handle_http(client, addr, conn_no, keep_alive=True):  # NEW: tambah conn_no
+    client.settimeout(TIMEOUT)
+    # header & body dikirim terpisah; tanpa NODELAY keep-alive kena delay Nagle/delayed-ACK
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    buf = bytearray()   # buffer baca persisten untuk seluruh koneksi
+    served = 0
+
+    try:
+        while served < MAX_KEEPALIVE_REQUESTS:
+            start = time.time()
+            try:
+                head = read_head(client, buf)
+            except socket.timeout:
+                if served:
+                    return   # idle keep-alive habis, bukan error
+                raise
+            if head is None:
+                return
+
+            req = parse_request(head)
+            if req is None:
+                return
+
+            method, path, version, headers = req
+            if not discard_body(client, buf, headers):
+                return
+            served += 1
+            header, body, status, size = build_response(method, path, headers)
+            persist = (keep_alive and status != 501
+                       and served < MAX_KEEPALIVE_REQUESTS
+                       and wants_keep_alive(version, headers))
+
+            head = header + (CONN_KEEP_ALIVE if persist else CONN_CLOSE)
+            client.sendall(head)
+            header_sent = time.time()
+            sent = len(head) + send_body(client, body)
+            observe_http(status, sent, start, header_sent)
+            if status != 501:
+                log_http(conn_no, addr, method, path, status, size, start)
+            if not persist:
+                return
+            client.settimeout(KEEPALIVE_TIMEOUT)
 
     except Exception as e:
         print(f"[HTTP-ERROR][Conn #{conn_no}] {addr} -> {e}")  # NEW: ikutkan conn_no di error
@@ -95,12 +603,132 @@ def handle_http(client, addr, conn_no):  # NEW: tambah conn_no
         except:
             pass
 
+# ---------- ASYNC (EVENT LOOP) HANDLER ----------
+
+async def discard_body_async(reader, headers):
+    try:
+        remaining = int(headers.get("content-length", 0))
+    except ValueError:
+        return False
+    if remaining > 0:
+        await asyncio.wait_for(reader.readexactly(remaining), TIMEOUT)
+    return True
+
+async def handle_http_async(reader, writer, addr, conn_no):
+    served = 0
+    timeout = TIMEOUT
+
+    try:
+        while served < MAX_KEEPALIVE_REQUESTS:
+            start = time.time()
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+            except asyncio.TimeoutError:
+                if served:
+                    return   # idle keep-alive habis, bukan error
+                raise
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+
+            req = parse_request(head[:-4])
+            if req is None:
+                return
+
+            method, path, version, headers = req
+            if not await discard_body_async(reader, headers):
+                return
+            served += 1
+            header, body, status, size = build_response(method, path, headers)
+            persist = (status != 501 and served < MAX_KEEPALIVE_REQUESTS
+                       and wants_keep_alive(version, headers))
+
+            head = header + (CONN_KEEP_ALIVE if persist else CONN_CLOSE)
+            writer.write(head)
+            # TTFB setelah drain, sama dengan sendall() di jalur threaded
+            await asyncio.wait_for(writer.drain(), TIMEOUT)
+            header_sent = time.time()
+            sent = len(head) + await send_body_async(writer, body)
+            await asyncio.wait_for(writer.drain(), TIMEOUT)
+            observe_http(status, sent, start, header_sent)
+            if status != 501:
+                log_http(conn_no, addr, method, path, status, size, start)
+            if not persist:
+                return
+            timeout = KEEPALIVE_TIMEOUT
+
+    except Exception as e:
+        print(f"[HTTP-ERROR][Conn #{conn_no}] {addr} -> {e!r}")
+    finally:
+        try:
+            writer.close()
+        except:
+            pass
+
+async def send_file_async(writer, body):
+    loop = asyncio.get_running_loop()
+    with open(body.path, "rb") as f:
+        await loop.sendfile(writer.transport, f, body.offset, body.size)
+
+async def send_body_async(writer, body):
+    # hasil: jumlah byte body yang dikirim
+    sent = 0
+    for part in (body if isinstance(body, list) else (body,)):
+        if isinstance(part, FileBody):
+            await asyncio.wait_for(writer.drain(), TIMEOUT)
+            await send_file_async(writer, part)
+            sent += part.size
+        elif part:
+            writer.write(part)
+            sent += len(part)
+    return sent
+
+def conn_label(n):
+    # dengan beberapa worker, nomor koneksi diberi prefix worker supaya tetap unik
+    return n if worker_id is None else f"w{worker_id}-{n}"
+
+async def async_on_connect(reader, writer):
+    global conn_id
+    addr = writer.get_extra_info("peername")[:2]
+    conn_id += 1
+    current_conn = conn_label(conn_id)
+    accesslog.emit(fmt_conn, current_conn, addr)
+    m_connections.inc()
+    await handle_http_async(reader, writer, addr, current_conn)
+
+async def async_acceptor():
+    raise_nofile_limit()
+    server = await asyncio.start_server(
+        async_on_connect, HOST, TCP_PORT,
+        backlog=ASYNC_BACKLOG, reuse_address=True, reuse_port=reuse_port or None,
+        limit=MAX_HEADER_SIZE
+    )
+    print(f"[TCP] HTTP server on {HOST}:{TCP_PORT} mode={mode}")
+    async with server:
+        while server_running:
+            await asyncio.sleep(0.5)
+
+def raise_nofile_limit():
+    # 10k koneksi butuh 10k fd; naikkan soft limit ke hard limit (Unix saja)
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        target = hard if hard != resource.RLIM_INFINITY else 65536
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
 # ---------- UDP ECHO SERVER ----------
 
 def udp_echo_server():
     global server_running
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     s.bind((HOST, UDP_PORT))
     s.settimeout(1.0)
     print(f"[UDP] Echo server on {HOST}:{UDP_PORT}")
@@ -109,19 +737,98 @@ def udp_echo_server():
         try:
             data, addr = s.recvfrom(BUF_SIZE)
             s.sendto(data, addr)
-            print(f"[UDP] echo {len(data)}B to {addr[0]}:{addr[1]}")
+            accesslog.emit(fmt_udp_echo, len(data), addr)
         except socket.timeout:
             continue
         except Exception as e:
             if server_running:
                 print(f"[UDP-ERROR] {e}")
 
+# ---------- UDP ECHO: HIGH-RATE ENGINE ----------
+
+def read_udp_rcvbuf_errors():
+    # counter drop kernel (seluruh host) dari /proc/net/snmp; None kalau tidak ada
+    try:
+        with open("/proc/net/snmp") as f:
+            rows = [line.split() for line in f if line.startswith("Udp:")]
+        return int(rows[1][rows[0].index("RcvbufErrors")])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def udp_fast_worker(counters):
+    # counters = [packets, bytes, drops] milik thread ini saja, jadi tanpa lock
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port or udp_sockets > 1:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_SOCK_BUF)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, UDP_SOCK_BUF)
+    s.bind((HOST, UDP_PORT))
+    s.setblocking(False)
+
+    sel = selectors.DefaultSelector()
+    sel.register(s, selectors.EVENT_READ)
+    buf = bytearray(65535)
+    view = memoryview(buf)
+    recv_into, sendto = s.recvfrom_into, s.sendto
+
+    while server_running:
+        if not sel.select(0.5):
+            continue
+        # drain selama socket masih readable, maksimal UDP_BATCH per putaran
+        for _ in range(UDP_BATCH):
+            try:
+                n, addr = recv_into(buf)
+            except BlockingIOError:
+                break
+            except OSError:
+                counters[2] += 1
+                continue
+            try:
+                sendto(view[:n], addr)
+            except OSError:   # termasuk BlockingIOError: buffer kirim penuh
+                counters[2] += 1
+                continue
+            counters[0] += 1
+            counters[1] += n
+    s.close()
+
+def udp_fast_server():
+    all_counters = []
+    for _ in range(udp_sockets):
+        counters = [0, 0, 0]
+        all_counters.append(counters)
+        threading.Thread(target=udp_fast_worker, args=(counters,), daemon=True).start()
+    print(f"[UDP] Fast echo server on {HOST}:{UDP_PORT} sockets={udp_sockets}")
+
+    last = [0, 0, 0]
+    last_kernel = read_udp_rcvbuf_errors()
+    last_t = time.time()
+    while server_running:
+        time.sleep(UDP_REPORT_INTERVAL)
+        now = time.time()
+        total = [sum(c[i] for c in all_counters) for i in range(3)]
+        dt = now - last_t
+        pkts, nbytes, drops = (total[i] - last[i] for i in range(3))
+        kernel = read_udp_rcvbuf_errors()
+        kdrops = "" if kernel is None or last_kernel is None else f" kernel_drops={kernel - last_kernel}"
+        if pkts or drops:
+            print(f"[UDP] {pkts / dt:.0f} pps {nbytes * 8 / dt / 1e6:.2f} Mbps "
+                  f"drops={drops}{kdrops} total={total[0]}")
+        last, last_kernel, last_t = total, kernel, now
+
 # ---------- TCP ACCEPTOR ----------
 
 def tcp_acceptor():
     global server_running, conn_id  # NEW: pakai conn_id
+    if mode == "async":
+        asyncio.run(async_acceptor())
+        return
+
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     s.bind((HOST, TCP_PORT))
     s.listen(BACKLOG)
     s.settimeout(0.5)
@@ -133,11 +840,13 @@ def tcp_acceptor():
 
             # NEW: setiap ada koneksi baru, increment dan print
             conn_id += 1
-            current_conn = conn_id
-            print(f"[TCP] Connection #{current_conn} from {addr[0]}:{addr[1]}")
+            current_conn = conn_label(conn_id)
+            accesslog.emit(fmt_conn, current_conn, addr)
+            m_connections.inc()
 
             if mode == "single":
-                handle_http(client, addr, current_conn)
+                # single: tanpa keep-alive supaya satu klien tidak memonopoli server
+                handle_http(client, addr, current_conn, keep_alive=False)
             else:  # threaded
                 threading.Thread(
                     target=handle_http,
@@ -153,31 +862,143 @@ def tcp_acceptor():
 # ---------- MAIN ----------
 
 def ensure_static():
-    if not os.path.isdir("static"):
-        os.makedirs("static")
-    index_path = os.path.join("static", "index.html")
+    if not os.path.isdir(STATIC_DIR):
+        os.makedirs(STATIC_DIR)
+    index_path = os.path.join(STATIC_DIR, "index.html")
     if not os.path.isfile(index_path):
         with open(index_path, "w", encoding="utf-8") as f:
             f.write("<h1>Web Server Socket Programming</h1><p>Running on port 8000</p>")
 
+def precompress_static(root=STATIC_DIR):
+    # isi cache + varian gzip/br sebelum melayani (dan sebelum fork worker)
+    n = 0
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            filepath = os.path.normpath(os.path.join(dirpath, name))
+            kind, entry = static_cache.get(filepath, name)
+            if kind == "ok" and entry.compressible:
+                for enc in ENCODINGS:
+                    static_cache.variant(filepath, entry, (enc,), background=False)
+                n += 1
+    print(f"[CACHE] precompressed {n} files in {root}/ ({', '.join(ENCODINGS)})")
+
 def choose_mode():
     global mode
-    m = input("Pilih mode (1=single, 2=threaded) [2]: ").strip()
-    mode = "single" if m == "1" else "threaded"
-
-if __name__ == "__main__":
-    ensure_static()
-    choose_mode()
+    m = input("Pilih mode (1=single, 2=threaded, 3=async) [2]: ").strip()
+    mode = {"1": "single", "3": "async"}.get(m, "threaded")
 
+def run_server():
+    global server_running
+    accesslog.start()
     t_tcp = threading.Thread(target=tcp_acceptor, daemon=True)
-    t_udp = threading.Thread(target=udp_echo_server, daemon=True)
+    t_udp = threading.Thread(
+        target=udp_fast_server if udp_engine == "fast" else udp_echo_server,
+        daemon=True
+    )
     t_tcp.start()
     t_udp.start()
 
-    print("Server running. Ctrl+C untuk berhenti.")
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         server_running = False
+    accesslog.flush()
+
+# ---------- PRE-FORK (MULTI-PROCESS) ----------
+
+def stop_on_signal(signum, frame):
+    # hanya sekali: sinyal kedua (Ctrl+C + terminate dari master) diabaikan
+    if server_running:
+        raise KeyboardInterrupt
+
+def worker_main(wid):
+    global worker_id, reuse_port
+    worker_id = wid
+    reuse_port = True
+    signal.signal(signal.SIGINT, stop_on_signal)
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    print(f"[WORKER] w{wid} started pid={os.getpid()}")
+    run_server()
+    time.sleep(0.6)   # beri waktu acceptor keluar dari loop
+    accesslog.flush()  # proses multiprocessing keluar via os._exit, atexit tidak jalan
+    print(f"[WORKER] w{wid} stopped")
+
+def supervise(n_workers):
+    # master: fork N worker, restart yang mati, teruskan Ctrl+C/SIGTERM
+    ctx = multiprocessing.get_context("fork")
+    workers = {}
+
+    def spawn(wid):
+        p = ctx.Process(target=worker_main, args=(wid,), daemon=False)
+        p.start()
+        workers[wid] = p
+
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    for wid in range(1, n_workers + 1):
+        spawn(wid)
+    print(f"[MASTER] pid={os.getpid()} running {n_workers} workers. Ctrl+C untuk berhenti.")
+
+    try:
+        while True:
+            time.sleep(1)
+            for wid, p in list(workers.items()):
+                if not p.is_alive():
+                    print(f"[MASTER] worker w{wid} exited (code {p.exitcode}), restarting")
+                    spawn(wid)
+    except KeyboardInterrupt:
+        pass
+
+    for p in workers.values():
+        if p.is_alive():
+            p.terminate()
+    for p in workers.values():
+        p.join(5)
+        if p.is_alive():
+            p.kill()
+    print("\nServer stopped.")
+
+def parse_args():
+    # tiap opsi juga bisa diisi lewat environment (WEB_*), CLI tetap menang
+    env = os.environ.get
+    ap = argparse.ArgumentParser(description="Web server socket programming")
+    ap.add_argument("--mode", choices=("single", "threaded", "async"), default=env("WEB_MODE"),
+                    help="mode server, env WEB_MODE (tanpa keduanya akan ditanya interaktif)")
+    ap.add_argument("--host", default=env("WEB_HOST", HOST), help="alamat bind, env WEB_HOST")
+    ap.add_argument("--port", type=int, default=int(env("WEB_PORT", TCP_PORT)),
+                    help="port HTTP, env WEB_PORT")
+    ap.add_argument("--udp-port", type=int, default=int(env("WEB_UDP_PORT", UDP_PORT)),
+                    help="port UDP echo, env WEB_UDP_PORT")
+    ap.add_argument("--backlog", type=int, default=int(env("WEB_BACKLOG", BACKLOG)),
+                    help="antrean listen() mode single/threaded, env WEB_BACKLOG")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="jumlah proses worker (pre-fork + SO_REUSEPORT)")
+    ap.add_argument("--udp-engine", choices=("simple", "fast"), default="simple",
+                    help="fast: drain batch non-blocking, counter periodik tanpa print per paket")
+    ap.add_argument("--udp-sockets", type=int, default=1,
+                    help="engine fast: jumlah socket SO_REUSEPORT paralel")
+    ap.add_argument("--log-file", help="tulis access log ke file (dirotasi) bukan stdout")
+    ap.add_argument("--log-sample", type=float,
+                    help="fraksi request yang dicatat, 0.0-1.0 (default 1.0)")
+    return ap.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    HOST, TCP_PORT, UDP_PORT, BACKLOG = args.host, args.port, args.udp_port, args.backlog
+    ensure_static()
+    precompress_static()
+    udp_engine, udp_sockets = args.udp_engine, max(1, args.udp_sockets)
+    accesslog.configure(sample=args.log_sample, path=args.log_file)
+    if args.mode:
+        mode = args.mode
+    else:
+        choose_mode()
+
+    if args.workers > 1:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise SystemExit("--workers butuh SO_REUSEPORT (Linux/BSD)")
+        supervise(args.workers)
+    else:
+        print("Server running. Ctrl+C untuk berhenti.")
+        run_server()
         print("\nServer stopped.")